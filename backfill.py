@@ -0,0 +1,74 @@
+# backfill.py
+"""
+AI 报告生成系统 - 历史补生成入口
+
+为一段时间内的历史执行批量生成报告（例如故障恢复后、修改提示词后）。
+中国区和日本区的执行按开始时间就近配对；中断后重新运行会跳过已完成的执行对。
+
+用法：
+    python backfill.py --since 2025-01-01 --until 2025-02-01
+    python backfill.py --since "2025-01-01 08:00" --concurrency 5 --rate 30
+    python backfill.py --since 2025-01-01 --force   # 忽略报告缓存重新生成
+"""
+import argparse
+from datetime import datetime
+
+from modules.backfill import run_backfill
+
+
+def parse_datetime(value):
+    """解析 YYYY-MM-DD 或 YYYY-MM-DD HH:MM[:SS]"""
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"无法解析时间: {value}")
+
+
+def main():
+    """补生成入口"""
+    parser = argparse.ArgumentParser(description='AI 报告生成系统 - 历史补生成')
+    parser.add_argument('--since', type=parse_datetime, help='开始时间下限（包含）')
+    parser.add_argument('--until', type=parse_datetime, help='开始时间上限（不包含）')
+    parser.add_argument('--concurrency', type=int, help='同时生成的报告数')
+    parser.add_argument('--rate', type=float, help='每分钟最多发往 DeepSeek 的请求数')
+    parser.add_argument('--max-gap', type=int, help='中国区/日本区执行开始时间最多相差多少秒才配对')
+    parser.add_argument('--state-file', help='断点续跑状态文件')
+    parser.add_argument('--force', action='store_true', help='忽略报告缓存和状态文件，全部重新生成')
+    parser.add_argument('--verbose', action='store_true', help='显示每份报告的详细输出')
+    args = parser.parse_args()
+
+    try:
+        summary = run_backfill(
+            since=args.since,
+            until=args.until,
+            concurrency=args.concurrency,
+            rate_per_minute=args.rate,
+            max_pair_gap=args.max_gap,
+            state_file=args.state_file,
+            force=args.force,
+            verbose=args.verbose
+        )
+
+        print("\n" + "=" * 80)
+        print(f"   共 {summary['total']} 对，跳过 {summary['skipped']}，"
+              f"成功 {summary['succeeded']}，失败 {summary['failed']}")
+        print("=" * 80 + "\n")
+
+        return 0 if summary['failed'] == 0 else 1
+
+    except KeyboardInterrupt:
+        print("\n\n⚠️  用户中断，已完成的执行对已记录，重新运行即可继续")
+        return 2
+
+    except Exception as e:
+        print(f"\n\n❌ 补生成出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return 3
+
+
+if __name__ == '__main__':
+    exit_code = main()
+    exit(exit_code)
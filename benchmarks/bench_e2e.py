@@ -0,0 +1,209 @@
+# benchmarks/bench_e2e.py
+"""
+端到端性能测试 - 不依赖生产数据库和 DeepSeek API
+
+1. 按指定行数把合成日志写入本地测试库（BENCH_DB_*，见 synthetic_logs.py）
+2. 启动本地 DeepSeek 替身（fake_deepseek.py），按设定速率推送 SSE
+3. 调用 generate_ai_report()，从 ReportMetrics 的 JSON 行读取总耗时和各步骤耗时
+4. 结果保存到 benchmarks/results/<时间>_<commit>.json，可用 --compare 与之前的结果对比
+
+用法：
+    BENCH_DB_PASSWORD=... python -m benchmarks.bench_e2e --sizes 1000 10000 100000
+    python -m benchmarks.bench_e2e --sizes 1000000 --token-rate 200 --stream-logs
+    python -m benchmarks.bench_e2e --compare benchmarks/results/20260101-120000_abc1234.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.fake_deepseek import start_server
+from benchmarks.synthetic_logs import BENCH_DB_CONFIG, seed_database
+from config.database import AI_CONFIG, DB_CONFIG, METRICS_CONFIG
+from modules.db_pool import close_pool
+from modules.report_generator import generate_ai_report
+from modules.schema import apply_migrations
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def git_revision():
+    """
+    Returns:
+        tuple: (短 commit 哈希, 工作区是否有未提交的修改)
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def run_once(metrics_path, stream, stream_logs, verbose):
+    """
+    生成一份报告，返回本次的指标记录
+
+    Returns:
+        dict: ReportMetrics.to_dict() 的结果，另附 'wall_seconds'
+    """
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+
+        start = time.perf_counter()
+        result = generate_ai_report(stream=stream, stream_logs=stream_logs, force=True)
+        wall_seconds = time.perf_counter() - start
+
+    if not result['success']:
+        raise SystemExit(f"❌ 报告生成失败: {result['report_content']}")
+
+    with open(metrics_path, 'r', encoding='utf-8') as f:
+        record = json.loads(f.readlines()[-1])
+
+    record['wall_seconds'] = round(wall_seconds, 4)
+    return record
+
+
+def print_runs(runs):
+    stage_names = []
+    for run in runs:
+        for name in run['metrics']['stages']:
+            if name not in stage_names:
+                stage_names.append(name)
+
+    header = f"{'行数/区域':>10} {'总耗时(s)':>10} " + ' '.join(f"{name[:14]:>14}" for name in stage_names)
+    header += f" {'首字(s)':>8} {'tokens/s':>9}"
+    print(header)
+
+    for run in runs:
+        metrics = run['metrics']
+        stages = ' '.join(
+            f"{metrics['stages'].get(name, {}).get('seconds', 0):>14.3f}" for name in stage_names
+        )
+        ttft = metrics['llm'].get('ttft_seconds')
+        rate = metrics['llm'].get('tokens_per_second')
+        print(f"{run['lines_per_region']:>10} {run['wall_seconds']:>10.3f} {stages} "
+              f"{ttft if ttft is not None else '-':>8} {rate if rate is not None else '-':>9}")
+
+
+def compare_results(current, baseline_path):
+    """按行数对比总耗时和各步骤耗时"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    print(f"\n📊 对比 {baseline['commit']}（{baseline['created_at']}） → {current['commit']}")
+
+    baseline_runs = {run['lines_per_region']: run for run in baseline['runs']}
+    for run in current['runs']:
+        old = baseline_runs.get(run['lines_per_region'])
+        if not old:
+            continue
+
+        parts = [f"总耗时 {old['wall_seconds']:.3f} → {run['wall_seconds']:.3f}s "
+                 f"({run['wall_seconds'] / old['wall_seconds']:.2f}x)"]
+        for name, entry in run['metrics']['stages'].items():
+            old_entry = old['metrics']['stages'].get(name)
+            if old_entry:
+                parts.append(f"{name} {old_entry['seconds']:.3f} → {entry['seconds']:.3f}")
+
+        print(f"   {run['lines_per_region']:>8} 行: " + '，'.join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端性能测试（本地测试库 + DeepSeek 替身）')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help='每个区域最新执行的日志行数')
+    parser.add_argument('--repeat', type=int, default=1, help='每个行数生成几次报告（取总耗时最短的一次）')
+    parser.add_argument('--token-rate', type=float, default=50.0, help='替身每秒输出的 token 数')
+    parser.add_argument('--ttft', type=float, default=0.5, help='替身首个 token 之前的延迟（秒）')
+    parser.add_argument('--output-tokens', type=int, default=300, help='替身每次回复的 token 数')
+    parser.add_argument('--no-stream', action='store_true', help='使用非流式调用')
+    parser.add_argument('--stream-logs', action='store_true', help='流式读取日志')
+    parser.add_argument('--skip-seed', action='store_true', help='不重新写入合成日志（只测一个行数时使用）')
+    parser.add_argument('--compare', help='与之前保存的结果文件对比')
+    parser.add_argument('--verbose', action='store_true', help='显示报告生成的完整输出')
+    args = parser.parse_args()
+
+    server = start_server(token_rate=args.token_rate, ttft=args.ttft, output_tokens=args.output_tokens)
+    host, port = server.server_address
+
+    # 指向测试库和替身；连接池和 HTTP 会话都在第一次使用时才创建
+    DB_CONFIG.update(BENCH_DB_CONFIG)
+    AI_CONFIG['api_base'] = f"http://{host}:{port}"
+    AI_CONFIG['deepseek_api_key'] = 'bench'
+
+    metrics_file = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+    metrics_file.close()
+    METRICS_CONFIG.update({'enabled': True, 'jsonl_path': metrics_file.name, 'persist_db': False})
+
+    commit, dirty = git_revision()
+    print(f"\n🧪 端到端性能测试 @ {commit}{' (有未提交修改)' if dirty else ''}")
+    print(f"   测试库: {BENCH_DB_CONFIG['host']}:{BENCH_DB_CONFIG['port']}/{BENCH_DB_CONFIG['database']}")
+    print(f"   DeepSeek 替身: {AI_CONFIG['api_base']}，首字 {args.ttft}s，{args.token_rate:g} tokens/s")
+
+    runs = []
+
+    try:
+        for size in args.sizes:
+            if not args.skip_seed:
+                print(f"\n📥 写入合成日志: 每个区域 {size} 行...")
+                close_pool()
+                seed_database(size)
+                apply_migrations(verbose=False)
+
+            records = [
+                run_once(metrics_file.name, not args.no_stream, args.stream_logs, args.verbose)
+                for _ in range(args.repeat)
+            ]
+            best = min(records, key=lambda record: record['wall_seconds'])
+
+            runs.append({
+                'lines_per_region': size,
+                'wall_seconds': best['wall_seconds'],
+                'metrics': best
+            })
+            print(f"   ✅ {size} 行/区域: {best['wall_seconds']:.3f} 秒")
+    finally:
+        close_pool()
+        server.shutdown()
+        os.unlink(metrics_file.name)
+
+    result = {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'params': {
+            'repeat': args.repeat,
+            'token_rate': args.token_rate,
+            'ttft': args.ttft,
+            'output_tokens': args.output_tokens,
+            'stream': not args.no_stream,
+            'stream_logs': args.stream_logs,
+            'requests': server.request_count
+        },
+        'runs': runs
+    }
+
+    print()
+    print_runs(runs)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}_{commit}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 结果已保存: {path}")
+
+    if args.compare:
+        compare_results(result, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_import_time.py
+"""
+命令启动耗时测试
+
+用 python -X importtime 在新进程中导入各命令需要的模块，统计导入总耗时，
+并检查轻量命令没有加载不该加载的重量级依赖（不满足时退出码为 1，可用作检查），
+以及只导入配置入口时不会读取 .env（python-dotenv 在第一次访问配置时才加载）。
+
+用法：
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 命令 -> (需要导入的代码, 不允许加载的模块)
+COMMANDS = {
+    'show-prompts': (
+        'import main; from modules.prompts import show_current_prompts',
+        {'requests', 'pymysql', 'dotenv', 'config.settings'}
+    ),
+    # 只导入配置入口不读取 .env，也不读取任何配置
+    'config (import)': (
+        'import config.database',
+        {'dotenv', 'config.settings'}
+    ),
+    # 第一次访问配置：读取 .env 并执行 config/settings.py
+    'config (first access)': (
+        'from config.database import DB_CONFIG',
+        set()
+    ),
+    'balance': (
+        'import main; from modules import check_balance',
+        {'pymysql'}
+    ),
+    'generate': (
+        'import main; from modules import generate_ai_report',
+        set()
+    ),
+    # 对照：所有子模块一次性导入（相当于原来的 modules/__init__.py）
+    'eager (all modules)': (
+        'import modules.db_query, modules.db_pool, modules.log_filter, '
+        'modules.ai_processor, modules.report_generator',
+        set()
+    )
+}
+
+
+def measure(code):
+    """
+    在新进程中导入，解析 -X importtime 的输出
+
+    Returns:
+        tuple: (导入总耗时微秒数, 已加载的模块名集合)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+
+    total = 0
+    loaded = set()
+    after_startup = False
+
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        depth = len(name) - len(name.lstrip()) - 1
+        name = name.strip()
+        loaded.add(name)
+
+        # 解释器启动时的导入以顶层的 site 结束，之后的顶层导入才是命令本身的
+        if depth == 0:
+            if after_startup:
+                total += int(cumulative_us)
+            elif name == 'site':
+                after_startup = True
+
+    return total, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='命令启动耗时测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每个命令测量几次（取中位数）')
+    args = parser.parse_args()
+
+    print(f"{'命令':<22} {'导入耗时(ms)':>12}  检查")
+
+    failed = False
+
+    for command, (code, forbidden) in COMMANDS.items():
+        samples = []
+        loaded = set()
+        for _ in range(args.repeat):
+            total, loaded = measure(code)
+            samples.append(total)
+
+        unexpected = sorted(forbidden & loaded)
+        status = '✅' if not unexpected else f"❌ 加载了 {', '.join(unexpected)}"
+        failed = failed or bool(unexpected)
+
+        print(f"{command:<22} {statistics.median(samples) / 1000:>12.1f}  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
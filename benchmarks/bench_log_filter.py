@@ -0,0 +1,90 @@
+# benchmarks/bench_log_filter.py
+"""
+时间戳清理性能测试
+
+对比原来的逐行 re.sub（未预编译的模式字符串）和 clean_messages_batch()，
+并校验两者输出完全一致。
+
+用法：
+    python -m benchmarks.bench_log_filter
+    python -m benchmarks.bench_log_filter --sizes 10000 100000 --repeat 5
+"""
+import argparse
+import random
+import re
+import time
+
+from modules.log_filter import clean_messages_batch
+
+
+SAMPLE_MESSAGES = [
+    '开始任务: Fight',
+    '当前关卡: 1-7',
+    '理智不足，等待中',
+    '识别到掉落: 固源岩 x2',
+    '基建换班完成',
+    '  任务出错: StartUp',
+    'MAA159 已完成所有任务'
+]
+
+
+def legacy_clean(messages):
+    """原实现：每行调用一次 re.sub(模式字符串, ...)"""
+    pattern = r'^\[\d{2}:\d{2}:\d{2}\]\s*'
+    return [re.sub(pattern, '', message) for message in messages]
+
+
+def generate_messages(count, seed=0):
+    """
+    生成 MAA 风格的日志消息：大部分带 [HH:MM:SS] 前缀，少量不带或格式不完整
+    """
+    rng = random.Random(seed)
+    messages = []
+
+    for i in range(count):
+        body = rng.choice(SAMPLE_MESSAGES)
+        kind = rng.random()
+
+        if kind < 0.85:
+            messages.append(f"[{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}] {body}")
+        elif kind < 0.95:
+            messages.append(body)
+        else:
+            # 不完整的时间戳，不应被清理
+            messages.append(f"[{rng.randrange(24):02d}:{rng.randrange(60):02d}] {body}")
+
+    return messages
+
+
+def best_of(func, messages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(messages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='时间戳清理性能测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'行数':>10} {'原实现(s)':>12} {'批量(s)':>12} {'加速比':>8}")
+
+    for size in args.sizes:
+        messages = generate_messages(size)
+
+        if legacy_clean(messages) != clean_messages_batch(messages):
+            raise SystemExit(f"❌ {size} 行时输出不一致")
+
+        legacy = best_of(legacy_clean, messages, args.repeat)
+        batch = best_of(clean_messages_batch, messages, args.repeat)
+
+        print(f"{size:>10} {legacy:>12.4f} {batch:>12.4f} {legacy / batch:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# benchmarks/bench_sse.py
+"""
+流式响应解析性能测试
+
+回放一段 SSE 流，对比原来的 iter_lines + 逐 token print(flush=True) 循环和
+call_deepseek_api_stream() 现在的增量解码 + 合并输出，并校验两者得到的内容一致。
+终端输出被重定向到 os.devnull，统计的写出次数即实际的 write/flush 系统调用次数。
+
+用法：
+    python -m benchmarks.bench_sse
+    python -m benchmarks.bench_sse --tokens 20000 --repeat 5
+    python -m benchmarks.bench_sse --file recorded.sse    # 回放录制的原始响应（例如 curl -N 的输出）
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import time
+
+import requests
+
+from config.database import AI_CONFIG
+from modules import ai_processor
+
+
+SAMPLE_TOKENS = ['理智', '不足', '，', '基建', '换班', '完成', '。', 'MAA', '159', ' ', '\n',
+                 '任务', '出错', ': ', 'Fight', '关卡', '1-7', '掉落', '固源岩', '**']
+
+
+def generate_stream(token_count, seed=0):
+    """
+    生成 DeepSeek 格式的 SSE 流：每个 token 一个事件，夹杂心跳注释，以 [DONE] 结束
+    """
+    rng = random.Random(seed)
+    parts = []
+
+    for i in range(token_count):
+        if i % 500 == 0:
+            parts.append(': keep-alive\n\n')
+
+        chunk = {
+            'id': 'bench',
+            'object': 'chat.completion.chunk',
+            'created': 0,
+            'model': 'deepseek-chat',
+            'choices': [{'index': 0, 'delta': {'content': rng.choice(SAMPLE_TOKENS)}, 'finish_reason': None}]
+        }
+        parts.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+
+    parts.append('data: [DONE]\n\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def make_response(payload):
+    """用内存中的字节构造一个 requests.Response，iter_lines/iter_content 和真实响应走同一套代码"""
+    response = requests.models.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(payload)
+    return response
+
+
+class CountingSink:
+    """写到 os.devnull，同时统计 write/flush 次数"""
+
+    def __init__(self):
+        self._devnull = open(os.devnull, 'w', encoding='utf-8')
+        self.writes = 0
+        self.flushes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return self._devnull.write(text)
+
+    def flush(self):
+        self.flushes += 1
+        self._devnull.flush()
+
+    def close(self):
+        self._devnull.close()
+
+
+def legacy_stream(payload):
+    """原实现：iter_lines 逐行 decode + 前缀判断，每个 token 一次 print(flush=True)"""
+    full_content = []
+
+    for line in make_response(payload).iter_lines():
+        if line:
+            line = line.decode('utf-8')
+
+            if line.startswith(':'):
+                continue
+
+            if line.startswith('data: '):
+                line = line[6:]
+
+            if line == '[DONE]':
+                break
+
+            try:
+                chunk = json.loads(line)
+
+                if 'choices' in chunk and len(chunk['choices']) > 0:
+                    delta = chunk['choices'][0].get('delta', {})
+                    content = delta.get('content', '')
+
+                    if content:
+                        print(content, end='', flush=True)
+                        full_content.append(content)
+
+            except json.JSONDecodeError:
+                continue
+
+    return ''.join(full_content)
+
+
+def current_stream(payload):
+    """现实现：直接调用 call_deepseek_api_stream()，HTTP 请求替换为回放"""
+    original = ai_processor.request_with_retry
+    ai_processor.request_with_retry = lambda *args, **kwargs: make_response(payload)
+    try:
+        return ai_processor.call_deepseek_api_stream('bench')
+    finally:
+        ai_processor.request_with_retry = original
+
+
+def run(func, payload, repeat):
+    """
+    Returns:
+        tuple: (最快耗时, 输出内容, 最后一次的 write 次数, 最后一次的 flush 次数)
+    """
+    best = None
+
+    for _ in range(repeat):
+        sink = CountingSink()
+        with contextlib.redirect_stdout(sink):
+            start = time.perf_counter()
+            content = func(payload)
+            elapsed = time.perf_counter() - start
+        sink.close()
+
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, content, sink.writes, sink.flushes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式响应解析性能测试')
+    parser.add_argument('--tokens', type=int, default=10_000, help='合成流的 token 事件数')
+    parser.add_argument('--file', help='回放录制的 SSE 原始响应文件，指定后忽略 --tokens')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'rb') as f:
+            payload = f.read()
+    else:
+        payload = generate_stream(args.tokens)
+
+    AI_CONFIG['deepseek_api_key'] = AI_CONFIG['deepseek_api_key'] or 'bench'
+
+    events = payload.count(b'\ndata:') + payload.startswith(b'data:')
+
+    legacy_time, legacy_content, legacy_writes, legacy_flushes = run(legacy_stream, payload, args.repeat)
+    current_time, current_content, current_writes, current_flushes = run(current_stream, payload, args.repeat)
+
+    if legacy_content != current_content:
+        raise SystemExit("❌ 两种实现解析出的内容不一致")
+
+    print(f"事件数: {events}，流大小: {len(payload) / 1024:.1f} KB")
+    print(f"{'实现':<8} {'耗时(s)':>10} {'事件/秒':>12} {'write':>8} {'flush':>8}")
+    print(f"{'原实现':<8} {legacy_time:>10.4f} {events / legacy_time:>12,.0f} {legacy_writes:>8} {legacy_flushes:>8}")
+    print(f"{'现实现':<8} {current_time:>10.4f} {events / current_time:>12,.0f} {current_writes:>8} {current_flushes:>8}")
+    print(f"加速比: {legacy_time / current_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# benchmarks/fake_deepseek.py
+"""
+本地的 DeepSeek API 替身
+
+- POST /chat/completions：流式请求按设定的首字延迟和 token 速率推送 SSE（chunked 编码，
+  与真实接口一样逐块到达）；非流式请求等待同样的总耗时后一次返回
+- GET /user/balance：返回固定余额
+- usage 中按与最近请求的公共前缀模拟上下文缓存（以 64 token 为单位，与 DeepSeek 相同），
+  返回 prompt_cache_hit_tokens / prompt_cache_miss_tokens
+
+用法：
+    python -m benchmarks.fake_deepseek --port 8765 --token-rate 50 --ttft 0.5
+    然后设置 DEEPSEEK_API_BASE=http://127.0.0.1:8765 DEEPSEEK_API_KEY=bench
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules.token_budget import estimate_tokens
+
+
+REPORT_TOKENS = [
+    '# ', '执行', '报告', '\n\n', '## ', '执行', '摘要', '\n', '- ', '中国区', '：', '成功', '\n',
+    '- ', '日本区', '：', '部分', '成功', '\n\n', '## ', 'MAA159', '\n', '刷取', ' 1-7', '，',
+    '使用', '理智', ' 180', '。', '\n', '## ', 'MAA', ' JP', '\n', '任务', '出错', '，',
+    '【重新', '执行', 'arkjp】', '\n'
+]
+
+BALANCE = {
+    'is_available': True,
+    'balance_infos': [{
+        'currency': 'CNY',
+        'total_balance': '100.00',
+        'granted_balance': '0.00',
+        'topped_up_balance': '100.00'
+    }]
+}
+
+
+# 上下文缓存的粒度（token）
+CACHE_UNIT_TOKENS = 64
+
+
+def _cache_usage(server, prompt):
+    """按与最近请求的最长公共前缀估算缓存命中的 token 数"""
+    with server.lock:
+        common = max((len(os.path.commonprefix([prompt, previous])) for previous in server.recent_prompts),
+                     default=0)
+        server.recent_prompts.append(prompt)
+
+    prompt_tokens = estimate_tokens(prompt)
+    hit = min(estimate_tokens(prompt[:common]) // CACHE_UNIT_TOKENS * CACHE_UNIT_TOKENS, prompt_tokens)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'prompt_cache_hit_tokens': hit,
+        'prompt_cache_miss_tokens': prompt_tokens - hit
+    }
+
+
+class FakeDeepSeekHandler(BaseHTTPRequestHandler):
+    """请求处理；速率等参数从 self.server 读取"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/user/balance':
+            self._send_json(BALANCE)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/chat/completions':
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+
+        prompt = '\n'.join(message.get('content', '') for message in request.get('messages', []))
+        output_tokens = min(server.output_tokens, request.get('max_tokens') or server.output_tokens)
+        tokens = [REPORT_TOKENS[i % len(REPORT_TOKENS)] for i in range(output_tokens)]
+        usage = _cache_usage(server, prompt)
+        usage['completion_tokens'] = output_tokens
+        usage['total_tokens'] = usage['prompt_tokens'] + output_tokens
+
+        if not request.get('stream'):
+            time.sleep(server.ttft + output_tokens / server.token_rate)
+            self._send_json({
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(tokens)}}],
+                'usage': usage
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        start = time.perf_counter() + server.ttft
+        for index, token in enumerate(tokens):
+            # 按绝对时间表发送，避免 sleep 误差累积
+            delay = start + index / server.token_rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            chunk = {'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+            self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+        if (request.get('stream_options') or {}).get('include_usage'):
+            self._write_chunk(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode('utf-8'))
+
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_server(port=0, token_rate=50.0, ttft=0.5, output_tokens=300):
+    """
+    在后台线程启动替身服务
+
+    Args:
+        port: 端口，0 表示自动分配
+        token_rate: 每秒输出的 token 数
+        ttft: 首个 token 之前的延迟（秒）
+        output_tokens: 每次回复的 token 数（不超过请求的 max_tokens）
+
+    Returns:
+        ThreadingHTTPServer: server.server_address 为实际地址，用完调用 server.shutdown()
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeDeepSeekHandler)
+    server.daemon_threads = True
+    server.token_rate = token_rate
+    server.ttft = ttft
+    server.output_tokens = output_tokens
+    server.request_count = 0
+    server.recent_prompts = deque(maxlen=8)
+    server.lock = threading.Lock()
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 DeepSeek API 替身')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--token-rate', type=float, default=50.0, help='每秒输出的 token 数')
+    parser.add_argument('--ttft', type=float, default=0.5, help='首个 token 之前的延迟（秒）')
+    parser.add_argument('--output-tokens', type=int, default=300, help='每次回复的 token 数')
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.token_rate, args.ttft, args.output_tokens)
+    host, port = server.server_address
+    print(f"🧪 DeepSeek 替身已启动: http://{host}:{port}（Ctrl+C 退出）")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+# benchmarks/synthetic_logs.py
+"""
+合成 MAA 风格的执行日志，并写入本地的测试数据库
+
+每个区域生成一次「最新执行」（指定行数）和若干较早的小执行，
+日志按 MAA 实例前后执行，包含重复的等待/重试行（触发日志压缩）和少量报错。
+
+用法（只会写入 BENCH_DB_* 指定的数据库，会重建日志表和 ai_reports 表）：
+    python -m benchmarks.synthetic_logs --lines 100000
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+
+import pymysql
+
+from modules.schema import CREATE_TABLES
+
+
+# 区域 -> (日志表, 前后执行的 MAA 实例, 实例结束时的完成提示)
+REGION_LAYOUT = {
+    'cn': ('arkcn_logs', ['MAA159', 'MAA177'], '{instance} 已完成所有任务'),
+    'jp': ('arkjp_logs', ['MAA CN', 'MAA JP'], '{instance} 任务完成')
+}
+
+TASK_MESSAGES = {
+    'StartUp': ['开始唤醒', '正在连接模拟器', '唤醒完成'],
+    'Fight': ['当前关卡: {stage}', '理智剩余 {sanity}', '开始行动', '识别到掉落: 固源岩 x{count}', '行动结束'],
+    'Infrast': ['进入基建', '制造站换班完成', '贸易站换班完成', '宿舍换班完成', '基建换班完成'],
+    'Recruit': ['公招识别结果: 近战位 先锋干员', '公招刷新', '已选择 {hours} 小时'],
+    'Visit': ['访问好友', '获得信用 {count}'],
+    'Mall': ['领取信用', '信用商店购买完成'],
+    'Award': ['领取日常奖励', '领取周常奖励']
+}
+
+STAGES = ['1-7', 'CE-6', 'LS-6', 'AP-5', 'SK-5']
+
+# 连续重复的行（等待、重试），模拟真实日志中浪费 token 的部分
+REPEATED_MESSAGES = ['理智不足，等待中', '等待游戏加载 {count} 秒', '识别失败，重试中']
+
+BENCH_DB_CONFIG = {
+    'host': os.getenv('BENCH_DB_HOST', '127.0.0.1'),
+    'port': int(os.getenv('BENCH_DB_PORT', 3306)),
+    'user': os.getenv('BENCH_DB_USER', 'root'),
+    'password': os.getenv('BENCH_DB_PASSWORD', ''),
+    'database': os.getenv('BENCH_DB_NAME', 'ark_report_bench'),
+    'charset': 'utf8mb4'
+}
+
+# 原表结构由日志采集端维护，这里只建出查询和写入用到的列
+BASE_TABLES = {
+    'log': """
+        CREATE TABLE {table} (
+            id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            execution_id VARCHAR(64) NOT NULL,
+            timestamp DATETIME NOT NULL,
+            log_message TEXT NOT NULL
+        ) DEFAULT CHARSET = utf8mb4
+    """,
+    'ai_reports': """
+        CREATE TABLE ai_reports (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            arkcn_execution_id VARCHAR(64) NOT NULL,
+            arkjp_execution_id VARCHAR(64) NOT NULL,
+            report_content LONGTEXT,
+            status VARCHAR(16) NOT NULL,
+            api_is_available TINYINT(1),
+            api_currency VARCHAR(8),
+            api_total_balance DECIMAL(12, 2),
+            api_granted_balance DECIMAL(12, 2),
+            api_topped_up_balance DECIMAL(12, 2),
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) DEFAULT CHARSET = utf8mb4
+    """
+}
+
+INSERT_BATCH_SIZE = 5000
+
+
+def check_bench_database():
+    """
+    防止误连生产库：测试库名不能与 .env 中的 DB_NAME 在同一主机上相同
+
+    Raises:
+        SystemExit: 配置指向生产库时
+    """
+    if (BENCH_DB_CONFIG['database'] == os.getenv('DB_NAME')
+            and BENCH_DB_CONFIG['host'] == os.getenv('DB_HOST')):
+        raise SystemExit("❌ BENCH_DB_* 指向了 .env 中的生产数据库，请使用单独的测试库")
+
+
+def iter_execution_rows(line_count, start, rng, instances, finish_template, fail_last=False):
+    """
+    生成一次执行的日志行
+
+    Args:
+        line_count: 行数
+        start: 第一行的时间
+        rng: random.Random
+        instances: 前后执行的 MAA 实例
+        finish_template: 实例结束时的完成提示
+        fail_last: 最后一个实例是否以任务出错结束（没有完成提示）
+
+    Yields:
+        tuple: (timestamp, log_message)
+    """
+    timestamp = start
+    per_instance = max(1, line_count // len(instances))
+    emitted = 0
+
+    for position, instance in enumerate(instances):
+        quota = per_instance if position < len(instances) - 1 else line_count - emitted
+        lines = []
+
+        lines.append(f"{instance} 开始任务: StartUp")
+        while len(lines) < quota - 1:
+            task = rng.choice(list(TASK_MESSAGES))
+            lines.append(f"开始任务: {task}")
+
+            for template in TASK_MESSAGES[task]:
+                lines.append(template.format(
+                    stage=rng.choice(STAGES),
+                    sanity=rng.randrange(200),
+                    count=rng.randrange(1, 30),
+                    hours=rng.choice([1, 9])
+                ))
+
+            if rng.random() < 0.3:
+                message = rng.choice(REPEATED_MESSAGES)
+                for _ in range(rng.randrange(3, 40)):
+                    lines.append(message.format(count=rng.randrange(1, 60)))
+
+            if rng.random() < 0.02:
+                lines.append(f"任务出错: {task}")
+
+        # 截到配额后再补上结尾行，保证每个实例都有完成提示（或出错）
+        lines = lines[:max(1, quota - 1)]
+
+        is_last = position == len(instances) - 1
+        if is_last and fail_last:
+            lines.append("任务出错: Fight")
+        else:
+            lines.append(finish_template.format(instance=instance))
+
+        for message in lines:
+            timestamp += timedelta(seconds=rng.choice([0, 1, 1, 2, 5]))
+            yield timestamp, f"[{timestamp:%H:%M:%S}] {message}"
+            emitted += 1
+
+
+def seed_database(lines_per_region, older_executions=3, seed=0, verbose=True):
+    """
+    重建测试库中的日志表和 ai_reports 表，并写入合成日志（之后需要运行 apply_migrations()）
+
+    Args:
+        lines_per_region: 每个区域最新执行的日志行数
+        older_executions: 每个区域额外生成的较早执行数（每个 1000 行）
+        seed: 随机种子
+        verbose: 是否打印进度
+
+    Returns:
+        dict: {region: 最新执行的 execution_id}
+    """
+    check_bench_database()
+
+    rng = random.Random(seed)
+    base_time = datetime(2026, 1, 1, 4, 0, 0)
+    latest = {}
+
+    conn = pymysql.connect(**BENCH_DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+
+        # 迁移创建的表（汇总表、指标表）也一起删掉，由 apply_migrations() 重新创建
+        for table in CREATE_TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+        cursor.execute("DROP TABLE IF EXISTS ai_reports")
+        cursor.execute(BASE_TABLES['ai_reports'])
+
+        for region, (table, instances, finish_template) in REGION_LAYOUT.items():
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(BASE_TABLES['log'].format(table=table))
+
+            executions = [(f"{region}-bench-{i:03d}", 1000) for i in range(older_executions)]
+            executions.append((f"{region}-bench-latest", lines_per_region))
+
+            for index, (execution_id, line_count) in enumerate(executions):
+                start = base_time + timedelta(days=index)
+                batch = []
+
+                for timestamp, message in iter_execution_rows(
+                        line_count, start, rng, instances, finish_template,
+                        fail_last=(index == len(executions) - 1 and region == 'jp')):
+                    batch.append((execution_id, timestamp, message))
+                    if len(batch) >= INSERT_BATCH_SIZE:
+                        cursor.executemany(
+                            f"INSERT INTO {table} (execution_id, timestamp, log_message) VALUES (%s, %s, %s)",
+                            batch
+                        )
+                        batch = []
+
+                if batch:
+                    cursor.executemany(
+                        f"INSERT INTO {table} (execution_id, timestamp, log_message) VALUES (%s, %s, %s)",
+                        batch
+                    )
+                conn.commit()
+
+            latest[region] = executions[-1][0]
+
+            if verbose:
+                print(f"   ✅ {table}: 最新执行 {lines_per_region} 行 + {older_executions} 个较早执行")
+
+        cursor.close()
+    finally:
+        conn.close()
+
+    return latest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='写入合成 MAA 日志到测试数据库')
+    parser.add_argument('--lines', type=int, default=10_000, help='每个区域最新执行的日志行数')
+    parser.add_argument('--older', type=int, default=3, help='每个区域额外生成的较早执行数')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"\n🧪 写入合成日志到 {BENCH_DB_CONFIG['host']}:{BENCH_DB_CONFIG['port']}/{BENCH_DB_CONFIG['database']}")
+    seed_database(args.lines, older_executions=args.older, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,12 @@
 # config/__init__.py
-from .database import DB_CONFIG
+"""配置包：各项配置在第一次访问时才读取（见 config/database.py）"""
 
-__all__ = ['DB_CONFIG']
\ No newline at end of file
+
+def __getattr__(name):
+    if name in __all__:
+        from . import database
+        return getattr(database, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['DB_CONFIG', 'DB_POOL_CONFIG']
@@ -1,25 +1,43 @@
 # config/database.py
-import os
-from dotenv import load_dotenv
-
-# 加载环境变量
-load_dotenv()
-
-# 数据库配置
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD'),
-    'database': os.getenv('DB_NAME'),
-    'charset': 'utf8mb4',
-    'port': int(os.getenv('DB_PORT', 3306))
-}
-
-# AI 配置
-AI_CONFIG = {
-    'deepseek_api_key': os.getenv('DEEPSEEK_API_KEY'),
-    'api_base': 'https://api.deepseek.com',
-    'model': 'deepseek-chat',
-    'temperature': 0.7,
-    'max_tokens': 2000
-}
\ No newline at end of file
+"""
+配置入口 - 各项配置定义在 config/settings.py，通过本模块访问（from config.database import DB_CONFIG）
+
+导入本模块不会读取 .env，也不会读取任何配置：第一次访问某项配置时才调用 load_env() 读取 .env，
+再执行 config/settings.py。不需要配置的命令（例如 show-prompts）因此不会加载 python-dotenv。
+"""
+import importlib
+import threading
+
+_lock = threading.Lock()
+_env_loaded = False
+
+
+def load_env():
+    """
+    读取 .env 中的环境变量（只读取一次，已存在的环境变量不会被覆盖）
+
+    第一次访问配置时会自动调用；需要在读取配置之前修改环境变量的调用方也可以先手动调用。
+    """
+    global _env_loaded
+
+    with _lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _env_loaded = True
+
+
+def __getattr__(name):
+    if not name.isupper():
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    load_env()
+    settings = importlib.import_module('config.settings')
+    try:
+        value = getattr(settings, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    # 之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
@@ -0,0 +1,223 @@
+# config/settings.py
+"""
+各项配置（从环境变量读取）
+
+不要直接导入本模块：通过 config.database 访问，第一次访问时会先读取 .env，再执行本模块。
+"""
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD'),
+    'database': os.getenv('DB_NAME'),
+    'charset': 'utf8mb4',
+    'port': int(os.getenv('DB_PORT', 3306))
+}
+
+# 数据库连接池配置
+DB_POOL_CONFIG = {
+    'max_size': int(os.getenv('DB_POOL_SIZE', 5)),           # 最大连接数
+    'ping_interval': int(os.getenv('DB_POOL_PING_INTERVAL', 30)),  # 空闲超过该秒数，借出前先 ping
+    'acquire_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10))   # 等待空闲连接的最长秒数
+}
+
+# 区域注册表：每个区域一张日志表
+# - name: 区域名（代码中的键，也是 ark_executions.region 的值）
+# - table: 日志表名
+# - label: 报告中的区域标题
+# - maa_instances: 该区域预期运行的 MAA 实例
+# 新增服务器时在这里添加一项，并加入环境变量 REGIONS 即可，各步骤都按注册表遍历区域
+REGION_REGISTRY = [
+    {'name': 'cn', 'table': 'arkcn_logs', 'label': '中国区 (arkcn)', 'maa_instances': ['MAA159', 'MAA177']},
+    {'name': 'jp', 'table': 'arkjp_logs', 'label': '日本区 (arkjp)', 'maa_instances': ['MAA CN', 'MAA JP']},
+    {'name': 'global', 'table': 'arkglobal_logs', 'label': '国际服 (arkglobal)', 'maa_instances': []},
+    {'name': 'tw', 'table': 'arktw_logs', 'label': '台服 (arktw)', 'maa_instances': []},
+    {'name': 'kr', 'table': 'arkkr_logs', 'label': '韩服 (arkkr)', 'maa_instances': []}
+]
+
+# 启用的区域（逗号分隔）；处理顺序以注册表为准
+ENABLED_REGIONS = [name.strip() for name in os.getenv('REGIONS', 'cn,jp').split(',') if name.strip()]
+
+# AI 配置
+AI_CONFIG = {
+    'deepseek_api_key': os.getenv('DEEPSEEK_API_KEY'),
+    'api_base': os.getenv('DEEPSEEK_API_BASE', 'https://api.deepseek.com'),
+    'model': 'deepseek-chat',
+    'temperature': 0.7,
+    'max_tokens': int(os.getenv('AI_MAX_TOKENS', 2000))
+}
+
+# DeepSeek HTTP 客户端配置（连接池、超时、重试）
+HTTP_CONFIG = {
+    'pool_size': int(os.getenv('HTTP_POOL_SIZE', 10)),
+    'connect_timeout': float(os.getenv('HTTP_CONNECT_TIMEOUT', 5)),     # 建立连接的超时
+    'balance_read_timeout': float(os.getenv('HTTP_BALANCE_READ_TIMEOUT', 10)),  # 余额查询的读取超时
+    'read_timeout': float(os.getenv('HTTP_READ_TIMEOUT', 60)),          # 普通调用的读取超时
+    'stream_read_timeout': float(os.getenv('HTTP_STREAM_READ_TIMEOUT', 120)),  # 流式调用两次数据之间的读取超时
+    'max_retries': int(os.getenv('HTTP_MAX_RETRIES', 3)),
+    'backoff_base': float(os.getenv('HTTP_BACKOFF_BASE', 1)),          # 第一次重试的基础等待秒数
+    'backoff_max': float(os.getenv('HTTP_BACKOFF_MAX', 30)),           # 单次重试的最长等待秒数
+    'stream_chunk_size': int(os.getenv('HTTP_STREAM_CHUNK_SIZE', 1024)),      # 流式响应每次读取的最大字节数
+    'stream_flush_interval': float(os.getenv('STREAM_FLUSH_INTERVAL', 0.05))  # 流式内容刷新到终端的间隔（秒）
+}
+
+# 时限配置：整次报告生成的总时限（各步骤只能使用剩余时间），以及流式调用的看门狗
+# （DeepSeek 排队时会一直发送心跳，读取超时不会触发，看门狗按实际生成的内容计时）
+DEADLINE_CONFIG = {
+    'report_seconds': float(os.getenv('REPORT_DEADLINE', 600)),                 # 整次报告生成的总时限，0 表示不限
+    'first_token_timeout': float(os.getenv('STREAM_FIRST_TOKEN_TIMEOUT', 60)),  # 流式调用最多等待首字多少秒
+    'idle_timeout': float(os.getenv('STREAM_IDLE_TIMEOUT', 30))                 # 首字之后最多多少秒没有新内容
+}
+
+# 对冲请求配置：流式调用等待首字超过历史首字延迟的分位数时，再发出一个相同的请求，
+# 使用先生成内容的那个，另一个立即断开（已发送的 prompt 仍会计费，所以按小时限制次数）
+HEDGE_CONFIG = {
+    'enabled': os.getenv('HEDGED_REQUESTS', 'false').lower() == 'true',
+    'percentile': float(os.getenv('HEDGE_PERCENTILE', 95)),       # 历史首字延迟的分位数，超过时发出对冲请求
+    'history': int(os.getenv('HEDGE_HISTORY', 200)),              # 使用指标文件中最近多少次生成的首字延迟
+    'min_samples': int(os.getenv('HEDGE_MIN_SAMPLES', 20)),       # 样本少于该数时使用 default_delay
+    'default_delay': float(os.getenv('HEDGE_DEFAULT_DELAY', 20)),  # 没有足够历史时等待首字多少秒后发出对冲请求
+    'min_delay': float(os.getenv('HEDGE_MIN_DELAY', 3)),          # 等待首字的下限（避免历史很快时频繁对冲）
+    'max_per_hour': float(os.getenv('HEDGE_MAX_PER_HOUR', 6)),    # 每小时最多发出的对冲请求数
+    'burst': int(os.getenv('HEDGE_BURST', 2)),                    # 允许连续发出的对冲请求数
+    # 对冲次数的令牌桶保存在本地文件中，多次运行（命令行、守护进程、补生成）共用同一个上限
+    'state_path': os.getenv('HEDGE_STATE_FILE', 'hedge_budget.json')
+}
+
+# API 余额缓存配置（多次运行共用本地文件，过期时在后台刷新，报告流程不等待余额查询）
+BALANCE_CACHE_CONFIG = {
+    'enabled': os.getenv('BALANCE_CACHE', 'true').lower() == 'true',
+    'ttl_seconds': int(os.getenv('BALANCE_CACHE_TTL', 600)),              # 超过该秒数视为过期，触发后台刷新
+    'path': os.getenv('BALANCE_CACHE_FILE', 'balance_cache.json'),        # 缓存文件
+    'exit_wait_seconds': float(os.getenv('BALANCE_CACHE_EXIT_WAIT', 5))   # 命令行退出前最多等待后台刷新完成的秒数
+}
+
+# 报告流水线配置
+PIPELINE_CONFIG = {
+    # 流式读取日志：服务端游标 + 生成器逐级处理，峰值内存约等于最终 prompt 大小
+    # 日志只能读一遍：同时开启本地规则判定时必须开启日志分段（先分段再判定），否则加载配置时报错
+    'stream_logs': os.getenv('LOG_STREAMING', 'false').lower() == 'true',
+    # 并行执行步骤1和步骤2：各区域日志查询与余额查询同时进行（余额缓存关闭时才有余额查询）
+    'concurrent_fetch': os.getenv('CONCURRENT_FETCH', 'true').lower() == 'true'
+}
+
+# 日志压缩配置（合并连续重复的日志行）
+COMPACTION_CONFIG = {
+    'enabled': os.getenv('LOG_COMPACTION', 'true').lower() == 'true',
+    'min_repeat': int(os.getenv('LOG_COMPACTION_MIN_REPEAT', 3)),  # 连续出现多少次才合并
+    'normalize_numbers': os.getenv('LOG_COMPACTION_NORMALIZE_NUMBERS', 'true').lower() == 'true'  # 只有数字不同也算重复
+}
+
+# 提示词布局配置
+PROMPT_CONFIG = {
+    # 缓存友好布局：系统提示词和模板中的全部说明作为逐字节稳定的前缀，日志放在最后，
+    # 便于命中 DeepSeek 的上下文缓存（命中部分计费更低、首字更快）
+    'cache_friendly': os.getenv('PROMPT_CACHE_LAYOUT', 'true').lower() == 'true'
+}
+
+# 本地规则判定配置（规则见 config/rules.json）
+RULES_CONFIG = {
+    'enabled': os.getenv('RULE_ENGINE', 'true').lower() == 'true',
+    'path': os.getenv('RULES_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json')),
+    # 所有 MAA 都明确成功时直接生成模板报告，不调用 AI；否则只把失败/无法判定的区域完整发给 AI
+    'skip_llm': os.getenv('RULES_SKIP_LLM', 'true').lower() == 'true'
+}
+
+# 日志分段配置：每个区域按 MAA 切分，每段只保留开头、结尾和关键行附近的日志，其余行只记录省略了多少行
+# （关键行为 config/rules.json 中的各类标记和 context 关键词）
+SEGMENT_CONFIG = {
+    'enabled': os.getenv('LOG_SEGMENTATION', 'true').lower() == 'true',
+    'head_lines': int(os.getenv('LOG_SEGMENT_HEAD_LINES', 20)),        # 每段保留开头多少行
+    'tail_lines': int(os.getenv('LOG_SEGMENT_TAIL_LINES', 20)),        # 每段保留结尾多少行
+    'context_lines': int(os.getenv('LOG_SEGMENT_CONTEXT_LINES', 3)),   # 关键行前后各保留多少行
+    'min_lines': int(os.getenv('LOG_SEGMENT_MIN_LINES', 200))          # 不超过该行数的段原样保留
+}
+
+# Token 预算配置（日志过长时分段摘要后再汇总）
+TOKEN_BUDGET_CONFIG = {
+    'enabled': os.getenv('TOKEN_BUDGET', 'true').lower() == 'true',
+    'max_prompt_tokens': int(os.getenv('TOKEN_BUDGET_MAX_PROMPT_TOKENS', 48000)),  # 超过该值启用分段摘要
+    'chunk_tokens': int(os.getenv('TOKEN_BUDGET_CHUNK_TOKENS', 16000)),  # 每段日志的 token 上限
+    'chunk_max_tokens': int(os.getenv('TOKEN_BUDGET_CHUNK_MAX_TOKENS', 800)),  # 每段摘要的输出上限
+    'max_workers': int(os.getenv('TOKEN_BUDGET_MAX_WORKERS', 4))  # 并行摘要的请求数
+}
+
+# 按区域并行生成配置：每个区域单独发起一个流式请求（区域提示词见 prompts/region_prompt.txt），
+# 各区域的段落按区域顺序拼接，最后的总结在本地拼装或用一次简短的 AI 调用生成（prompts/merge_prompt.txt）
+REGION_PARALLEL_CONFIG = {
+    'enabled': os.getenv('PARALLEL_REGIONS', 'false').lower() == 'true',
+    'merge': os.getenv('PARALLEL_REGIONS_MERGE', 'local'),                       # 'local' 或 'llm'
+    'region_max_tokens': int(os.getenv('PARALLEL_REGIONS_MAX_TOKENS', 1200)),    # 每个区域段落的输出上限
+    'merge_max_tokens': int(os.getenv('PARALLEL_REGIONS_MERGE_MAX_TOKENS', 500))  # 总结的输出上限（merge 为 llm 时）
+}
+
+# 报告缓存配置（同一执行ID对 + 相同提示词/模型配置时直接复用已完成的报告）
+REPORT_CACHE_CONFIG = {
+    'enabled': os.getenv('REPORT_CACHE', 'true').lower() == 'true'
+}
+
+# 实时增量报告配置（执行仍在进行中时，只把新增日志和之前的摘要发给 AI）
+LIVE_CONFIG = {
+    'max_rows': int(os.getenv('LIVE_MAX_ROWS', 20000)),                 # 每批最多读取的新日志行数
+    'summary_max_tokens': int(os.getenv('LIVE_SUMMARY_MAX_TOKENS', 1000)),  # 滚动摘要的输出上限
+    'interval': int(os.getenv('LIVE_INTERVAL', 300))                    # --watch 时两次更新之间的秒数
+}
+
+# 守护进程配置（持续监听新的执行记录）
+DAEMON_CONFIG = {
+    'poll_interval': int(os.getenv('DAEMON_POLL_INTERVAL', 60)),     # 轮询间隔（秒）
+    'settle_seconds': int(os.getenv('DAEMON_SETTLE_SECONDS', 300)),  # 最后一条日志之后静默多久视为执行结束
+    'pair_timeout': int(os.getenv('DAEMON_PAIR_TIMEOUT', 7200)),     # 只有一个区域有新执行时，结束后最多等待另一个区域多久
+    # 生成失败的执行对按指数退避重试（retry_base_seconds、2 倍、4 倍……不超过 retry_max_seconds），
+    # 连续失败 retry_max_attempts 次后放弃，直到出现新的执行
+    'retry_max_attempts': int(os.getenv('DAEMON_RETRY_MAX_ATTEMPTS', 5)),
+    'retry_base_seconds': int(os.getenv('DAEMON_RETRY_BASE_SECONDS', 60)),
+    'retry_max_seconds': int(os.getenv('DAEMON_RETRY_MAX_SECONDS', 3600))
+}
+
+# 历史补生成配置
+BACKFILL_CONFIG = {
+    'concurrency': int(os.getenv('BACKFILL_CONCURRENCY', 3)),          # 同时生成的报告数
+    'rate_per_minute': float(os.getenv('BACKFILL_RATE_PER_MINUTE', 20)),  # 每分钟最多发往 DeepSeek 的请求数
+    'burst': int(os.getenv('BACKFILL_BURST', 3)),                      # 允许的突发请求数
+    'max_pair_gap': int(os.getenv('BACKFILL_MAX_PAIR_GAP', 3 * 3600)),  # 各区域执行开始时间最多相差多少秒才配为一组
+    'state_file': os.getenv('BACKFILL_STATE_FILE', 'backfill_state.json')  # 断点续跑状态文件
+}
+
+# 流式生成时把部分内容写入报告记录的配置
+STREAM_PERSIST_CONFIG = {
+    'enabled': os.getenv('STREAM_PERSIST', 'true').lower() == 'true',
+    'interval_seconds': float(os.getenv('STREAM_PERSIST_INTERVAL', 3)),  # 距上次写入超过该秒数才写
+    'min_chars': int(os.getenv('STREAM_PERSIST_MIN_CHARS', 200)),         # 或新增内容超过该字符数才写
+    'stale_seconds': int(os.getenv('STREAM_PERSIST_STALE_SECONDS', 900))  # generating 记录多久没更新视为中断
+}
+
+# 报告写入队列配置：ai_reports 的写入先追加到本地预写日志（校验和 + fsync），
+# 由后台线程分批写入数据库，数据库变慢或短暂不可用时报告流程不等待、已生成的内容也不会丢失
+# （需先运行 migrate.py 添加 client_report_key 列）
+OUTBOX_CONFIG = {
+    'enabled': os.getenv('REPORT_OUTBOX', 'true').lower() == 'true',
+    'dir': os.getenv('REPORT_OUTBOX_DIR', 'report_outbox'),                    # 预写日志目录（每个进程一个文件）
+    'fsync': os.getenv('REPORT_OUTBOX_FSYNC', 'true').lower() == 'true',       # 每次追加后 fsync
+    'batch_size': int(os.getenv('REPORT_OUTBOX_BATCH_SIZE', 50)),              # 每个事务最多写入的记录数
+    'retry_base': float(os.getenv('REPORT_OUTBOX_RETRY_BASE', 1)),             # 写入失败后第一次重试的等待秒数
+    'retry_max': float(os.getenv('REPORT_OUTBOX_RETRY_MAX', 60)),              # 重试等待的上限
+    'stale_seconds': int(os.getenv('REPORT_OUTBOX_STALE_SECONDS', 300)),       # 其他进程的文件多久没更新视为遗留，启动时重放
+    'resolve_wait_seconds': float(os.getenv('REPORT_OUTBOX_RESOLVE_WAIT', 2)),  # 报告完成时最多等待多久拿到 report_id
+    'exit_wait_seconds': float(os.getenv('REPORT_OUTBOX_EXIT_WAIT', 10))       # 命令行退出前最多等待队列写完的秒数
+}
+
+# 报告指标配置（各步骤耗时、首字延迟、生成速度、token 用量）
+METRICS_CONFIG = {
+    'enabled': os.getenv('METRICS', 'true').lower() == 'true',
+    'jsonl_path': os.getenv('METRICS_FILE', 'report_metrics.jsonl'),     # 每次生成追加一行 JSON
+    'persist_db': os.getenv('METRICS_DB', 'false').lower() == 'true'     # 同时写入 ai_report_metrics 表
+}
+
+
+# 流式读取的日志只能读一遍，本地规则判定要在分段结果（列表）上进行
+if PIPELINE_CONFIG['stream_logs'] and RULES_CONFIG['enabled'] and not SEGMENT_CONFIG['enabled']:
+    raise ValueError("LOG_STREAMING=true 时本地规则判定（RULE_ENGINE）需要开启日志分段（LOG_SEGMENTATION），"
+                     "或关闭其中一项")
@@ -0,0 +1,45 @@
+# daemon.py
+"""
+AI 报告生成系统 - 守护进程入口
+
+常驻运行，轮询日志表中新的执行记录，
+所有区域的新执行都结束后自动生成报告。
+
+用法：
+    python daemon.py
+    python daemon.py --interval 30 --settle 600
+
+停止：
+    发送 SIGTERM（例如 systemctl stop / kill），当前报告完成后退出
+"""
+import argparse
+
+from modules.daemon import run_daemon
+
+
+def main():
+    """守护进程入口"""
+    parser = argparse.ArgumentParser(description='AI 报告生成系统 - 守护进程')
+    parser.add_argument('--interval', type=int, help='轮询间隔（秒）')
+    parser.add_argument('--settle', type=int, help='最后一条日志之后静默多久视为执行结束（秒）')
+    parser.add_argument('--stream', action='store_true', help='在终端实时输出 AI 生成内容')
+    args = parser.parse_args()
+
+    try:
+        run_daemon(poll_interval=args.interval, settle_seconds=args.settle, stream=args.stream)
+        return 0
+
+    except KeyboardInterrupt:
+        print("\n\n⚠️  守护进程被强制中断")
+        return 2
+
+    except Exception as e:
+        print(f"\n\n❌ 守护进程出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return 3
+
+
+if __name__ == '__main__':
+    exit_code = main()
+    exit(exit_code)
@@ -7,20 +7,48 @@ AI 报告生成系统 - 主程序入口
 2. 调用 DeepSeek AI 分析日志
 3. 生成结构化的执行报告
 4. 保存到数据库
+
+用法：
+    python main.py                    # 生成报告（已有相同报告时直接复用），等同于 generate
+    python main.py generate --force   # 忽略报告缓存，强制重新生成
+    python main.py balance            # 查询 DeepSeek API 余额
+    python main.py show-prompts       # 显示当前使用的提示词
+    python main.py recover-stalled    # 把长时间未更新的 generating 记录标记为失败
+    python main.py live --watch       # 进行中的执行：只发送新增日志，持续更新进度摘要
+    python main.py replay-outbox      # 把其他进程遗留在本地写入队列中的报告写入数据库
+
+各子命令只导入自己用到的模块（例如 show-prompts 不加载 requests/pymysql），
+因此查看提示词、查询余额等命令启动很快。
 """
-from modules import generate_ai_report
+import argparse
 
 
-def main():
-    """主程序入口"""
+def cmd_generate(args):
+    """生成报告"""
+    from modules import generate_ai_report
+    from modules.report_outbox import close_outbox, replay_orphans
+
     print("\n")
     print("╔" + "=" * 78 + "╗")
     print("║" + " " * 20 + "AI 报告生成系统" + " " * 43 + "║")
     print("╚" + "=" * 78 + "╝")
 
     try:
+        # 之前的进程退出时没能写入数据库的报告，先补写
+        try:
+            replay_orphans()
+        except Exception as e:
+            print(f"⚠️  重放写入队列失败（不影响本次生成）: {e}")
+
         # 生成报告（使用流式输出）
-        result = generate_ai_report(stream=True)
+        result = generate_ai_report(stream=True, force=args.force)
+
+        # 余额缓存过期时在后台刷新，退出前稍等它写入缓存文件，供下次运行使用
+        from modules.balance_cache import wait_for_refresh
+        wait_for_refresh()
+
+        # 等待写入队列写完；数据库仍不可用时记录保留在本地，下次启动时重放
+        close_outbox()
 
         # 根据结果决定退出码
         if result['success']:
@@ -41,6 +69,117 @@ def main():
         return 3
 
 
+def cmd_balance(args):
+    """查询 API 余额（同时更新余额缓存）"""
+    from modules import check_balance
+    from modules.balance_cache import write_cached_balance
+
+    balance = check_balance(show_detail=True)
+    write_cached_balance(balance)
+    return 0 if balance.get('balance_infos') else 1
+
+
+def cmd_show_prompts(args):
+    """显示当前使用的提示词"""
+    from modules.prompts import show_current_prompts
+
+    show_current_prompts()
+    return 0
+
+
+def cmd_recover_stalled(args):
+    """把长时间未更新的 generating 记录标记为失败"""
+    from config.database import STREAM_PERSIST_CONFIG
+    from modules.db_query import recover_stalled_reports
+
+    recovered = recover_stalled_reports(STREAM_PERSIST_CONFIG['stale_seconds'])
+    print(f"\n🩹 已恢复 {recovered} 条中断的 generating 报告记录")
+    return 0
+
+
+def cmd_replay_outbox(args):
+    """把遗留在本地写入队列中的报告写入数据库"""
+    from modules.report_outbox import replay_orphans
+
+    summary = replay_orphans(stale_seconds=args.stale_seconds)
+    if not summary['files']:
+        print("\n📮 没有需要重放的写入队列文件")
+    return 1 if summary['failed'] else 0
+
+
+def cmd_live(args):
+    """更新进行中执行的实时进度摘要"""
+    from config.database import LIVE_CONFIG
+    from modules.live import run_live
+
+    execution_ids = {args.regions[0]: args.execution_id} if args.execution_id else None
+    interval = (args.interval or LIVE_CONFIG['interval']) if args.watch else None
+
+    try:
+        results = run_live(regions=args.regions, execution_ids=execution_ids, watch_interval=interval)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  用户中断程序")
+        return 2
+
+    return 0 if all(result is not None for result in results.values()) else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='AI 报告生成系统')
+    # 兼容旧用法：python main.py [--force] [--recover-stalled]
+    parser.add_argument('--force', action='store_true', help='忽略报告缓存，强制重新生成')
+    parser.add_argument('--recover-stalled', action='store_true',
+                        help='把长时间未更新的 generating 记录标记为失败（保留已生成的部分内容）')
+
+    subparsers = parser.add_subparsers(dest='command', metavar='命令')
+
+    generate = subparsers.add_parser('generate', help='生成报告（默认）')
+    generate.add_argument('--force', action='store_true', default=argparse.SUPPRESS,
+                          help='忽略报告缓存，强制重新生成')
+    generate.set_defaults(handler=cmd_generate)
+
+    balance = subparsers.add_parser('balance', help='查询 DeepSeek API 余额')
+    balance.set_defaults(handler=cmd_balance)
+
+    show_prompts = subparsers.add_parser('show-prompts', help='显示当前使用的提示词')
+    show_prompts.set_defaults(handler=cmd_show_prompts)
+
+    recover = subparsers.add_parser('recover-stalled', help='把长时间未更新的 generating 记录标记为失败')
+    recover.set_defaults(handler=cmd_recover_stalled)
+
+    replay = subparsers.add_parser('replay-outbox', help='把其他进程遗留在本地写入队列中的报告写入数据库')
+    replay.add_argument('--stale-seconds', type=int,
+                        help='文件多久没有更新视为遗留（默认 REPORT_OUTBOX_STALE_SECONDS；'
+                             '设为 0 会同时重放正在运行的进程的文件，只在确认没有其他进程时使用）')
+    replay.set_defaults(handler=cmd_replay_outbox)
+
+    live = subparsers.add_parser('live', help='进行中的执行：增量读取新日志，更新实时进度摘要')
+    live.add_argument('--region', dest='regions', action='append', metavar='REGION',
+                      help='只更新指定区域（可重复），默认全部启用的区域')
+    live.add_argument('--execution-id', help='指定执行ID（需同时指定一个 --region），默认最新的执行')
+    live.add_argument('--watch', action='store_true', help='持续更新，直到 Ctrl+C')
+    live.add_argument('--interval', type=int, help='--watch 时两次更新之间的秒数（默认 LIVE_INTERVAL）')
+    live.set_defaults(handler=cmd_live)
+
+    return parser
+
+
+def main():
+    """主程序入口"""
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.command == 'live' and args.execution_id and len(args.regions or []) != 1:
+        parser.error('--execution-id 需要同时指定一个 --region')
+
+    if args.command is None:
+        handler = cmd_recover_stalled if args.recover_stalled else cmd_generate
+    else:
+        handler = args.handler
+
+    return handler(args)
+
+
 if __name__ == '__main__':
     exit_code = main()
-    exit(exit_code)
\ No newline at end of file
+    exit(exit_code)
@@ -0,0 +1,55 @@
+# migrate.py
+"""
+数据库迁移 / 初始化脚本
+
+功能：
+1. 创建辅助表（执行记录汇总表、水位线表），为已有表添加新列
+2. 为日志表和报告表添加索引
+3. 全量构建执行记录汇总（已有数据）
+
+用法：
+    python migrate.py                 # 迁移 + 全量构建汇总
+    python migrate.py --skip-bootstrap  # 只迁移表结构
+    python migrate.py --refresh       # 只按水位线增量更新汇总
+"""
+import argparse
+
+from modules.executions import bootstrap_execution_summary, refresh_execution_summary
+from modules.schema import apply_migrations
+
+
+def main():
+    """迁移脚本入口"""
+    parser = argparse.ArgumentParser(description='AI 报告系统数据库迁移')
+    parser.add_argument('--skip-bootstrap', action='store_true', help='只迁移表结构，不构建执行记录汇总')
+    parser.add_argument('--refresh', action='store_true', help='只按水位线增量更新执行记录汇总')
+    args = parser.parse_args()
+
+    try:
+        if args.refresh:
+            print("\n🔄 增量更新执行记录汇总...")
+            updated = refresh_execution_summary()
+            for region, count in updated.items():
+                print(f"   ✅ {region}: 更新 {count} 个执行")
+            return 0
+
+        print("\n🛠️  迁移表结构...")
+        apply_migrations()
+
+        if not args.skip_bootstrap:
+            print("\n📦 构建执行记录汇总...")
+            bootstrap_execution_summary()
+
+        print("\n✅ 迁移完成")
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ 迁移失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == '__main__':
+    exit_code = main()
+    exit(exit_code)
@@ -1,26 +1,45 @@
 # modules/__init__.py
-from .db_query import (
-    get_latest_logs,
-    create_ai_report_placeholder,
-    update_ai_report
-)
-from .log_filter import filter_logs
-from .ai_processor import process_with_ai, check_balance
-from .report_generator import generate_ai_report
-
-__all__ = [
+"""
+按需导入：访问下面的名字时才导入对应子模块，
+只用到部分功能的命令（例如查看提示词、查询余额）不会加载 pymysql/requests。
+"""
+import importlib
+
+# 导出名 -> 所在子模块
+_EXPORTS = {
     # 数据库查询
-    'get_latest_logs',
-    'create_ai_report_placeholder',
-    'update_ai_report',
+    'get_latest_logs': 'db_query',
+    'create_report_placeholder': 'db_query',
+    'create_ai_report_placeholder': 'db_query',
+    'update_ai_report': 'db_query',
+
+    # 数据库连接池
+    'get_connection': 'db_pool',
+    'transaction': 'db_pool',
+    'close_pool': 'db_pool',
 
     # 日志过滤
-    'filter_logs',
+    'filter_logs': 'log_filter',
 
     # AI 处理
-    'process_with_ai',
-    'check_balance',
+    'process_with_ai': 'ai_processor',
+    'check_balance': 'ai_processor',
 
     # 报告生成（主流程）
-    'generate_ai_report'
-]
\ No newline at end of file
+    'generate_ai_report': 'report_generator'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value  # 之后直接从模块字典取，不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -3,52 +3,174 @@
 AI 处理模块 - 使用 DeepSeek API 分析日志并生成报告
 """
 import requests
+import contextvars
+import hashlib
+import io
+import itertools
 import json
+import queue
+import random
+import threading
 import time
 import sys
-import os
-from config.database import AI_CONFIG
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from config.database import (
+    AI_CONFIG, HTTP_CONFIG, TOKEN_BUDGET_CONFIG, COMPACTION_CONFIG, PROMPT_CONFIG, RULES_CONFIG, SEGMENT_CONFIG,
+    REGION_PARALLEL_CONFIG, DEADLINE_CONFIG, HEDGE_CONFIG
+)
 from datetime import datetime
+from modules.deadline import Deadline, DeadlineExceeded
+from modules.hedging import hedge_delay, try_acquire_hedge
+from modules.token_budget import estimate_tokens, split_lines_by_tokens
+from modules.sse import BufferedWriter, iter_sse_data
+from modules.prompts import get_prompt, load_prompt_from_file, reload_prompts, show_current_prompts, split_template
+from modules.regions import REGIONS
+from modules.rules import load_rules
 
 # ============================================================================
-# 提示词配置区域 - 可以在这里自定义提示词
+# 提示词 - 保存在 prompts/ 目录下，第一次使用时才读取（见 modules/prompts.py）
 # ============================================================================
-def load_prompt_from_file(filename):
-    """
-    从文件加载提示词
 
-    Args:
-        filename: 文件名（相对于 prompts/ 目录）
+# 兼容旧代码：ai_processor.SYSTEM_PROMPT 等属性按需从 modules.prompts 读取
+_PROMPT_ATTRIBUTES = {
+    'SYSTEM_PROMPT': 'system',
+    'USER_PROMPT_TEMPLATE': 'user',
+    'CHUNK_PROMPT_TEMPLATE': 'chunk'
+}
+
+
+def __getattr__(name):
+    if name in _PROMPT_ATTRIBUTES:
+        return get_prompt(_PROMPT_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ============================================================================
+# 以下是功能代码 - 一般不需要修改
+# ============================================================================
+
+# ============================================================================
+# HTTP 客户端 - 所有 DeepSeek 请求共用一个连接池（keep-alive，避免每次都重新 TLS 握手）
+# ============================================================================
+
+# 需要重试的状态码：限流和服务端临时错误
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """
+    获取全局 HTTP 会话（首次调用时创建）
 
     Returns:
-        文件内容字符串
+        requests.Session
     """
-    # 获取项目根目录
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(current_dir)
-    prompt_file = os.path.join(project_root, 'prompts', filename)
+    global _http_session
 
-    try:
-        with open(prompt_file, 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        raise FileNotFoundError(f"提示词文件未找到: {prompt_file}")
-    except Exception as e:
-        raise Exception(f"读取提示词文件失败: {e}")
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_CONFIG['pool_size'],
+                    pool_maxsize=HTTP_CONFIG['pool_size'],
+                    max_retries=0  # 重试由 request_with_retry() 统一处理
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _http_session = session
 
+    return _http_session
 
-# 从文件加载提示词
-try:
-    SYSTEM_PROMPT = load_prompt_from_file('system_prompt.txt')
-    USER_PROMPT_TEMPLATE = load_prompt_from_file('user_prompt.txt')
-except Exception as e:
-    print(f"⚠️  警告: {e}")
 
+def _retry_delay(attempt, response=None):
+    """
+    计算第 attempt 次重试前的等待秒数
 
+    优先使用服务端返回的 Retry-After（秒数或 HTTP 日期），
+    否则使用带随机抖动的指数退避（full jitter）。
+    """
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+
+    if retry_after:
+        try:
+            return min(float(retry_after), HTTP_CONFIG['backoff_max'])
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                return min(max(seconds, 0), HTTP_CONFIG['backoff_max'])
+            except (TypeError, ValueError):
+                pass
+
+    ceiling = min(HTTP_CONFIG['backoff_base'] * (2 ** attempt), HTTP_CONFIG['backoff_max'])
+    return random.uniform(0, ceiling)
+
+
+def request_with_retry(method, url, read_timeout=None, deadline=None, limiter=None, **kwargs):
+    """
+    通过共享会话发送请求，遇到 429/5xx 和连接错误时自动重试
+
+    读取超时不重试：请求可能已经在服务端执行（生成内容会计费），
+    重试只会重复付费，交给上层按失败处理。
+
+    Args:
+        method: 'GET' / 'POST'
+        url: 请求地址
+        read_timeout: 读取超时秒数，None 时使用 HTTP_CONFIG['read_timeout']，0 表示不限（仍受 deadline 限制）
+        deadline: 可选，Deadline；连接/读取超时不超过剩余时间，剩余时间不够等待重试时直接失败
+        limiter: 可选，限流器（带 acquire(timeout=) 方法，如 TokenBucket），每次请求（包括重试）前取一个令牌，
+                 剩余时间内取不到时直接失败
+        **kwargs: 传给 requests 的其他参数（headers、json、stream 等）
+
+    Returns:
+        requests.Response（状态码已检查）
+    """
+    session = get_http_session()
+    deadline = deadline or Deadline()
+    max_retries = HTTP_CONFIG['max_retries']
+    if read_timeout is None:
+        read_timeout = HTTP_CONFIG['read_timeout']
+
+    for attempt in range(max_retries + 1):
+        deadline.check('无法发出 DeepSeek 请求')
+
+        if limiter is not None:
+            try:
+                limiter.acquire(timeout=deadline.remaining())
+            except TimeoutError:
+                raise DeadlineExceeded(f"超过报告生成时限（{deadline.seconds:.0f} 秒），等不到 DeepSeek 限流令牌")
+
+        timeout = (deadline.clamp(HTTP_CONFIG['connect_timeout']),
+                   deadline.clamp(read_timeout or None))
+
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+            if attempt >= max_retries:
+                raise
+            reason = f"连接失败: {e}"
+            delay = _retry_delay(attempt)
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                response.raise_for_status()
+                return response
+
+            reason = f"HTTP {response.status_code}"
+            delay = _retry_delay(attempt, response)
+            response.close()
+
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            raise DeadlineExceeded(f"超过报告生成时限（{deadline.seconds:.0f} 秒），"
+                                   f"请求失败（{reason}）且剩余时间不够重试")
+
+        print(f"   ⚠️  请求失败（{reason}），{delay:.1f} 秒后重试 ({attempt + 1}/{max_retries})")
+        time.sleep(delay)
 
-# ============================================================================
-# 以下是功能代码 - 一般不需要修改
-# ============================================================================
 
 def check_balance(show_detail=True):
     """
@@ -73,8 +195,11 @@ def check_balance(show_detail=True):
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+        response = request_with_retry(
+            'GET', url,
+            headers=headers,
+            read_timeout=HTTP_CONFIG['balance_read_timeout']
+        )
 
         balance_data = response.json()
 
@@ -112,6 +237,39 @@ def check_balance(show_detail=True):
         raise Exception(f"查询余额失败: {e}")
 
 
+def _iter_region_header(info, region):
+    """生成单个区域的头部信息行（info 为区域注册表中的一项）"""
+    yield f"【{info['label']}】"
+    if info['maa_instances']:
+        yield f"预期 MAA 实例: {', '.join(info['maa_instances'])}"
+    yield f"执行ID: {region['execution_id']}"
+    yield f"开始时间: {region['start_time']}"
+    yield f"结束时间: {region['end_time']}"
+    yield f"日志条数: {region['line_count']} 条"
+    yield ""
+    yield "执行日志:"
+
+
+def iter_log_lines(filtered_data):
+    """
+    逐行生成发送给 AI 的日志文本（不含换行符）
+
+    Args:
+        filtered_data: 从 filter_logs() 获取的数据
+
+    Yields:
+        str: 一行文本
+    """
+    for info in REGIONS:
+        region = filtered_data.get(info['name'])
+        if not region:
+            continue
+
+        yield from _iter_region_header(info, region)
+        yield from region['logs']
+        yield ""
+
+
 def format_logs_for_ai(filtered_data):
     """
     将过滤后的数据格式化为发送给 AI 的文本
@@ -122,35 +280,7 @@ def format_logs_for_ai(filtered_data):
     Returns:
         格式化的文本字符串
     """
-    lines = []
-
-    # 中国区
-    if filtered_data['cn']:
-        cn = filtered_data['cn']
-        lines.append("【中国区 (arkcn)】")
-        lines.append(f"执行ID: {cn['execution_id']}")
-        lines.append(f"开始时间: {cn['start_time']}")
-        lines.append(f"结束时间: {cn['end_time']}")
-        lines.append(f"日志条数: {len(cn['logs'])} 条")
-        lines.append("")
-        lines.append("执行日志:")
-        lines.extend(cn['logs'])
-        lines.append("")
-
-    # 日本区
-    if filtered_data['jp']:
-        jp = filtered_data['jp']
-        lines.append("【日本区 (arkjp)】")
-        lines.append(f"执行ID: {jp['execution_id']}")
-        lines.append(f"开始时间: {jp['start_time']}")
-        lines.append(f"结束时间: {jp['end_time']}")
-        lines.append(f"日志条数: {len(jp['logs'])} 条")
-        lines.append("")
-        lines.append("执行日志:")
-        lines.extend(jp['logs'])
-        lines.append("")
-
-    return "\n".join(lines)
+    return "\n".join(iter_log_lines(filtered_data))
 
 
 def create_prompt(log_content):
@@ -164,37 +294,112 @@ def create_prompt(log_content):
     Returns:
         完整的 prompt
     """
-    # 使用模板填充日志内容
-    prompt = USER_PROMPT_TEMPLATE.format(log_content=log_content)
-    return prompt
+    # 使用模板填充日志内容（布局见 split_prompt_template）
+    prefix, suffix = split_prompt_template()
+    return prefix + log_content + suffix
 
 
-def show_current_prompts():
-    """显示当前使用的提示词"""
-    print("\n" + "=" * 80)
-    print("📝 当前系统提示词:")
-    print("=" * 80)
-    print(SYSTEM_PROMPT)
+def split_prompt_template():
+    """
+    把用户提示词模板在 {log_content} 处切成前后两段（已处理好转义）
 
-    print("\n" + "=" * 80)
-    print("📝 当前用户提示词模板:")
-    print("=" * 80)
-    print(USER_PROMPT_TEMPLATE)
-    print("=" * 80 + "\n")
+    PROMPT_CONFIG['cache_friendly'] 开启时，模板中的全部说明都在 prefix 中、日志放在最后
+    （见 modules.prompts.split_template），prefix 每次都逐字节相同。
 
+    Returns:
+        tuple: (prefix, suffix)，prefix + log_content + suffix == create_prompt(log_content)
+    """
+    return split_template(get_prompt('user'), PROMPT_CONFIG['cache_friendly'])
 
-def reload_prompts():
-    """重新加载提示词文件"""
-    global SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
 
-    try:
-        SYSTEM_PROMPT = load_prompt_from_file('system_prompt.txt')
-        USER_PROMPT_TEMPLATE = load_prompt_from_file('user_prompt.txt')
-        print("✅ 提示词已重新加载")
-        return True
-    except Exception as e:
-        print(f"❌ 重新加载失败: {e}")
-        return False
+def build_prompt(filtered_data, sections=None):
+    """
+    直接把日志逐行写入最终 prompt 缓冲区
+
+    结果与 create_prompt(format_logs_for_ai(filtered_data)) 完全相同，
+    但不构造中间的行列表和日志字符串，配合流式读取时峰值内存约为一个 prompt 大小。
+
+    Args:
+        filtered_data: 从 filter_logs() 获取的数据
+        sections: 可选，传入列表时追加每个区域日志正文在 prompt 中的位置：
+                  {'region': str, 'label': str, 'start': int, 'end': int}
+
+    Returns:
+        完整的 prompt
+    """
+    prefix, suffix = split_prompt_template()
+
+    buffer = io.StringIO()
+    buffer.write(prefix)
+    position = len(prefix)
+    first_line = True
+
+    def write_line(line):
+        nonlocal position, first_line
+        if not first_line:
+            buffer.write("\n")
+            position += 1
+        buffer.write(line)
+        position += len(line)
+        first_line = False
+
+    for info in REGIONS:
+        region = filtered_data.get(info['name'])
+        if not region:
+            continue
+
+        for line in _iter_region_header(info, region):
+            write_line(line)
+
+        log_start = position + 1
+        for line in region['logs']:
+            write_line(line)
+
+        if sections is not None:
+            sections.append({'region': info['name'], 'label': info['label'], 'start': log_start, 'end': position})
+
+        write_line("")
+
+    buffer.write(suffix)
+    return buffer.getvalue()
+
+
+def compute_prompt_hash():
+    """
+    计算当前提示词和模型配置的哈希，作为报告缓存键的一部分
+
+    包含会影响报告内容的全部配置：提示词文件、模型参数、日志压缩、Token 预算、本地规则、日志分段和按区域并行。
+    修改其中任意一项都会使旧的缓存失效。
+
+    Returns:
+        str: 64 位十六进制 sha256
+    """
+    payload = {
+        'system_prompt': get_prompt('system'),
+        'user_prompt_template': get_prompt('user'),
+        'chunk_prompt_template': get_prompt('chunk'),
+        'prompt_layout': PROMPT_CONFIG,
+        'model': AI_CONFIG['model'],
+        'temperature': AI_CONFIG['temperature'],
+        'max_tokens': AI_CONFIG['max_tokens'],
+        'compaction': COMPACTION_CONFIG,
+        'token_budget': TOKEN_BUDGET_CONFIG,
+        'rules': {
+            'skip_llm': RULES_CONFIG['skip_llm'],
+            'rules': load_rules()['raw']
+        } if RULES_CONFIG['enabled'] else None,
+        'segmentation': {
+            'options': SEGMENT_CONFIG,
+            'rules': load_rules()['raw']
+        } if SEGMENT_CONFIG['enabled'] else None,
+        'region_parallel': {
+            'options': REGION_PARALLEL_CONFIG,
+            'region_prompt_template': get_prompt('region'),
+            'merge_prompt_template': get_prompt('merge')
+        } if REGION_PARALLEL_CONFIG['enabled'] else None
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
 
 
 def show_progress(start_time):
@@ -211,14 +416,269 @@ def show_progress(start_time):
     return elapsed
 
 
-def call_deepseek_api_stream(prompt):
+# 流式事件很多，直接复用一个解码器，省掉 json.loads() 每次的参数检查和编码探测
+_decode_json = json.JSONDecoder().decode
+
+
+def _generation_stats(content, total_seconds, ttft_seconds=None, usage=None):
+    """
+    计算一次生成的延迟指标
+
+    Args:
+        content: 生成的完整文本
+        total_seconds: 从发出请求到生成结束的总耗时
+        ttft_seconds: 首字延迟（流式时），None 表示非流式
+        usage: DeepSeek 返回的 usage，没有时按字符数估算输出 token
+
+    Returns:
+        dict: {'ttft_seconds', 'generation_seconds', 'completion_chars',
+               'completion_tokens', 'tokens_per_second',
+               'prompt_cache_hit_tokens', 'prompt_cache_miss_tokens', 'usage'}
+    """
+    usage_info = usage or {}
+    completion_tokens = usage_info.get('completion_tokens') or estimate_tokens(content)
+
+    # 流式时生成速度只算首字之后的解码阶段
+    decode_seconds = total_seconds - (ttft_seconds or 0)
+
+    return {
+        'ttft_seconds': round(ttft_seconds, 4) if ttft_seconds is not None else None,
+        'generation_seconds': round(total_seconds, 4),
+        'completion_chars': len(content),
+        'completion_tokens': completion_tokens,
+        'tokens_per_second': round(completion_tokens / decode_seconds, 2) if decode_seconds > 0 else None,
+        # DeepSeek 上下文缓存：命中前缀缓存 / 未命中的输入 token 数
+        'prompt_cache_hit_tokens': usage_info.get('prompt_cache_hit_tokens'),
+        'prompt_cache_miss_tokens': usage_info.get('prompt_cache_miss_tokens'),
+        'usage': usage
+    }
+
+
+class StreamStalled(Exception):
+    """流式响应在看门狗时限内没有生成新内容"""
+
+
+def _has_progress(chunk):
+    """事件中是否有生成的内容（推理模型的思考内容也算）"""
+    choices = chunk.get('choices')
+    if not choices:
+        return False
+    delta = choices[0].get('delta') or {}
+    return bool(delta.get('content') or delta.get('reasoning_content'))
+
+
+class _StreamAttempt:
+    """
+    一次流式请求
+
+    open() 发出请求并读到第一段内容为止（对冲时在后台线程里执行），
+    之后调用方从 pending + events 继续读取全部事件。
+
+    看门狗：每收到一块数据（包括 DeepSeek 排队时发送的心跳）都检查一次，
+    超过 first_token_timeout 没有首字、或首字之后超过 idle_timeout 没有新内容时抛出 StreamStalled；
+    socket 完全没有数据时由读取超时（不超过这两个时限）兜底。
+    """
+
+    def __init__(self, label, url, headers, payload, deadline, limiter=None):
+        self.label = label
+        self._url = url
+        self._headers = headers
+        self._payload = payload
+        self._deadline = deadline
+        self._limiter = limiter
+
+        self.started = time.time()
+        self.last_progress = None
+        self.response = None
+        self.events = None
+        self.pending = []
+        self.error = None
+
+        self._lock = threading.Lock()
+        self._finished = False
+        self._cancelled = False
+
+    def open(self, ready=None):
+        """
+        发出请求并读到第一段内容为止，出错时记录在 self.error
+
+        Args:
+            ready: 可选，queue.Queue，完成（或出错）后放入 self
+        """
+        try:
+            timeouts = (HTTP_CONFIG['stream_read_timeout'],
+                        DEADLINE_CONFIG['first_token_timeout'],
+                        DEADLINE_CONFIG['idle_timeout'])
+            # 三项都为 0（都不限）时流式读取不设超时
+            read_timeout = min((timeout for timeout in timeouts if timeout), default=None)
+
+            # 发送请求,启用流式传输
+            self.response = request_with_retry(
+                'POST', self._url,
+                headers=self._headers,
+                json=self._payload,
+                stream=True,
+                read_timeout=0 if read_timeout is None else read_timeout,
+                deadline=self._deadline,
+                limiter=self._limiter
+            )
+
+            self.events = self._iter_events()
+            for chunk in self.events:
+                self.pending.append(chunk)
+                if _has_progress(chunk):
+                    break
+        except Exception as e:
+            self.error = e
+            self.close()
+        finally:
+            with self._lock:
+                self._finished = True
+                cancelled = self._cancelled
+            if cancelled:
+                self.close()
+            if ready is not None:
+                ready.put(self)
+
+    def cancel(self):
+        """放弃这个请求：已读到首字的立即断开，还在等待的在下一次收到数据时断开"""
+        with self._lock:
+            self._cancelled = True
+            finished = self._finished
+        if finished:
+            self.close()
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+
+    def _check(self):
+        if self._cancelled:
+            raise StreamStalled("请求已被放弃（另一个请求先生成了内容）")
+
+        if self.last_progress is None:
+            limit, waited, what = DEADLINE_CONFIG['first_token_timeout'], time.time() - self.started, '首字'
+        else:
+            limit, waited, what = DEADLINE_CONFIG['idle_timeout'], time.time() - self.last_progress, '新内容'
+
+        if limit and waited > limit:
+            raise StreamStalled(f"流式响应 {waited:.0f} 秒没有{what}，已中止")
+
+        self._deadline.check('流式生成被中止')
+
+    def _guard(self, chunks):
+        """每收到一块字节检查一次看门狗和截止时间"""
+        for chunk in chunks:
+            self._check()
+            yield chunk
+
+    def _iter_events(self):
+        # 直接在字节流上增量解码 SSE 事件，只对 data 字段做 JSON 解析
+        chunks = self.response.iter_content(chunk_size=HTTP_CONFIG['stream_chunk_size'])
+
+        for data in iter_sse_data(self._guard(chunks)):
+            if data == b'[DONE]':
+                break
+
+            try:
+                chunk = _decode_json(data.decode('utf-8'))
+            except ValueError:
+                # 忽略无法解析的事件
+                continue
+
+            if _has_progress(chunk):
+                self.last_progress = time.time()
+
+            yield chunk
+
+
+def _open_stream(url, headers, payload, deadline, limiter=None):
+    """
+    发出流式请求，返回先生成内容的请求
+
+    对冲请求开启时（HEDGE_CONFIG），等待首字超过 hedge_delay() 仍没有内容，
+    且没有超过对冲次数上限时，再发出一个相同的请求；先出内容的请求被采用，另一个立即放弃。
+    请求直接出错（例如 HTTP 400）不会触发对冲。
+
+    Returns:
+        tuple: (_StreamAttempt, 对冲信息 dict 或 None)
+    """
+    primary = _StreamAttempt('primary', url, headers, payload, deadline, limiter)
+
+    if not HEDGE_CONFIG['enabled']:
+        primary.open()
+        if primary.error is not None:
+            raise primary.error
+        return primary, None
+
+    delay, learned = hedge_delay()
+    hedge_info = {'delay_seconds': round(delay, 2), 'learned': learned, 'fired': False}
+    ready = queue.Queue()
+    attempts = [primary]
+
+    def start(attempt):
+        threading.Thread(target=contextvars.copy_context().run, args=(attempt.open, ready), daemon=True).start()
+
+    winner = None
+    try:
+        start(primary)
+        try:
+            result = ready.get(timeout=deadline.clamp(delay))
+        except queue.Empty:
+            result = None
+            if try_acquire_hedge():
+                source = f"历史 P{HEDGE_CONFIG['percentile']:g}" if learned else "默认等待时间"
+                print(f"\n   ⏱️  {delay:.1f} 秒仍没有首字（{source}），发出对冲请求")
+                hedge = _StreamAttempt('hedge', url, headers, payload, deadline, limiter)
+                attempts.append(hedge)
+                hedge_info['fired'] = True
+                start(hedge)
+            else:
+                hedge_info['skipped'] = '超过对冲次数上限'
+
+        outstanding = len(attempts) - (result is not None)
+        failed = []
+        while True:
+            if result is not None:
+                if result.error is None:
+                    winner = result
+                    break
+                failed.append(result)
+            if not outstanding:
+                break
+            result = ready.get()
+            outstanding -= 1
+    finally:
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+
+    if winner is None:
+        raise failed[0].error
+
+    hedge_info['winner'] = winner.label
+    return winner, hedge_info
+
+
+def call_deepseek_api_stream(prompt, system_prompt=None, max_tokens=None, on_content=None, output=None,
+                             stats=None, deadline=None, limiter=None):
     """
     调用 DeepSeek API (流式输出)
     实时显示 AI 生成的内容
 
+    迟迟没有首字、或中途长时间没有新内容时由看门狗中止（见 DEADLINE_CONFIG），
+    对冲请求开启时等待首字过久会再发出一个相同的请求（见 _open_stream）。
+
     Args:
         prompt: 要发送的 prompt
-
+        system_prompt: 系统提示词，None 时使用 prompts/system_prompt.txt
+        max_tokens: 最大输出 token 数，None 时使用 AI_CONFIG['max_tokens']
+        on_content: 可选，每收到一段内容时调用 on_content(content)（例如写入数据库）
+        output: 可选，实时显示内容的输出对象（需要 write/flush 方法），
+                None 时使用按时间合并刷新的终端输出（BufferedWriter）
+        stats: 可选 dict，传入时写入本次调用的延迟指标（见 _generation_stats），对冲信息在 'hedge' 中
+        deadline: 可选，Deadline，整个调用不超过剩余时间
+        limiter: 可选，限流器，传给每次 DeepSeek 请求（见 request_with_retry）
 
     Returns:
         AI 生成的完整回复文本
@@ -237,84 +697,85 @@ def call_deepseek_api_stream(prompt):
 
     # 构建消息 - 启用流式输出
     data = {
-        'model': 'deepseek-chat',  # 使用快速模式
+        'model': AI_CONFIG['model'],
         'messages': [
             {
                 'role': 'system',
-                'content': SYSTEM_PROMPT
+                'content': system_prompt if system_prompt is not None else get_prompt('system')
             },
             {
                 'role': 'user',
                 'content': prompt
             }
         ],
-        'temperature': 0.7,  # 适中的温度,快速响应
-        'max_tokens': 2000,
-        'stream': True  # 启用流式输出
+        'temperature': AI_CONFIG['temperature'],
+        'max_tokens': max_tokens or AI_CONFIG['max_tokens'],
+        'stream': True,  # 启用流式输出
+        'stream_options': {'include_usage': True}  # 最后一个事件附带 token 用量
     }
 
     try:
         start_time = time.time()
 
-        # 发送请求,启用流式传输
-        response = requests.post(url, headers=headers, json=data, stream=True, timeout=120)
-        response.raise_for_status()
+        attempt, hedge_info = _open_stream(url, headers, data, deadline or Deadline(), limiter)
 
         full_content = []
-        char_count = 0
+        ttft = None
+        usage = None
 
+        if output is None:
+            output = BufferedWriter(flush_interval=HTTP_CONFIG['stream_flush_interval'])
 
+        try:
+            for chunk in itertools.chain(attempt.pending, attempt.events):
+                if chunk.get('usage'):
+                    usage = chunk['usage']
 
-        # 逐行读取流式响应
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-
-                # 跳过注释行
-                if line.startswith(':'):
+                choices = chunk.get('choices')
+                if not choices:
                     continue
 
-                # 移除 "data: " 前缀
-                if line.startswith('data: '):
-                    line = line[6:]
-
-                # 检查是否是结束标记
-                if line == '[DONE]':
-                    break
-
-                try:
-                    # 解析 JSON
-                    chunk = json.loads(line)
+                content = choices[0].get('delta', {}).get('content')
+                if content:
+                    if ttft is None:
+                        ttft = show_progress(start_time)
 
-                    # 提取内容
-                    if 'choices' in chunk and len(chunk['choices']) > 0:
-                        delta = chunk['choices'][0].get('delta', {})
-                        content = delta.get('content', '')
+                    output.write(content)
+                    full_content.append(content)
 
-                        if content:
-                            # 实时打印内容
-                            print(content, end='', flush=True)
-                            full_content.append(content)
-                            char_count += len(content)
+                    if on_content is not None:
+                        on_content(content)
+        finally:
+            output.flush()
+            attempt.close()
 
-                except json.JSONDecodeError:
-                    # 忽略无法解析的行
-                    continue
+        report = ''.join(full_content)
 
+        if stats is not None:
+            stats.update(_generation_stats(report, show_progress(start_time), ttft, usage))
+            if hedge_info is not None:
+                stats['hedge'] = hedge_info
 
         # 返回完整内容
-        return ''.join(full_content)
+        return report
 
     except requests.exceptions.RequestException as e:
         raise Exception(f"调用 DeepSeek API 失败: {e}")
 
 
-def call_deepseek_api(prompt):
+def call_deepseek_api(prompt, system_prompt=None, max_tokens=None, verbose=True, stats=None, deadline=None,
+                      limiter=None):
     """
     调用 DeepSeek API (普通模式,一次性返回)
 
     Args:
         prompt: 要发送的 prompt
+        system_prompt: 系统提示词，None 时使用 prompts/system_prompt.txt
+        max_tokens: 最大输出 token 数，None 时使用 AI_CONFIG['max_tokens']
+        verbose: 是否打印等待和耗时信息
+        stats: 可选 dict，传入时写入本次调用的延迟指标（见 _generation_stats）
+        deadline: 可选，Deadline，请求的超时和重试不超过剩余时间
+        limiter: 可选，限流器，传给每次 DeepSeek 请求（见 request_with_retry）
 
     Returns:
         AI 生成的回复文本
@@ -332,34 +793,38 @@ def call_deepseek_api(prompt):
     }
 
     data = {
-        'model': 'deepseek-chat',  # 使用快速模式
+        'model': AI_CONFIG['model'],
         'messages': [
             {
                 'role': 'system',
-                'content': SYSTEM_PROMPT
+                'content': system_prompt if system_prompt is not None else get_prompt('system')
             },
             {
                 'role': 'user',
                 'content': prompt
             }
         ],
-        'temperature': 0.7,
-        'max_tokens': 2000
+        'temperature': AI_CONFIG['temperature'],
+        'max_tokens': max_tokens or AI_CONFIG['max_tokens']
     }
 
     try:
         start_time = time.time()
-        print("\n⏳ 等待 AI 响应...")
+        if verbose:
+            print("\n⏳ 等待 AI 响应...")
 
-        response = requests.post(url, headers=headers, json=data, timeout=60)
-        response.raise_for_status()
+        response = request_with_retry('POST', url, headers=headers, json=data, deadline=deadline, limiter=limiter)
 
-        total_time = time.time() - start_time
+        total_time = show_progress(start_time)
 
         result = response.json()
         content = result['choices'][0]['message']['content']
 
-        print(f"✅ 响应完成! 耗时: {total_time:.2f} 秒")
+        if stats is not None:
+            stats.update(_generation_stats(content, total_time, usage=result.get('usage')))
+
+        if verbose:
+            print(f"✅ 响应完成! 耗时: {total_time:.2f} 秒")
 
         return content
 
@@ -367,34 +832,144 @@ def call_deepseek_api(prompt):
         raise Exception(f"调用 DeepSeek API 失败: {e}")
 
 
-def process_with_ai(filtered_data, stream=True):
+def summarize_chunks(prompt, sections, filtered_data, budget, stats=None, deadline=None, limiter=None):
     """
-    使用 AI 处理日志数据，生成报告
+    分段摘要（map-reduce 的 map 阶段）
 
-    Args:
-        filtered_data: 从 filter_logs() 获取的过滤后数据
-        stream: 是否使用流式输出 (默认 True)
+    把每个区域的日志正文按 token 上限切段，并行让 AI 提取关键信息，
+    再用摘要替换原始日志，得到可以走正常提示词流程的数据。没有日志的区域不发请求，保持原样。
 
+    Args:
+        prompt: build_prompt() 生成的完整 prompt
+        sections: build_prompt() 记录的各区域日志位置
+        filtered_data: 从 filter_logs() 获取的数据（只使用头部信息）
+        budget: Token 预算配置（见 TOKEN_BUDGET_CONFIG）
+        stats: 可选 dict，传入时写入分段数和各段摘要的 token 用量合计
+        deadline: 可选，Deadline，传给每个分段摘要请求
+        limiter: 可选，限流器，传给每次 DeepSeek 请求（见 request_with_retry）
 
     Returns:
-        AI 生成的报告文本
+        dict: 与 filtered_data 结构相同，'logs' 为各段摘要
     """
+    tasks = []
+    for section in sections:
+        log_text = prompt[section['start']:section['end']]
+        if not log_text.strip():
+            continue
+        chunks = split_lines_by_tokens(log_text, budget['chunk_tokens'])
+        for index, chunk in enumerate(chunks, 1):
+            tasks.append((section['region'], section['label'], index, len(chunks), chunk))
+
+    print(f"   ✂️  日志过长，切分为 {len(tasks)} 段并行摘要...")
+
+    def summarize(task):
+        region, label, index, count, chunk = task
+        prefix, suffix = split_template(
+            get_prompt('chunk'),
+            PROMPT_CONFIG['cache_friendly'],
+            region_label=label,
+            chunk_index=index,
+            chunk_count=count
+        )
+        chunk_prompt = prefix + chunk + suffix
+        chunk_stats = {}
+        summary = call_deepseek_api(chunk_prompt, max_tokens=budget['chunk_max_tokens'], verbose=False,
+                                    stats=chunk_stats, deadline=deadline, limiter=limiter)
+        return region, index, count, summary, chunk_stats
+
+    with ThreadPoolExecutor(max_workers=max(1, budget['max_workers'])) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, summarize, task) for task in tasks]
+
+        # 在主线程里打印进度，避免多线程输出交错
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            print(f"   ✅ 分段摘要完成 {done}/{len(tasks)}")
+
+        results = [future.result() for future in futures]
+
+    chunked = {task[0] for task in tasks}
+    summarized = {
+        region: {**region_data, 'logs': ["（日志过长，以下为分段摘要）"]} if region in chunked else region_data
+        for region, region_data in filtered_data.items()
+    }
 
-    log_content = format_logs_for_ai(filtered_data)
+    for region, index, count, summary, _ in results:
+        summarized[region]['logs'].append(f"[第 {index}/{count} 段摘要]")
+        summarized[region]['logs'].extend(summary.strip().split('\n'))
 
+    if stats is not None:
+        usages = [chunk_stats['usage'] or {} for *_, chunk_stats in results]
+        stats['chunks'] = len(tasks)
+        stats['prompt_tokens'] = sum(usage.get('prompt_tokens', 0) for usage in usages)
+        stats['completion_tokens'] = sum(usage.get('completion_tokens', 0) for usage in usages)
+        stats['prompt_cache_hit_tokens'] = sum(usage.get('prompt_cache_hit_tokens', 0) for usage in usages)
+        stats['prompt_cache_miss_tokens'] = sum(usage.get('prompt_cache_miss_tokens', 0) for usage in usages)
 
-    prompt = create_prompt(log_content)
+    return summarized
 
-    if stream:
 
-        report = call_deepseek_api_stream(prompt)
-    else:
+def process_with_ai(filtered_data, stream=True, budget=None, on_content=None, metrics=None, deadline=None,
+                    limiter=None):
+    """
+    使用 AI 处理日志数据，生成报告
 
-        report = call_deepseek_api(prompt)
+    日志超过 Token 预算时，先按区域分段并行摘要，
+    再把摘要放回原提示词模板中生成最终报告（map-reduce）。
 
-        print(report)
+    Args:
+        filtered_data: 从 filter_logs() 获取的过滤后数据
+        stream: 是否使用流式输出 (默认 True)
+        budget: Token 预算配置，None 时使用 TOKEN_BUDGET_CONFIG，False 表示不做检查
+        on_content: 可选，流式输出时每收到一段内容的回调
+        metrics: 可选，ReportMetrics，写入 prompt 大小和最终生成的延迟指标
+        deadline: 可选，Deadline，分段摘要和最终生成的请求都不超过剩余时间
+        limiter: 可选，限流器，传给每次 DeepSeek 请求（见 request_with_retry）
 
+    Returns:
+        AI 生成的报告文本
+    """
+    if budget is None:
+        budget = TOKEN_BUDGET_CONFIG if TOKEN_BUDGET_CONFIG['enabled'] else False
+
+    sections = []
+    build_start = time.time()
+    prompt = build_prompt(filtered_data, sections)
+    prompt_tokens = estimate_tokens(prompt)
+
+    prompt_stats = {
+        'build_seconds': round(show_progress(build_start), 4),
+        'chars': len(prompt),
+        'estimated_tokens': prompt_tokens
+    }
 
+    if budget and prompt_tokens > budget['max_prompt_tokens']:
+        print(f"   ⚠️  prompt 约 {prompt_tokens} tokens，超过预算 {budget['max_prompt_tokens']}")
+        summarize_start = time.time()
+        summarize_stats = {}
+        summarized = summarize_chunks(prompt, sections, filtered_data, budget, stats=summarize_stats,
+                                      deadline=deadline, limiter=limiter)
+        prompt = build_prompt(summarized)
+        prompt_tokens = estimate_tokens(prompt)
+        print(f"   ✅ 汇总 prompt 约 {prompt_tokens} tokens")
+
+        prompt_stats.update({
+            'summarize_seconds': round(show_progress(summarize_start), 4),
+            'summarize': summarize_stats,
+            'final_chars': len(prompt),
+            'final_estimated_tokens': prompt_tokens
+        })
+
+    llm_stats = {}
+
+    if stream:
+        report = call_deepseek_api_stream(prompt, on_content=on_content, stats=llm_stats, deadline=deadline,
+                                          limiter=limiter)
+    else:
+        report = call_deepseek_api(prompt, stats=llm_stats, deadline=deadline, limiter=limiter)
+        print(report)
 
+    if metrics is not None:
+        metrics.prompt.update(prompt_stats)
+        metrics.llm.update(llm_stats)
 
     return report
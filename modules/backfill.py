@@ -0,0 +1,228 @@
+# modules/backfill.py
+"""
+历史补生成模块 - 为一段时间内的历史执行批量生成报告
+
+1. 从执行记录汇总表列出时间范围内各启用区域的执行
+2. 以第一个区域为基准，按开始时间就近配组（每个执行最多参与一组）
+3. 用有并发上限的线程池生成报告，令牌桶限制 DeepSeek 请求速率
+4. 每完成一组就写入状态文件，中断后重新运行会跳过已完成的执行组
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config.database import BACKFILL_CONFIG
+from modules.executions import list_executions, refresh_execution_summary
+from modules.rate_limiter import TokenBucket
+from modules.regions import region_names
+from modules.report_generator import generate_ai_report
+from modules.report_outbox import close_outbox, replay_orphans
+
+
+def _match_nearest(anchors, executions, max_gap_seconds):
+    """
+    按开始时间就近匹配两个区域的执行
+
+    所有时间差在 max_gap_seconds 以内的候选对按时间差从小到大贪心选取，
+    每个执行最多参与一对。
+
+    Returns:
+        dict: {基准执行ID: 匹配到的执行}
+    """
+    candidates = []
+    for anchor in anchors:
+        for execution in executions:
+            gap = abs((anchor['first_ts'] - execution['first_ts']).total_seconds())
+            if gap <= max_gap_seconds:
+                candidates.append((gap, anchor['execution_id'], execution['execution_id'], execution))
+
+    candidates.sort(key=lambda candidate: candidate[0])
+
+    used = set()
+    matched = {}
+
+    for gap, anchor_id, execution_id, execution in candidates:
+        if anchor_id in matched or execution_id in used:
+            continue
+        used.add(execution_id)
+        matched[anchor_id] = execution
+
+    return matched
+
+
+def group_executions(executions_by_region, max_gap_seconds):
+    """
+    按开始时间就近把各区域的执行配成一组
+
+    以第一个区域为基准，其他每个区域分别与基准区域就近匹配（见 _match_nearest），
+    所有区域都匹配上的基准执行组成一组；没有配上的执行会被跳过。
+    只有两个区域时与原来的中国区/日本区配对结果相同。
+
+    Args:
+        executions_by_region: {region: list_executions(region, ...) 的结果}，按区域注册表顺序
+        max_gap_seconds: 与基准执行开始时间的最大允许差值（秒）
+
+    Returns:
+        list: [{region: execution, ...}, ...]，按基准区域开始时间排序
+    """
+    anchor_region, *other_regions = executions_by_region
+    anchors = executions_by_region[anchor_region]
+
+    matches = {
+        region: _match_nearest(anchors, executions_by_region[region], max_gap_seconds)
+        for region in other_regions
+    }
+
+    groups = []
+    for anchor in sorted(anchors, key=lambda execution: execution['first_ts']):
+        anchor_id = anchor['execution_id']
+        if all(anchor_id in matches[region] for region in other_regions):
+            groups.append({
+                anchor_region: anchor,
+                **{region: matches[region][anchor_id] for region in other_regions}
+            })
+
+    return groups
+
+
+def _group_key(execution_ids):
+    """状态文件中的键：按区域顺序拼接执行ID（两个区域时与旧格式 "cn_id|jp_id" 相同）"""
+    return '|'.join(execution_ids.values())
+
+
+class BackfillState:
+    """
+    断点续跑状态：记录已完成的执行组，写入时先写临时文件再替换，避免中断时损坏
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.completed = json.load(f).get('completed', {})
+
+    def is_completed(self, execution_ids):
+        return _group_key(execution_ids) in self.completed
+
+    def mark_completed(self, execution_ids, report_id):
+        with self._lock:
+            self.completed[_group_key(execution_ids)] = report_id
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'completed': self.completed}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def _as_completed_or_cancel(futures):
+    """
+    as_completed() 的包装：主线程被中断时取消还没开始的任务，
+    正在生成的报告会继续完成（下次运行时从状态文件续跑）
+    """
+    try:
+        yield from as_completed(futures)
+    except KeyboardInterrupt:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def run_backfill(since=None, until=None, concurrency=None, rate_per_minute=None,
+                 max_pair_gap=None, state_file=None, force=False, verbose=False):
+    """
+    为时间范围内的历史执行组批量生成报告
+
+    Args:
+        since: 开始时间下限（包含），None 表示不限
+        until: 开始时间上限（不包含），None 表示不限
+        concurrency: 同时生成的报告数，None 时使用 BACKFILL_CONFIG
+        rate_per_minute: 每分钟最多发往 DeepSeek 的请求数，None 时使用 BACKFILL_CONFIG
+        max_pair_gap: 配组允许的最大开始时间差（秒），None 时使用 BACKFILL_CONFIG
+        state_file: 断点续跑状态文件，None 时使用 BACKFILL_CONFIG
+        force: 是否忽略报告缓存强制重新生成
+        verbose: 是否显示每份报告的详细输出（并发时输出会交错）
+
+    Returns:
+        dict: {'total': int, 'skipped': int, 'succeeded': int, 'failed': int}
+    """
+    concurrency = max(1, concurrency or BACKFILL_CONFIG['concurrency'])
+    rate_per_minute = rate_per_minute or BACKFILL_CONFIG['rate_per_minute']
+    max_pair_gap = max_pair_gap if max_pair_gap is not None else BACKFILL_CONFIG['max_pair_gap']
+    state = BackfillState(state_file or BACKFILL_CONFIG['state_file'])
+
+    replay_orphans()
+
+    print("\n🔄 更新执行记录汇总...")
+    refresh_execution_summary()
+
+    executions_by_region = {region: list_executions(region, since, until) for region in region_names()}
+    groups = group_executions(executions_by_region, max_pair_gap)
+    anchor_region = region_names()[0]
+
+    def ids_of(group):
+        return {region: execution['execution_id'] for region, execution in group.items()}
+
+    pending = [group for group in groups if force or not state.is_completed(ids_of(group))]
+    summary = {
+        'total': len(groups),
+        'skipped': len(groups) - len(pending),
+        'succeeded': 0,
+        'failed': 0
+    }
+
+    counts = '，'.join(
+        f"{region}: {len(executions)} 个" for region, executions in executions_by_region.items()
+    )
+    print(f"   各区域执行: {counts}")
+    print(f"   配组成功: {len(groups)} 组，已完成跳过: {summary['skipped']} 组，待生成: {len(pending)} 组")
+    print(f"   并发: {concurrency}，限流: 每分钟 {rate_per_minute:g} 次请求")
+
+    if not pending:
+        return summary
+
+    limiter = TokenBucket(rate_per_minute / 60.0, capacity=BACKFILL_CONFIG['burst'])
+    start_time = time.time()
+
+    def generate(group):
+        return generate_ai_report(
+            stream=False,
+            concurrent=False,
+            force=force,
+            execution_ids=ids_of(group),
+            limiter=limiter,
+            quiet=not verbose
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(generate, group): group for group in pending}
+
+            for done, future in enumerate(_as_completed_or_cancel(futures), 1):
+                group = futures[future]
+                execution_ids = ids_of(group)
+                label = f"{group[anchor_region]['first_ts']:%Y-%m-%d %H:%M} {' + '.join(execution_ids.values())}"
+
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'report_content': str(e)}
+
+                if result['success']:
+                    summary['succeeded'] += 1
+                    state.mark_completed(execution_ids, result['report_id'] or result.get('client_report_key'))
+                    status = "♻️  缓存" if result.get('cached') else "✅"
+                else:
+                    summary['failed'] += 1
+                    status = f"❌ {result['report_content']}"
+
+                elapsed = time.time() - start_time
+                print(f"   [{done}/{len(pending)}] {label} {status}  (已用 {elapsed:.0f} 秒)")
+
+    finally:
+        close_outbox()
+
+    return summary
@@ -0,0 +1,143 @@
+# modules/balance_cache.py
+"""
+API 余额缓存模块 - 报告流程只读本地缓存，不等待余额接口
+
+- 缓存保存在本地 JSON 文件中，多次运行（命令行、守护进程、补生成）共用
+- 缓存过期或不存在时在后台线程刷新，同一进程同时最多一个刷新请求
+- 余额查询失败只打印警告，不影响报告生成
+"""
+import json
+import os
+import threading
+import time
+
+from config.database import BALANCE_CACHE_CONFIG
+from modules.ai_processor import check_balance
+
+
+_refresh_lock = threading.Lock()
+_refresh_thread = None
+
+
+def read_cached_balance(path=None):
+    """
+    读取缓存文件
+
+    Args:
+        path: 缓存文件，None 时使用 BALANCE_CACHE_CONFIG['path']
+
+    Returns:
+        tuple: (balance_data, fetched_at)，没有可用缓存时为 (None, None)
+    """
+    path = path or BALANCE_CACHE_CONFIG['path']
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        return cached['balance'], float(cached['fetched_at'])
+    except FileNotFoundError:
+        return None, None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"   ⚠️  余额缓存文件无法读取，将重新查询: {e}")
+        return None, None
+
+
+def write_cached_balance(balance_data, path=None):
+    """
+    写入缓存文件（先写临时文件再替换，其他进程不会读到写了一半的文件）
+
+    Args:
+        balance_data: check_balance() 返回的余额数据
+        path: 缓存文件，None 时使用 BALANCE_CACHE_CONFIG['path']
+    """
+    path = path or BALANCE_CACHE_CONFIG['path']
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'fetched_at': time.time(), 'balance': balance_data}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _refresh():
+    try:
+        write_cached_balance(check_balance(show_detail=False))
+    except Exception as e:
+        print(f"\n   ⚠️  后台刷新余额失败（不影响报告生成）: {e}")
+
+
+def refresh_balance_async():
+    """
+    在后台线程刷新余额缓存；已有刷新在进行时不重复发起
+
+    Returns:
+        threading.Thread: 正在进行的刷新线程
+    """
+    global _refresh_thread
+
+    with _refresh_lock:
+        if _refresh_thread is None or not _refresh_thread.is_alive():
+            _refresh_thread = threading.Thread(target=_refresh, name='balance-refresh', daemon=True)
+            _refresh_thread.start()
+        return _refresh_thread
+
+
+def wait_for_refresh(timeout=None):
+    """
+    等待正在进行的后台刷新完成（命令行退出前调用，避免刷新结果丢失）
+
+    Args:
+        timeout: 最长等待秒数，None 时使用 BALANCE_CACHE_CONFIG['exit_wait_seconds']
+
+    Returns:
+        bool: 没有未完成的刷新时为 True
+    """
+    thread = _refresh_thread
+    if thread is None:
+        return True
+
+    thread.join(BALANCE_CACHE_CONFIG['exit_wait_seconds'] if timeout is None else timeout)
+    return not thread.is_alive()
+
+
+def get_cached_balance(ttl_seconds=None):
+    """
+    获取余额（不阻塞）：返回缓存中最新的值，过期或没有缓存时触发后台刷新
+
+    Args:
+        ttl_seconds: 缓存有效期，None 时使用 BALANCE_CACHE_CONFIG['ttl_seconds']
+
+    Returns:
+        tuple: (balance_data, age_seconds)，还没有缓存时为 ({}, None)
+    """
+    ttl_seconds = BALANCE_CACHE_CONFIG['ttl_seconds'] if ttl_seconds is None else ttl_seconds
+
+    balance_data, fetched_at = read_cached_balance()
+    age_seconds = max(0.0, time.time() - fetched_at) if fetched_at is not None else None
+
+    if age_seconds is None or age_seconds > ttl_seconds:
+        refresh_balance_async()
+
+    return balance_data or {}, age_seconds
+
+
+def fetch_balance_safely():
+    """
+    同步查询余额（余额缓存关闭时使用），失败时返回空数据而不是抛出异常
+
+    查询成功时同时更新缓存文件。
+
+    Returns:
+        tuple: (balance_data, age_seconds)，成功时 age_seconds 为 0，失败时为 ({}, None)
+    """
+    try:
+        balance_data = check_balance(show_detail=False)
+    except Exception as e:
+        print(f"   ⚠️  查询余额失败（不影响报告生成）: {e}")
+        return {}, None
+
+    try:
+        write_cached_balance(balance_data)
+    except OSError as e:
+        print(f"   ⚠️  写入余额缓存失败: {e}")
+
+    return balance_data, 0.0
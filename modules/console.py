@@ -0,0 +1,64 @@
+# modules/console.py
+"""
+控制台输出模块 - 按调用上下文关闭详细输出
+
+quiet_output(True) 范围内（包括按 contextvars 传递了上下文的工作线程）print() 的内容被丢弃，
+同一进程中其他调用和主线程的输出照常显示。例如批量补生成时各报告的详细输出不显示，进度输出照常显示。
+
+第一次进入 quiet_output(True) 时把 sys.stdout 换成一个转发对象（之后不再恢复）；
+不在安静上下文中的写入原样转发给原来的 sys.stdout。
+"""
+import contextlib
+import contextvars
+import sys
+import threading
+
+_quiet = contextvars.ContextVar('quiet_output', default=False)
+_install_lock = threading.Lock()
+
+
+class _QuietAwareStdout:
+    """sys.stdout 的转发对象：当前上下文要求安静时丢弃写入"""
+
+    def __init__(self, target):
+        self._target = target
+
+    def write(self, text):
+        if _quiet.get():
+            return len(text)
+        return self._target.write(text)
+
+    def flush(self):
+        self._target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+def _install():
+    with _install_lock:
+        if not isinstance(sys.stdout, _QuietAwareStdout):
+            sys.stdout = _QuietAwareStdout(sys.stdout)
+
+
+@contextlib.contextmanager
+def quiet_output(enabled=True):
+    """
+    在当前上下文中丢弃 print() 的输出
+
+    工作线程不会自动继承上下文：提交任务时用 contextvars.copy_context().run 包装，
+    线程中的输出才会同样被丢弃。
+
+    Args:
+        enabled: 是否丢弃输出；False 时什么都不做
+    """
+    if not enabled:
+        yield
+        return
+
+    _install()
+    token = _quiet.set(True)
+    try:
+        yield
+    finally:
+        _quiet.reset(token)
@@ -0,0 +1,217 @@
+# modules/daemon.py
+"""
+守护进程模块 - 常驻运行，发现新的执行记录后才生成报告
+
+与 cron 每次启动相比，连接池、HTTP 会话和提示词都只初始化一次；
+每轮只做一次增量汇总（水位线之后的新日志）和两次索引查询。
+"""
+import signal
+import threading
+import time
+
+from config.database import DAEMON_CONFIG, STREAM_PERSIST_CONFIG
+from modules.ai_processor import get_http_session
+from modules.db_pool import close_pool, get_pool, use_connection
+from modules.db_query import LOG_TABLES, recover_stalled_reports
+from modules.executions import get_latest_execution, refresh_execution_summary
+from modules.report_generator import generate_ai_report
+from modules.report_outbox import close_outbox, replay_orphans
+
+
+_stop_event = threading.Event()
+
+
+def request_stop(signum=None, frame=None):
+    """
+    请求守护进程退出（SIGTERM / SIGINT 处理函数）
+
+    第一次收到信号时等待当前报告生成完成后退出；
+    再次收到信号时立即中断，generate_ai_report() 会把报告标记为失败。
+    """
+    if _stop_event.is_set():
+        raise KeyboardInterrupt
+
+    print("\n🛑 收到退出信号，当前报告完成后退出（再次发送信号立即中断）")
+    _stop_event.set()
+
+
+def _poll_latest_executions():
+    """
+    增量更新汇总表并读取各区域最新执行
+
+    Returns:
+        tuple: ({region: 最新执行 dict 或 None}, 数据库当前时间)
+    """
+    with use_connection(commit=True) as conn:
+        refresh_execution_summary(conn=conn)
+        latest = {region: get_latest_execution(region, conn=conn) for region in LOG_TABLES}
+
+        cursor = conn.cursor()
+        try:
+            # 日志时间戳由数据库写入，用数据库时间判断静默时长，避免时区/时钟偏差
+            cursor.execute("SELECT NOW()")
+            db_now = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    return latest, db_now
+
+
+def _should_generate(latest, db_now, last_pair, settle_seconds, pair_timeout):
+    """
+    判断是否需要为当前最新执行对生成报告
+
+    - 所有区域都有执行，且最后一条日志之后已静默 settle_seconds 秒
+    - 所有区域都换成了新的执行；或只有部分区域有新执行，但已结束超过 pair_timeout 秒
+
+    Returns:
+        bool
+    """
+    if any(execution is None for execution in latest.values()):
+        return False
+
+    idle = {
+        region: (db_now - execution['last_ts']).total_seconds()
+        for region, execution in latest.items()
+    }
+    if any(seconds < settle_seconds for seconds in idle.values()):
+        return False
+
+    pair = tuple(latest[region]['execution_id'] for region in LOG_TABLES)
+    if last_pair is None:
+        return True
+
+    changed = [region for region, old_id, new_id in zip(LOG_TABLES, last_pair, pair) if old_id != new_id]
+    if not changed:
+        return False
+    if len(changed) == len(LOG_TABLES):
+        return True
+
+    return all(idle[region] >= pair_timeout for region in changed)
+
+
+def _retry_wait(retry, pair):
+    """
+    距离该执行对下次重试还要等待多少秒
+
+    Returns:
+        float: 秒数，没有失败记录（或不是同一个执行对）时为 0
+    """
+    if retry['pair'] != pair:
+        return 0.0
+    return max(0.0, retry['next_at'] - time.monotonic())
+
+
+def _record_failure(retry, pair):
+    """
+    记录执行对的一次生成失败，并安排下次重试（指数退避）
+
+    Returns:
+        tuple: (是否已达到重试上限, 下次重试前等待的秒数)
+    """
+    if retry['pair'] != pair:
+        retry.update(pair=pair, attempts=0)
+
+    retry['attempts'] += 1
+    delay = min(DAEMON_CONFIG['retry_base_seconds'] * 2 ** (retry['attempts'] - 1),
+                DAEMON_CONFIG['retry_max_seconds'])
+    retry['next_at'] = time.monotonic() + delay
+
+    return retry['attempts'] >= DAEMON_CONFIG['retry_max_attempts'], delay
+
+
+def _generate_for_pair(pair, retry, stream):
+    """
+    为执行对生成报告，失败时记录并安排重试
+
+    Returns:
+        tuple: (是否不再处理该执行对, 新生成的报告数)
+    """
+    attempt = retry['attempts'] + 1 if retry['pair'] == pair else 1
+    print(f"\n🆕 {time.strftime('%Y-%m-%d %H:%M:%S')} 发现新的执行: {pair}"
+          f"{f'（第 {attempt} 次尝试）' if attempt > 1 else ''}")
+
+    # 指定执行ID：避免轮询之后新开始的执行被当成“最新”
+    execution_ids = dict(zip(LOG_TABLES, pair))
+    try:
+        result = generate_ai_report(stream=stream, execution_ids=execution_ids)
+    except Exception as e:
+        print(f"\n❌ 生成报告出错: {e}")
+        result = {'success': False}
+
+    # 成功（或命中缓存）后不再处理
+    if result['success']:
+        return True, 0 if result.get('cached') else 1
+
+    exhausted, delay = _record_failure(retry, pair)
+    if exhausted:
+        print(f"\n⛔ 执行 {pair} 已连续失败 {retry['attempts']} 次，不再重试（出现新的执行后继续）")
+    else:
+        print(f"\n🔁 执行 {pair} 生成失败，{delay} 秒后重试")
+    return exhausted, 0
+
+
+def run_daemon(poll_interval=None, settle_seconds=None, pair_timeout=None, stream=False):
+    """
+    以守护进程方式运行，直到收到 SIGTERM / SIGINT
+
+    Args:
+        poll_interval: 轮询间隔（秒），None 时使用 DAEMON_CONFIG
+        settle_seconds: 执行结束判定的静默秒数，None 时使用 DAEMON_CONFIG
+        pair_timeout: 只有部分区域有新执行时的最长等待秒数，None 时使用 DAEMON_CONFIG
+        stream: 是否在终端实时输出 AI 生成内容
+
+    Returns:
+        int: 生成的报告数
+    """
+    poll_interval = poll_interval or DAEMON_CONFIG['poll_interval']
+    settle_seconds = settle_seconds if settle_seconds is not None else DAEMON_CONFIG['settle_seconds']
+    pair_timeout = pair_timeout if pair_timeout is not None else DAEMON_CONFIG['pair_timeout']
+
+    _stop_event.clear()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    # 预热：连接池和 HTTP 会话在整个进程生命周期内复用
+    get_pool()
+    get_http_session()
+
+    print(f"👀 守护进程已启动：每 {poll_interval} 秒检查一次新执行（静默 {settle_seconds} 秒视为结束）")
+
+    last_pair = None
+    generated = 0
+    # 最近一次生成失败的执行对：{'pair', 'attempts', 'next_at'}
+    retry = {'pair': None, 'attempts': 0, 'next_at': 0.0}
+
+    try:
+        while not _stop_event.is_set():
+            try:
+                # 之前崩溃/被强制结束留下的 generating 记录标记为失败（保留部分内容）
+                recovered = recover_stalled_reports(STREAM_PERSIST_CONFIG['stale_seconds'])
+                if recovered:
+                    print(f"\n🩹 已恢复 {recovered} 条中断的 generating 报告记录")
+
+                # 其他进程退出时没能写入数据库的报告（本地写入队列遗留文件）
+                replay_orphans()
+
+                latest, db_now = _poll_latest_executions()
+
+                if _should_generate(latest, db_now, last_pair, settle_seconds, pair_timeout):
+                    pair = tuple(latest[region]['execution_id'] for region in LOG_TABLES)
+                    if not _retry_wait(retry, pair):
+                        done, count = _generate_for_pair(pair, retry, stream)
+                        if done:
+                            last_pair = pair
+                        generated += count
+
+            except Exception as e:
+                print(f"\n❌ 轮询出错: {e}")
+
+            _stop_event.wait(poll_interval)
+
+    finally:
+        close_outbox()
+        close_pool()
+        print(f"\n👋 守护进程已退出，本次共生成 {generated} 份报告")
+
+    return generated
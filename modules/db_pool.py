@@ -0,0 +1,203 @@
+# modules/db_pool.py
+"""
+数据库连接池模块 - 复用 MySQL 连接，避免每次查询都重新握手
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+from config.database import DB_CONFIG, DB_POOL_CONFIG
+
+
+class ConnectionPool:
+    """
+    有界的 MySQL 连接池
+
+    - 最多同时借出 max_size 个连接
+    - 空闲超过 ping_interval 秒的连接在借出前先 ping，断开则自动重连
+    - 归还时回滚未提交的事务，避免下一个使用者看到旧的快照
+    """
+
+    def __init__(self, db_config, max_size=5, ping_interval=30, acquire_timeout=10):
+        self._db_config = dict(db_config)
+        self.max_size = max_size
+        self.ping_interval = ping_interval
+        self.acquire_timeout = acquire_timeout
+
+        # LIFO：优先复用最近用过的连接，冷连接自然被淘汰
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    def _connect(self):
+        return pymysql.connect(**self._db_config)
+
+    def acquire(self):
+        """
+        借出一个可用连接
+
+        Returns:
+            pymysql.connections.Connection
+        """
+        if self._closed:
+            raise Exception("数据库连接池已关闭")
+
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise Exception(f"获取数据库连接超时（{self.acquire_timeout} 秒），连接池已满")
+
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+
+                if time.time() - last_used < self.ping_interval:
+                    return conn
+
+                # 空闲较久的连接可能已被服务器断开（wait_timeout），先做健康检查
+                try:
+                    conn.ping(reconnect=True)
+                    return conn
+                except pymysql.MySQLError:
+                    self._close_quietly(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        """
+        归还连接
+
+        Args:
+            conn: acquire() 借出的连接
+            discard: 为 True 时直接关闭连接（例如发生了连接级错误）
+        """
+        try:
+            if discard or self._closed or not conn.open:
+                self._close_quietly(conn)
+                return
+
+            try:
+                conn.rollback()
+            except pymysql.MySQLError:
+                self._close_quietly(conn)
+                return
+
+            self._idle.put((conn, time.time()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """关闭连接池中所有空闲连接"""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    获取全局连接池（首次调用时创建）
+
+    Returns:
+        ConnectionPool
+    """
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+
+    return _pool
+
+
+def close_pool():
+    """关闭全局连接池，下次使用时会重新创建"""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
+def get_connection():
+    """
+    从连接池借出一个连接，with 块结束后自动归还
+
+    同一个 with 块内可以在这个连接上执行多条语句。
+
+    用法:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            ...
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    broken = False
+
+    try:
+        yield conn
+    except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+        # 连接级错误，连接可能已不可用，不再放回池中
+        broken = True
+        raise
+    finally:
+        pool.release(conn, discard=broken)
+
+
+@contextmanager
+def transaction():
+    """
+    借出一个连接并开启事务：正常结束时提交，出现异常时回滚
+
+    用法:
+        with transaction() as conn:
+            report_id = create_report_placeholder(..., conn=conn)
+            update_ai_report(report_id, ..., conn=conn)
+    """
+    with get_connection() as conn:
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+@contextmanager
+def use_connection(conn=None, commit=False):
+    """
+    供查询函数内部使用：调用方传入了连接就直接复用，否则从连接池借一个
+
+    Args:
+        conn: 调用方已借出的连接（例如 transaction() 中的连接），为 None 时自动借出
+        commit: 自动借出的连接在正常结束时是否提交（调用方传入的连接由调用方负责提交）
+    """
+    if conn is not None:
+        yield conn
+        return
+
+    with get_connection() as own_conn:
+        yield own_conn
+        if commit:
+            own_conn.commit()
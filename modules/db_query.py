@@ -1,191 +1,565 @@
 # modules/db_query.py
 """
-数据库查询模块 - 只负责读取数据
+数据库查询模块 - 负责读取数据（读取最新执行前会增量更新执行记录汇总表，见 modules/executions.py）
 """
+import json
+from concurrent.futures import ThreadPoolExecutor
+
 import pymysql
-from config.database import DB_CONFIG
 
+from modules.db_pool import get_pool, use_connection
+from modules.executions import get_latest_execution, refresh_execution_summary
+from modules.regions import REGIONS, execution_key
+
+
+# 区域 -> 日志表（启用的区域，来自区域注册表）
+LOG_TABLES = {region['name']: region['table'] for region in REGIONS}
+
+# 流式读取时每次从服务端拉取的行数
+STREAM_FETCH_SIZE = 1000
+
+
+class MissingColumnError(Exception):
+    """表中缺少代码需要的列（需要先运行 migrate.py）"""
+
+
+def iter_execution_logs(table, execution_id):
+    """
+    逐行读取某次执行的日志（服务端游标 SSCursor，客户端不缓存整个结果集）
+
+    生成器在第一次迭代时才从连接池借出连接，读完后归还。
+    无缓冲结果集没读完前连接不能执行其他语句，所以这里单独借一个连接。
+
+    Args:
+        table: 日志表名
+        execution_id: 执行ID
+
+    Yields:
+        tuple: (timestamp, log_message)
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    finished = False
+
+    try:
+        cursor.execute(f"""
+            SELECT timestamp, log_message
+            FROM {table}
+            WHERE execution_id = %s
+            ORDER BY timestamp ASC
+        """, (execution_id,))
+
+        while True:
+            rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+
+        finished = True
+    finally:
+        if finished:
+            cursor.close()
+            pool.release(conn)
+        else:
+            # 中途放弃时剩余的结果集还在连接上，直接丢弃连接，避免读完整个结果集
+            pool.release(conn, discard=True)
+
+
+def _load_execution_logs(cursor, table, execution_id, stream):
+    """
+    读取某次执行的日志
+
+    Args:
+        cursor: 数据库游标
+        table: 日志表名
+        execution_id: 执行ID
+        stream: 是否流式读取
+
+    Returns:
+        dict: 非流式时只有 'logs'（全部行）；
+              流式时 'logs' 为生成器，另附 'start_time'/'end_time'/'line_count'
+              （走 idx_execution_timestamp 索引统计，供报告头部使用）
+    """
+    if not stream:
+        cursor.execute(f"""
+            SELECT timestamp, log_message
+            FROM {table}
+            WHERE execution_id = %s
+            ORDER BY timestamp ASC
+        """, (execution_id,))
+        return {'logs': cursor.fetchall()}
+
+    cursor.execute(f"""
+        SELECT MIN(timestamp), MAX(timestamp), COUNT(*)
+        FROM {table}
+        WHERE execution_id = %s
+    """, (execution_id,))
+    start_time, end_time, line_count = cursor.fetchone()
+
+    return {
+        'start_time': start_time,
+        'end_time': end_time,
+        'line_count': line_count,
+        'logs': iter_execution_logs(table, execution_id)
+    }
+
+
+def get_latest_region_logs(region, conn=None, stream=False):
+    """
+    获取单个区域的最新日志数据
+
+    最新执行 = 执行记录汇总表（ark_executions）中 last_ts 最大的执行。读取前先按水位线增量更新
+    该区域的汇总（只扫描水位线之后的新日志），只由 cron 调用时汇总表也不会过期；
+    守护进程和历史补生成读取的是同一张汇总表（汇总表和索引由 migrate.py 创建）。
+
+    Args:
+        region: 区域名（见区域注册表）
+        conn: 可选，复用调用方已借出的连接（汇总表的更新由调用方提交）
+        stream: 是否流式读取日志（'logs' 变为只能迭代一次的生成器，
+                并额外返回 'start_time'/'end_time'/'line_count'）
+
+    Returns:
+        dict 或 None: {
+            'execution_id': str,
+            'timestamp': datetime,
+            'logs': list of tuples（流式时为生成器）
+        }
+    """
+    table = LOG_TABLES[region]
+
+    with use_connection(conn, commit=True) as conn:
+        refresh_execution_summary(region, conn=conn)
+        latest = get_latest_execution(region, conn=conn)
+
+        if not latest:
+            return None
+
+        cursor = conn.cursor()
+        try:
+            return {
+                'execution_id': latest['execution_id'],
+                'timestamp': latest['last_ts'],
+                **_load_execution_logs(cursor, table, latest['execution_id'], stream)
+            }
+
+        finally:
+            cursor.close()
 
-def get_latest_logs():
+
+def get_latest_execution_id(region, conn=None):
     """
-    获取两个区域的最新日志数据
+    获取单个区域最新执行的ID（只读取 idx_timestamp 索引末端一行，不读取日志）
+
+    Args:
+        region: 区域名（见区域注册表）
+        conn: 可选，复用调用方已借出的连接
+
+    Returns:
+        tuple 或 None: (execution_id, 最新日志时间)
+    """
+    table = LOG_TABLES[region]
+
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT execution_id, timestamp
+                FROM {table}
+                ORDER BY timestamp DESC
+                LIMIT 1
+            """)
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+
+def get_execution_logs_after(region, execution_id, after=None, limit=None, conn=None, keyed=True):
+    """
+    按游标读取某次执行的新日志（走 idx_execution_timestamp 索引，不重读已读过的部分）
+
+    日志表有主键 id 时（keyed=True）使用键集游标：游标为最后读到的一行的 (时间戳, id)，按 timestamp, id 排序，
+    同一秒内的多行也有确定的顺序，每次查询都从游标之后的下一行开始，不会漏读或重复读。
+    （InnoDB 的二级索引隐含主键，ORDER BY timestamp, id 仍然按索引顺序读取）
+
+    没有 id 列时（keyed=False）游标为 (时间戳, 该秒已读行数)：从该秒开始读取并跳过已读的行，
+    同一秒内的行按索引顺序读取。
+
+    Args:
+        region: 区域名（见区域注册表）
+        execution_id: 执行ID
+        after: 游标，None 表示从头读取；keyed=True 时为 (timestamp, id)，id 为 None 时从该秒的第一行开始读取，
+               keyed=False 时为 (timestamp, 该秒已读行数)
+        limit: 最多返回的新行数，None 表示不限
+        conn: 可选，复用调用方已借出的连接
+        keyed: 日志表是否有主键 id 列
+
+    Returns:
+        list of tuples: [(id, timestamp, log_message), ...]，keyed=False 时 id 为 None
+    """
+    table = LOG_TABLES[region]
+    sql = f"""
+        SELECT {'id' if keyed else 'NULL'}, timestamp, log_message
+        FROM {table}
+        WHERE execution_id = %s
+    """
+    params = [execution_id]
+    skip = 0
+
+    if after is not None:
+        after_ts, after_key = after
+        if not keyed:
+            sql += " AND timestamp >= %s"
+            params.append(after_ts)
+            skip = after_key or 0
+        elif after_key is None:
+            sql += " AND timestamp >= %s"
+            params.append(after_ts)
+        else:
+            sql += " AND timestamp >= %s AND (timestamp > %s OR id > %s)"
+            params += [after_ts, after_ts, after_key]
+
+    sql += " ORDER BY timestamp ASC, id ASC" if keyed else " ORDER BY timestamp ASC"
+    if limit is not None or skip:
+        # MySQL 的 OFFSET 必须跟在 LIMIT 之后，不限行数时使用最大值
+        sql += " LIMIT %s OFFSET %s"
+        params += [limit if limit is not None else 18446744073709551615, skip]
+
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    return list(rows)
+
+
+def get_execution_logs(region, execution_id, conn=None, stream=False):
+    """
+    获取指定区域、指定执行的日志数据（返回结构与 get_latest_region_logs() 相同）
+
+    Args:
+        region: 区域名（见区域注册表）
+        execution_id: 执行ID
+        conn: 可选，复用调用方已借出的连接
+        stream: 是否流式读取日志
+
+    Returns:
+        dict 或 None: 执行不存在时返回 None
+    """
+    table = LOG_TABLES[region]
+
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT MAX(timestamp)
+                FROM {table}
+                WHERE execution_id = %s
+            """, (execution_id,))
+            latest_time = cursor.fetchone()[0]
+
+            if latest_time is None:
+                return None
+
+            return {
+                'execution_id': execution_id,
+                'timestamp': latest_time,
+                **_load_execution_logs(cursor, table, execution_id, stream)
+            }
+
+        finally:
+            cursor.close()
+
+
+def get_latest_logs(conn=None, stream=False, concurrent=None):
+    """
+    获取所有启用区域的最新日志数据
+
+    Args:
+        conn: 可选，复用调用方已借出的连接（并行模式下忽略）
+        stream: 是否流式读取日志，见 get_latest_region_logs()
+        concurrent: 是否并行查询各区域（每个区域各自从连接池借连接）；
+                    None 时未传入 conn 且区域多于一个就并行，总耗时约等于最慢的区域
 
     Returns:
         dict: {
-            'cn': {
-                'execution_id': str,
-                'timestamp': datetime,
-                'logs': list of tuples
-            },
-            'jp': {
+            region: {
                 'execution_id': str,
                 'timestamp': datetime,
-                'logs': list of tuples
+                'logs': list of tuples（流式时为生成器）
+            } 或 None,
+            ...
+        }
+    """
+    if concurrent is None:
+        concurrent = conn is None and len(LOG_TABLES) > 1
+
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=len(LOG_TABLES)) as executor:
+            futures = {
+                region: executor.submit(get_latest_region_logs, region, stream=stream)
+                for region in LOG_TABLES
             }
+            return {region: future.result() for region, future in futures.items()}
+
+    with use_connection(conn, commit=True) as conn:
+        return {
+            region: get_latest_region_logs(region, conn=conn, stream=stream)
+            for region in LOG_TABLES
         }
+
+
+# 已确认存在的列：(table, column)，迁移后不会再删除，只缓存存在的结果
+_known_columns = set()
+
+
+def _has_column(cursor, table, column):
+    """检查表中是否有某列（存在时缓存结果，进程内只查询一次）"""
+    if (table, column) in _known_columns:
+        return True
+
+    cursor.execute("""
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_schema = DATABASE()
+          AND table_name = %s
+          AND column_name = %s
+        LIMIT 1
+    """, (table, column))
+    if cursor.fetchone() is None:
+        return False
+
+    _known_columns.add((table, column))
+    return True
+
+
+def table_has_column(table, column, conn=None):
     """
-    conn = pymysql.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+    检查表中是否有某列（例如确认是否已运行 migrate.py）
 
-    result = {
-        'cn': None,
-        'jp': None
-    }
+    Args:
+        table: 表名
+        column: 列名
+        conn: 可选，复用调用方已借出的连接
 
-    try:
-        # 读取中国区最新数据
-        cursor.execute("""
-            SELECT execution_id, MAX(timestamp) as latest_time
-            FROM arkcn_logs
-            GROUP BY execution_id
-            ORDER BY latest_time DESC
-            LIMIT 1
-        """)
-        cn_result = cursor.fetchone()
-
-        if cn_result:
-            cn_exec_id, cn_time = cn_result
+    Returns:
+        bool
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+        try:
+            return _has_column(cursor, table, column)
+        finally:
+            cursor.close()
 
-            cursor.execute("""
-                SELECT timestamp, log_message
-                FROM arkcn_logs
-                WHERE execution_id = %s
-                ORDER BY timestamp ASC
-            """, (cn_exec_id,))
-            cn_logs = cursor.fetchall()
-
-            result['cn'] = {
-                'execution_id': cn_exec_id,
-                'timestamp': cn_time,
-                'logs': cn_logs
-            }
 
-        # 读取日本区最新数据
-        cursor.execute("""
-            SELECT execution_id, MAX(timestamp) as latest_time
-            FROM arkjp_logs
-            GROUP BY execution_id
-            ORDER BY latest_time DESC
-            LIMIT 1
-        """)
-        jp_result = cursor.fetchone()
+def _parse_balance(balance_data, verbose=True):
+    """
+    把 check_balance() 的返回值解析为报告表的 api_* 列（优先选择 CNY 币种）
 
-        if jp_result:
-            jp_exec_id, jp_time = jp_result
+    Returns:
+        tuple: (is_available, currency, total_balance, granted_balance, topped_up_balance)
+    """
+    is_available = balance_data.get('is_available', True)
+    balance_infos = balance_data.get('balance_infos', [])
+
+    if balance_infos:
+        # 优先查找 CNY 币种
+        balance_info = None
+        for info in balance_infos:
+            if info.get('currency') == 'CNY':
+                balance_info = info
+                if verbose:
+                    print(f"   ✅ 使用 CNY 币种余额")
+                break
 
-            cursor.execute("""
-                SELECT timestamp, log_message
-                FROM arkjp_logs
-                WHERE execution_id = %s
-                ORDER BY timestamp ASC
-            """, (jp_exec_id,))
-            jp_logs = cursor.fetchall()
-
-            result['jp'] = {
-                'execution_id': jp_exec_id,
-                'timestamp': jp_time,
-                'logs': jp_logs
-            }
+        # 如果没找到 CNY，使用第一个币种
+        if not balance_info:
+            balance_info = balance_infos[0]
+            if verbose:
+                print(f"   ⚠️  未找到 CNY 币种，使用 {balance_info.get('currency', 'UNKNOWN')} 币种")
 
-    finally:
-        cursor.close()
-        conn.close()
+        currency = balance_info.get('currency', 'CNY')
+        total_balance = float(balance_info.get('total_balance', '0.00'))
+        granted_balance = float(balance_info.get('granted_balance', '0.00'))
+        topped_up_balance = float(balance_info.get('topped_up_balance', '0.00'))
+    else:
+        # 如果 balance_infos 为空，使用默认值
+        if verbose:
+            print(f"   ⚠️  balance_infos 为空，使用默认值")
+        currency = 'CNY'
+        total_balance = 0.00
+        granted_balance = 0.00
+        topped_up_balance = 0.00
+
+    return is_available, currency, total_balance, granted_balance, topped_up_balance
+
+
+def find_cached_report(execution_ids, prompt_hash, conn=None):
+    """
+    查找同一组执行ID、同一提示词哈希的最新已完成报告
 
-    return result
+    Args:
+        execution_ids: {region: execution_id}，各启用区域的执行ID
+        prompt_hash: compute_prompt_hash() 的结果
+        conn: 可选，复用调用方已借出的连接
 
+    Returns:
+        dict 或 None: {'report_id': int, 'report_content': str}
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT id, report_content
+                FROM ai_reports
+                WHERE execution_key = %s
+                  AND prompt_hash = %s
+                  AND status = 'completed'
+                ORDER BY id DESC
+                LIMIT 1
+            """, (execution_key(execution_ids), prompt_hash))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    if not row:
+        return None
+
+    return {
+        'report_id': row[0],
+        'report_content': row[1]
+    }
 
-# 原函数名：create_or_update_ai_report_placeholder
-# 新函数名：create_ai_report_placeholder
 
-def create_ai_report_placeholder(arkcn_execution_id, arkjp_execution_id, balance_data):
+def create_report_placeholder(execution_ids, balance_data, conn=None, prompt_hash=None,
+                              balance_age_seconds=None, client_report_key=None, verbose=True):
     """
     创建 AI 报告占位记录（每次都插入新记录）
 
-    优先选择 CNY 币种的余额信息
+    优先选择 CNY 币种的余额信息。中国区/日本区的执行ID照旧写入
+    arkcn_execution_id/arkjp_execution_id 列（未启用的区域写空字符串），
+    全部区域的执行ID写入 execution_ids（JSON）和 execution_key 列（需要先运行 migrate.py）。
 
     Args:
-        arkcn_execution_id: 中国区执行ID
-        arkjp_execution_id: 日本区执行ID
+        execution_ids: {region: execution_id}，各启用区域的执行ID
         balance_data: check_balance() 返回的余额数据
+        conn: 可选，复用调用方的连接（此时由调用方负责提交事务）
+        prompt_hash: 可选，提示词哈希（用于报告缓存，写入 prompt_hash 列，未运行 migrate.py 时不写）
+        balance_age_seconds: 可选，余额数据来自多少秒前的缓存（写入 api_balance_age_seconds 列）
+        client_report_key: 可选，客户端生成的报告键（写入 client_report_key 列，需要先运行 migrate.py）。
+                           同一个键重复插入时不会新增记录，返回已有记录的ID（本地写入队列重放时使用）
+        verbose: 是否打印选择了哪个币种的余额
 
     Returns:
         int: report_id（新插入记录的ID）
     """
-    conn = pymysql.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+    with use_connection(conn, commit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            is_available, currency, total_balance, granted_balance, topped_up_balance = \
+                _parse_balance(balance_data, verbose=verbose)
+
+            # 直接插入新记录
+            sql = """
+                INSERT INTO ai_reports (
+                    arkcn_execution_id,
+                    arkjp_execution_id,
+                    report_content,
+                    status,
+                    api_is_available,
+                    api_currency,
+                    api_total_balance,
+                    api_granted_balance,
+                    api_topped_up_balance{extra_columns}
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s{extra_values})
+            """
+
+            values = (
+                execution_ids.get('cn', ''),
+                execution_ids.get('jp', ''),
+                '',  # report_content 初始为空
+                'generating',  # status 初始为 generating
+                is_available,
+                currency,
+                total_balance,
+                granted_balance,
+                topped_up_balance
+            )
+
+            # 新增的列只在存在时才写，未迁移的数据库也能正常插入
+            extra = {}
+            if prompt_hash and _has_column(cursor, 'ai_reports', 'prompt_hash'):
+                extra['prompt_hash'] = prompt_hash
+            if _has_column(cursor, 'ai_reports', 'execution_key'):
+                extra['execution_ids'] = json.dumps(execution_ids, ensure_ascii=False, sort_keys=True)
+                extra['execution_key'] = execution_key(execution_ids)
+            if balance_age_seconds is not None and _has_column(cursor, 'ai_reports', 'api_balance_age_seconds'):
+                extra['api_balance_age_seconds'] = int(balance_age_seconds)
+            if client_report_key:
+                if not _has_column(cursor, 'ai_reports', 'client_report_key'):
+                    raise MissingColumnError("ai_reports 表缺少 client_report_key 列，请先运行 migrate.py")
+                extra['client_report_key'] = client_report_key
+                # 唯一索引冲突时不插入，LAST_INSERT_ID(id) 让 lastrowid 返回已有记录的ID
+                sql += "ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)"
+
+            sql = sql.format(
+                extra_columns=''.join(f",\n                    {column}" for column in extra),
+                extra_values=', %s' * len(extra)
+            )
+            values += tuple(extra.values())
+
+            cursor.execute(sql, values)
+
+            # 获取新插入记录的 ID
+            report_id = cursor.lastrowid
+
+            return report_id
+
+        finally:
+            cursor.close()
+
+
+def create_ai_report_placeholder(arkcn_execution_id, arkjp_execution_id, balance_data, **kwargs):
+    """
+    创建 AI 报告占位记录（旧接口，只有中国区/日本区的执行ID）
 
-    try:
-        # 解析余额数据
-        is_available = balance_data.get('is_available', True)
-        balance_infos = balance_data.get('balance_infos', [])
-
-        if balance_infos:
-            # 优先查找 CNY 币种
-            balance_info = None
-            for info in balance_infos:
-                if info.get('currency') == 'CNY':
-                    balance_info = info
-                    print(f"   ✅ 使用 CNY 币种余额")
-                    break
+    等同于 create_report_placeholder({'cn': arkcn_execution_id, 'jp': arkjp_execution_id}, balance_data, ...)，
+    其他参数见 create_report_placeholder()。
 
-            # 如果没找到 CNY，使用第一个币种
-            if not balance_info:
-                balance_info = balance_infos[0]
-                print(f"   ⚠️  未找到 CNY 币种，使用 {balance_info.get('currency', 'UNKNOWN')} 币种")
+    Returns:
+        int: report_id（新插入记录的ID）
+    """
+    execution_ids = {'cn': arkcn_execution_id, 'jp': arkjp_execution_id}
+    return create_report_placeholder(execution_ids, balance_data, **kwargs)
 
-            currency = balance_info.get('currency', 'CNY')
-            total_balance = float(balance_info.get('total_balance', '0.00'))
-            granted_balance = float(balance_info.get('granted_balance', '0.00'))
-            topped_up_balance = float(balance_info.get('topped_up_balance', '0.00'))
-        else:
-            # 如果 balance_infos 为空，使用默认值
-            print(f"   ⚠️  balance_infos 为空，使用默认值")
-            currency = 'CNY'
-            total_balance = 0.00
-            granted_balance = 0.00
-            topped_up_balance = 0.00
-
-        # 直接插入新记录
-        sql = """
-            INSERT INTO ai_reports (
-                arkcn_execution_id,
-                arkjp_execution_id,
-                report_content,
-                status,
-                api_is_available,
-                api_currency,
-                api_total_balance,
-                api_granted_balance,
-                api_topped_up_balance
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-
-        values = (
-            arkcn_execution_id,
-            arkjp_execution_id,
-            '',  # report_content 初始为空
-            'generating',  # status 初始为 generating
-            is_available,
-            currency,
-            total_balance,
-            granted_balance,
-            topped_up_balance
-        )
-
-        cursor.execute(sql, values)
-        conn.commit()
-
-        # 获取新插入记录的 ID
-        report_id = cursor.lastrowid
-
-        return report_id
 
-    finally:
-        cursor.close()
-        conn.close()
+def find_report_id_by_key(client_report_key, conn=None):
+    """
+    按客户端报告键查找报告记录ID
 
-# update_ai_report 函数保持不变
-def update_ai_report(report_id, report_content, status='completed'):
+    Args:
+        client_report_key: create_report_placeholder() 写入的 client_report_key
+        conn: 可选，复用调用方已借出的连接
+
+    Returns:
+        int 或 None: report_id
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id FROM ai_reports WHERE client_report_key = %s", (client_report_key,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    return row[0] if row else None
+
+
+def update_ai_report(report_id, report_content, status='completed', conn=None):
     """
     更新 AI 报告的内容和状态
 
@@ -193,26 +567,172 @@ def update_ai_report(report_id, report_content, status='completed'):
         report_id: 报告记录ID
         report_content: AI 生成的报告内容（或错误信息）
         status: 报告状态
+        conn: 可选，复用调用方的连接（此时由调用方负责提交事务）
 
     Returns:
         bool: 更新是否成功
     """
-    conn = pymysql.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+    with use_connection(conn, commit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            sql = """
+                UPDATE ai_reports
+                SET report_content = %s,
+                    status = %s
+                WHERE id = %s
+            """
 
-    try:
-        sql = """
-            UPDATE ai_reports
-            SET report_content = %s,
-                status = %s
-            WHERE id = %s
-        """
+            cursor.execute(sql, (report_content, status, report_id))
 
-        cursor.execute(sql, (report_content, status, report_id))
-        conn.commit()
+            return cursor.rowcount > 0
 
-        return cursor.rowcount > 0
+        finally:
+            cursor.close()
 
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+
+def update_ai_report_balance(report_id, balance_data, balance_age_seconds=None, conn=None):
+    """
+    用更新的余额数据覆盖报告记录的 api_* 列（后台刷新在生成期间完成时调用）
+
+    Args:
+        report_id: 报告记录ID
+        balance_data: check_balance() 返回的余额数据
+        balance_age_seconds: 余额数据来自多少秒前的缓存
+        conn: 可选，复用调用方的连接（此时由调用方负责提交事务）
+
+    Returns:
+        bool: 更新是否成功
+    """
+    values = _parse_balance(balance_data, verbose=False)
+
+    with use_connection(conn, commit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            extra_columns = ''
+            if balance_age_seconds is not None and _has_column(cursor, 'ai_reports', 'api_balance_age_seconds'):
+                extra_columns = ',\n                    api_balance_age_seconds = %s'
+                values += (int(balance_age_seconds),)
+
+            cursor.execute(f"""
+                UPDATE ai_reports
+                SET api_is_available = %s,
+                    api_currency = %s,
+                    api_total_balance = %s,
+                    api_granted_balance = %s,
+                    api_topped_up_balance = %s{extra_columns}
+                WHERE id = %s
+            """, values + (report_id,))
+
+            return cursor.rowcount > 0
+
+        finally:
+            cursor.close()
+
+
+def update_ai_report_partial(report_id, report_content, conn=None):
+    """
+    写入生成中的部分报告内容（状态保持 generating）
+
+    只更新仍处于 generating 状态的记录，避免迟到的写入覆盖最终结果。
+
+    Args:
+        report_id: 报告记录ID
+        report_content: 到目前为止生成的内容
+        conn: 可选，复用调用方的连接（此时由调用方负责提交事务）
+
+    Returns:
+        bool: 是否更新了记录
+    """
+    with use_connection(conn, commit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE ai_reports
+                SET report_content = %s
+                WHERE id = %s
+                  AND status = 'generating'
+            """, (report_content, report_id))
+
+            return cursor.rowcount > 0
+
+        finally:
+            cursor.close()
+
+
+def recover_stalled_reports(stale_seconds, conn=None):
+    """
+    把长时间没有更新的 generating 记录标记为失败（保留已生成的部分内容）
+
+    进程崩溃或被强制结束时，报告会停留在 generating 状态；
+    依赖 content_updated_at 列（migrate.py 添加，内容每次变化时自动更新）。
+
+    Args:
+        stale_seconds: 超过多少秒没有更新视为已中断
+        conn: 可选，复用调用方的连接（此时由调用方负责提交事务）
+
+    Returns:
+        int: 恢复的记录数
+    """
+    with use_connection(conn, commit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE ai_reports
+                SET report_content = CONCAT(
+                        COALESCE(report_content, ''),
+                        '\n\n---\n生成报告失败: 生成过程中断，以上为中断前已生成的部分内容'
+                    ),
+                    status = 'failed'
+                WHERE status = 'generating'
+                  AND content_updated_at < NOW() - INTERVAL %s SECOND
+            """, (stale_seconds,))
+
+            return cursor.rowcount
+
+        finally:
+            cursor.close()
+
+
+def save_report_metrics(record, conn=None):
+    """
+    写入一次报告生成的指标（ai_report_metrics 表，由 migrate.py 创建）
+
+    常用指标单独成列便于按时间查询，完整记录以 JSON 保存。
+
+    Args:
+        record: ReportMetrics.to_dict() 的结果
+        conn: 可选，复用调用方的连接（此时由调用方负责提交事务）
+
+    Returns:
+        int: 新记录的 ID
+    """
+    llm = record.get('llm') or {}
+    usage = llm.get('usage') or {}
+
+    with use_connection(conn, commit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO ai_report_metrics
+                    (report_id, status, total_seconds, ttft_seconds, generation_seconds,
+                     tokens_per_second, prompt_tokens, completion_tokens,
+                     prompt_cache_hit_tokens, prompt_cache_miss_tokens, metrics)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                record.get('report_id'),
+                record.get('status'),
+                record.get('total_seconds'),
+                llm.get('ttft_seconds'),
+                llm.get('generation_seconds'),
+                llm.get('tokens_per_second'),
+                usage.get('prompt_tokens'),
+                usage.get('completion_tokens'),
+                usage.get('prompt_cache_hit_tokens'),
+                usage.get('prompt_cache_miss_tokens'),
+                json.dumps(record, ensure_ascii=False, default=str)
+            ))
+
+            return cursor.lastrowid
+
+        finally:
+            cursor.close()
@@ -0,0 +1,65 @@
+# modules/deadline.py
+"""
+截止时间模块 - 一次报告生成的总时限
+
+generate_ai_report() 开始时创建一个 Deadline，依次传给各步骤：
+步骤之间检查是否已超时，DeepSeek 请求的连接/读取超时和重试等待都不超过剩余时间，
+DeepSeek 长时间没有响应时整次生成在时限内失败，而不是卡在单次请求的读取超时上。
+"""
+import time
+
+
+class DeadlineExceeded(Exception):
+    """超过报告生成的总时限"""
+
+
+class Deadline:
+    """
+    截止时间（单调时钟）
+
+    seconds 为 None 或 0 时不限时：remaining() 返回 None，check() 不会抛出异常，clamp() 原样返回。
+    """
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds or None
+        self._expires = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        """
+        Returns:
+            float: 剩余秒数（不小于 0），不限时为 None
+        """
+        if self._expires is None:
+            return None
+        return max(0.0, self._expires - time.monotonic())
+
+    @property
+    def expired(self):
+        return self._expires is not None and time.monotonic() >= self._expires
+
+    def check(self, stage):
+        """
+        已超时则抛出 DeadlineExceeded
+
+        Args:
+            stage: 超时时受影响的步骤（用于错误信息，例如 '无法开始生成报告'）
+        """
+        if self.expired:
+            raise DeadlineExceeded(f"超过报告生成时限（{self.seconds:.0f} 秒），{stage}")
+
+    def clamp(self, timeout):
+        """
+        把超时时间限制在剩余时间以内
+
+        Args:
+            timeout: 原超时秒数，None 表示不限
+
+        Returns:
+            float: 不超过剩余时间的超时秒数（不限时且 timeout 为 None 时返回 None）
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        # requests 不接受 0 作为超时，已超时的情况由 check() 处理
+        remaining = max(remaining, 0.01)
+        return remaining if timeout is None else min(timeout, remaining)
@@ -0,0 +1,239 @@
+# modules/executions.py
+"""
+执行记录汇总模块 - 维护 ark_executions 汇总表（每个执行一行）
+
+汇总表按水位线增量更新：每次只扫描水位线之后有新日志的执行，
+再按 (execution_id, timestamp) 索引重新统计这些执行，写入绝对值，
+因此重复执行不会重复计数，同一秒内晚到的日志也能被补上。
+"""
+from modules.db_pool import use_connection
+from modules.regions import get_region, region_names
+
+
+def _upsert_summaries(cursor, region, rows):
+    """
+    写入汇总行（绝对值覆盖）
+
+    Args:
+        cursor: 数据库游标
+        region: 区域名
+        rows: [(execution_id, first_ts, last_ts, line_count), ...]
+    """
+    if not rows:
+        return
+
+    cursor.executemany("""
+        INSERT INTO ark_executions (region, execution_id, first_ts, last_ts, line_count)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            first_ts = VALUES(first_ts),
+            last_ts = VALUES(last_ts),
+            line_count = VALUES(line_count)
+    """, [(region, *row) for row in rows])
+
+
+def _save_watermark(cursor, region, last_ts):
+    if last_ts is None:
+        return
+
+    cursor.execute("""
+        INSERT INTO ark_execution_watermarks (region, last_ts)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE last_ts = GREATEST(last_ts, VALUES(last_ts))
+    """, (region, last_ts))
+
+
+def refresh_execution_summary(region=None, conn=None):
+    """
+    从水位线开始增量更新汇总表
+
+    Args:
+        region: 只更新指定区域，None 表示全部区域
+        conn: 可选，复用调用方的连接
+
+    Returns:
+        dict: {region: 本次更新的执行数}
+    """
+    regions = [region] if region else region_names()
+    updated = {}
+
+    with use_connection(conn, commit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            for name in regions:
+                table = get_region(name)['table']
+
+                cursor.execute(
+                    "SELECT last_ts FROM ark_execution_watermarks WHERE region = %s",
+                    (name,)
+                )
+                row = cursor.fetchone()
+                watermark = row[0] if row else None
+
+                if watermark is None:
+                    # 没有水位线说明还没初始化，按全量构建
+                    updated[name] = _rebuild_region(cursor, name, table)
+                    continue
+
+                # 用 >= 而不是 >：同一秒内晚到的日志也要重新统计
+                cursor.execute(f"""
+                    SELECT execution_id, MAX(timestamp)
+                    FROM {table}
+                    WHERE timestamp >= %s
+                    GROUP BY execution_id
+                """, (watermark,))
+                touched = cursor.fetchall()
+
+                if not touched:
+                    updated[name] = 0
+                    continue
+
+                execution_ids = [execution_id for execution_id, _ in touched]
+                placeholders = ', '.join(['%s'] * len(execution_ids))
+                cursor.execute(f"""
+                    SELECT execution_id, MIN(timestamp), MAX(timestamp), COUNT(*)
+                    FROM {table}
+                    WHERE execution_id IN ({placeholders})
+                    GROUP BY execution_id
+                """, execution_ids)
+
+                _upsert_summaries(cursor, name, cursor.fetchall())
+                _save_watermark(cursor, name, max(last_ts for _, last_ts in touched))
+                updated[name] = len(execution_ids)
+        finally:
+            cursor.close()
+
+    return updated
+
+
+def _rebuild_region(cursor, region, table):
+    cursor.execute(f"""
+        SELECT execution_id, MIN(timestamp), MAX(timestamp), COUNT(*)
+        FROM {table}
+        GROUP BY execution_id
+    """)
+    rows = cursor.fetchall()
+
+    _upsert_summaries(cursor, region, rows)
+    _save_watermark(cursor, region, max((row[2] for row in rows), default=None))
+
+    return len(rows)
+
+
+def bootstrap_execution_summary(verbose=True):
+    """
+    全量构建汇总表（首次部署或数据修复时使用）
+
+    Args:
+        verbose: 是否打印进度
+
+    Returns:
+        dict: {region: 汇总的执行数}
+    """
+    built = {}
+
+    with use_connection(commit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            for region in region_names():
+                table = get_region(region)['table']
+                if verbose:
+                    print(f"   ⏳ 正在汇总 {table} ...")
+
+                built[region] = _rebuild_region(cursor, region, table)
+
+                if verbose:
+                    print(f"   ✅ {table}: {built[region]} 个执行")
+        finally:
+            cursor.close()
+
+    return built
+
+
+def get_latest_execution(region, conn=None):
+    """
+    从汇总表读取指定区域最新的执行（走 idx_region_last_ts 索引）
+
+    Args:
+        region: 区域名
+        conn: 可选，复用调用方的连接
+
+    Returns:
+        dict 或 None: {
+            'execution_id': str,
+            'first_ts': datetime,
+            'last_ts': datetime,
+            'line_count': int
+        }
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT execution_id, first_ts, last_ts, line_count
+                FROM ark_executions
+                WHERE region = %s
+                ORDER BY last_ts DESC
+                LIMIT 1
+            """, (region,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    if not row:
+        return None
+
+    execution_id, first_ts, last_ts, line_count = row
+    return {
+        'execution_id': execution_id,
+        'first_ts': first_ts,
+        'last_ts': last_ts,
+        'line_count': line_count
+    }
+
+
+def list_executions(region, since=None, until=None, conn=None):
+    """
+    从汇总表列出指定区域在时间范围内开始的执行（按开始时间排序）
+
+    Args:
+        region: 区域名
+        since: 可选，开始时间下限（包含）
+        until: 可选，开始时间上限（不包含）
+        conn: 可选，复用调用方的连接
+
+    Returns:
+        list: [{'execution_id', 'first_ts', 'last_ts', 'line_count'}, ...]
+    """
+    conditions = ["region = %s"]
+    params = [region]
+
+    if since is not None:
+        conditions.append("first_ts >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("first_ts < %s")
+        params.append(until)
+
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT execution_id, first_ts, last_ts, line_count
+                FROM ark_executions
+                WHERE {' AND '.join(conditions)}
+                ORDER BY first_ts ASC
+            """, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    return [
+        {
+            'execution_id': execution_id,
+            'first_ts': first_ts,
+            'last_ts': last_ts,
+            'line_count': line_count
+        }
+        for execution_id, first_ts, last_ts, line_count in rows
+    ]
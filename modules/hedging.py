@@ -0,0 +1,160 @@
+# modules/hedging.py
+"""
+对冲请求模块 - 决定流式调用等待首字多久后再发出一个相同的请求，并限制对冲的次数
+
+DeepSeek 的首字延迟有长尾：大多数请求几秒内出首字，偶尔排队几十秒。
+等待时间取指标文件（METRICS_CONFIG['jsonl_path']）中最近若干次生成的首字延迟的分位数，
+只有明显慢于历史的请求才会被对冲；对冲请求的 prompt 同样计费，
+所以用令牌桶限制每小时的对冲次数（HEDGE_CONFIG['max_per_hour']），成本有上限。
+令牌桶保存在本地文件（HEDGE_CONFIG['state_path']）中并加文件锁，
+cron 每次启动的命令行、守护进程和补生成共用同一个上限，而不是每个进程各有一份突发额度。
+"""
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from config.database import HEDGE_CONFIG, METRICS_CONFIG
+
+
+_lock = threading.Lock()
+_delay_cache = {'key': None, 'delay': None, 'learned': False}
+
+
+def _iter_ttft(record):
+    """一行指标中的首字延迟：按区域并行生成时每个区域一个"""
+    llm = record.get('llm') or {}
+    if llm.get('regions'):
+        for stats in llm['regions'].values():
+            yield (stats or {}).get('ttft_seconds')
+    else:
+        yield llm.get('ttft_seconds')
+
+
+def load_ttft_history(path=None, limit=None):
+    """
+    读取指标文件最后 limit 行中记录的首字延迟
+
+    Args:
+        path: 指标文件，None 时使用 METRICS_CONFIG['jsonl_path']
+        limit: 读取的行数，None 时使用 HEDGE_CONFIG['history']
+
+    Returns:
+        list: 首字延迟（秒），文件不存在时为空列表
+    """
+    path = path or METRICS_CONFIG['jsonl_path']
+    limit = limit or HEDGE_CONFIG['history']
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = deque(f, maxlen=limit)
+    except OSError:
+        return []
+
+    samples = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        for value in _iter_ttft(record):
+            if isinstance(value, (int, float)) and value > 0:
+                samples.append(float(value))
+
+    return samples
+
+
+def percentile(values, p):
+    """
+    分位数（线性插值）
+
+    Args:
+        values: 非空的数值列表
+        p: 0-100
+
+    Returns:
+        float
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def hedge_delay(options=None):
+    """
+    等待首字多少秒后发出对冲请求（指标文件有新内容时重新计算）
+
+    Args:
+        options: 对冲配置，None 时使用 HEDGE_CONFIG
+
+    Returns:
+        tuple: (秒数, 是否来自历史数据)，历史样本不足时使用 default_delay
+    """
+    options = options or HEDGE_CONFIG
+    path = METRICS_CONFIG['jsonl_path']
+
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+
+    key = (path, mtime, options['percentile'], options['history'], options['min_samples'])
+
+    with _lock:
+        if _delay_cache['key'] != key:
+            samples = load_ttft_history(path, options['history'])
+            learned = len(samples) >= options['min_samples']
+            delay = percentile(samples, options['percentile']) if learned else options['default_delay']
+            _delay_cache.update(key=key, delay=max(delay, options['min_delay']), learned=learned)
+
+        return _delay_cache['delay'], _delay_cache['learned']
+
+
+def try_acquire_hedge(options=None):
+    """
+    申请发出一个对冲请求（不等待）
+
+    令牌桶状态 {'tokens': 剩余令牌, 'updated': 更新时间} 保存在 options['state_path'] 中，
+    读取、补充和扣减都在文件锁内完成，同时运行的多个进程也不会超过上限。
+    文件不存在或无法解析时视为令牌已满。
+
+    Args:
+        options: 对冲配置，None 时使用 HEDGE_CONFIG
+
+    Returns:
+        bool: 是否允许发出
+    """
+    options = options or HEDGE_CONFIG
+
+    if options['max_per_hour'] <= 0:
+        return False
+
+    rate = options['max_per_hour'] / 3600
+    capacity = max(1, options['burst'])
+
+    with _lock, open(options['state_path'], 'a+', encoding='utf-8') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        now = time.time()
+
+        try:
+            state = json.loads(f.read())
+            tokens = min(capacity, float(state['tokens']) + max(0.0, now - float(state['updated'])) * rate)
+        except (ValueError, KeyError, TypeError):
+            tokens = float(capacity)
+
+        acquired = tokens >= 1
+        if acquired:
+            tokens -= 1
+
+        f.seek(0)
+        f.truncate()
+        json.dump({'tokens': tokens, 'updated': now}, f)
+        f.flush()
+
+    return acquired
@@ -0,0 +1,322 @@
+# modules/live.py
+"""
+实时增量报告模块 - 为仍在进行中的执行生成进度摘要
+
+每个 (区域, 执行) 在 ai_live_summaries 表中保存一个键集游标和滚动摘要：
+- 游标为最后读到的日志行的 (时间, 主键 id)，每次只读取游标之后的新日志；
+  日志表没有 id 列时改用 (时间, 该秒已读行数)（启动时检查，见 get_execution_logs_after）
+- 每次更新只把之前的摘要和新增日志发给 AI，得到新的完整摘要，而不是重发整个执行的日志
+- 新增日志过多时按 LIVE_CONFIG['max_rows'] 分批读取、过长时按 TOKEN_BUDGET_CONFIG['chunk_tokens'] 分段，
+  每批合并进摘要后立即保存游标和摘要，后面的批次失败时前面已付费的 AI 结果不会丢失
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.database import COMPACTION_CONFIG, LIVE_CONFIG, PROMPT_CONFIG, TOKEN_BUDGET_CONFIG
+from modules.ai_processor import call_deepseek_api
+from modules.db_pool import use_connection
+from modules.db_query import get_execution_logs_after, get_latest_execution_id, table_has_column
+from modules.log_compactor import compact_rows
+from modules.log_filter import clean_messages_batch
+from modules.prompts import get_prompt, split_template
+from modules.regions import REGIONS, get_region
+from modules.token_budget import split_lines_by_tokens
+
+
+# 还没有摘要时代替 {previous_summary}
+EMPTY_SUMMARY = '（这是第一批日志，还没有摘要）'
+
+
+def _load_state(region, execution_id, conn=None):
+    """
+    读取某个执行的游标和滚动摘要
+
+    Returns:
+        dict: 没有记录时返回初始状态（'update_count' 为 None）
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT cursor_ts, cursor_id, cursor_offset, lines_seen, first_ts, summary, update_count
+                FROM ai_live_summaries
+                WHERE region = %s AND execution_id = %s
+            """, (region, execution_id))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    if not row:
+        return {
+            'region': region,
+            'execution_id': execution_id,
+            'cursor_ts': None,
+            'cursor_id': None,
+            'cursor_offset': None,
+            'lines_seen': 0,
+            'first_ts': None,
+            'summary': '',
+            'update_count': None
+        }
+
+    cursor_ts, cursor_id, cursor_offset, lines_seen, first_ts, summary, update_count = row
+    return {
+        'region': region,
+        'execution_id': execution_id,
+        'cursor_ts': cursor_ts,
+        'cursor_id': cursor_id,
+        'cursor_offset': cursor_offset,
+        'lines_seen': lines_seen,
+        'first_ts': first_ts,
+        'summary': summary,
+        'update_count': update_count
+    }
+
+
+def _save_state(state, previous_update_count, conn=None):
+    """
+    保存游标和摘要（乐观并发：只有 update_count 没被其他进程改过时才写入）
+
+    Returns:
+        bool: 是否写入成功；False 表示同一执行被其他进程抢先更新，本次结果应丢弃
+    """
+    values = (
+        state['cursor_ts'], state['cursor_id'], state['cursor_offset'], state['lines_seen'],
+        state['first_ts'], state['summary']
+    )
+
+    with use_connection(conn, commit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            if previous_update_count is None:
+                cursor.execute("""
+                    INSERT IGNORE INTO ai_live_summaries (
+                        cursor_ts, cursor_id, cursor_offset, lines_seen, first_ts, summary,
+                        update_count, region, execution_id
+                    ) VALUES (%s, %s, %s, %s, %s, %s, 1, %s, %s)
+                """, values + (state['region'], state['execution_id']))
+            else:
+                cursor.execute("""
+                    UPDATE ai_live_summaries
+                    SET cursor_ts = %s,
+                        cursor_id = %s,
+                        cursor_offset = %s,
+                        lines_seen = %s,
+                        first_ts = %s,
+                        summary = %s,
+                        update_count = update_count + 1
+                    WHERE region = %s AND execution_id = %s AND update_count = %s
+                """, values + (state['region'], state['execution_id'], previous_update_count))
+
+            return cursor.rowcount > 0
+        finally:
+            cursor.close()
+
+
+def _format_delta(rows):
+    """清理时间戳并合并重复行，返回发送给 AI 的日志文本"""
+    messages = clean_messages_batch(message for _, _, message in rows)
+    if COMPACTION_CONFIG['enabled']:
+        messages = compact_rows(zip((timestamp for _, timestamp, _ in rows), messages), COMPACTION_CONFIG)
+    return "\n".join(messages)
+
+
+def _fold_into_summary(state, label, log_text, start_time, end_time, line_count):
+    """
+    把一段新增日志合并进滚动摘要（一次 AI 调用）
+
+    Returns:
+        str: 更新后的摘要
+    """
+    prefix, suffix = split_template(
+        get_prompt('live'),
+        PROMPT_CONFIG['cache_friendly'],
+        region_label=label,
+        execution_id=state['execution_id'],
+        previous_summary=state['summary'] or EMPTY_SUMMARY,
+        start_time=start_time,
+        end_time=end_time,
+        line_count=line_count
+    )
+    summary = call_deepseek_api(
+        prefix + log_text + suffix,
+        max_tokens=LIVE_CONFIG['summary_max_tokens'],
+        verbose=False
+    )
+    return summary.strip()
+
+
+def _cursor(state, keyed):
+    """get_execution_logs_after() 的 after 参数"""
+    if state['cursor_ts'] is None:
+        return None
+    # 旧版本保存的游标没有 cursor_id 时从该秒的第一行开始读取
+    return (state['cursor_ts'], state['cursor_id'] if keyed else state['cursor_offset'] or 0)
+
+
+def _advance_cursor(state, rows, keyed):
+    """把游标移到这一批的最后一行之后"""
+    last_ts = rows[-1][1]
+    if keyed:
+        state['cursor_id'] = rows[-1][0]
+    else:
+        # 该秒已读行数：这一批仍停留在游标的那一秒时累加，否则为这一批中最后一秒的行数
+        same_second = sum(1 for _, timestamp, _ in rows if timestamp == last_ts)
+        carried = (state['cursor_offset'] or 0) if last_ts == state['cursor_ts'] else 0
+        state['cursor_offset'] = carried + same_second
+    state['cursor_ts'] = last_ts
+
+
+def has_log_id(region):
+    """
+    日志表是否有主键 id 列（决定实时摘要使用键集游标还是 时间 + 偏移 游标）
+
+    Args:
+        region: 区域名（见区域注册表）
+
+    Returns:
+        bool
+    """
+    return table_has_column(get_region(region)['table'], 'id')
+
+
+def update_live_summary(region, execution_id=None, max_rows=None, keyed=None):
+    """
+    读取某个执行游标之后的新日志，合并进滚动摘要
+
+    Args:
+        region: 区域名（见区域注册表）
+        execution_id: 执行ID，None 时使用该区域最新的执行
+        max_rows: 每批最多读取的新日志行数，None 时使用 LIVE_CONFIG['max_rows']
+        keyed: 日志表是否有主键 id 列，None 时检查（见 has_log_id）
+
+    Returns:
+        dict 或 None: 没有日志时返回 None，否则 {
+            'region': str,
+            'execution_id': str,
+            'summary': str,       # 最新的滚动摘要
+            'new_lines': int,     # 本次新读到的行数（为 0 时没有调用 AI）
+            'lines_seen': int,    # 累计读到的行数
+            'ai_calls': int,      # 本次调用 AI 的次数
+            'conflict': bool      # 是否被其他进程抢先更新（冲突的那一批结果已丢弃，之前的批次已保存）
+        }
+    """
+    info = get_region(region)
+    max_rows = max_rows or LIVE_CONFIG['max_rows']
+    if keyed is None:
+        keyed = has_log_id(region)
+
+    if execution_id is None:
+        latest = get_latest_execution_id(region)
+        if not latest:
+            return None
+        execution_id = latest[0]
+
+    state = _load_state(region, execution_id)
+    update_count = state['update_count']
+    new_lines = 0
+    ai_calls = 0
+    conflict = False
+
+    while True:
+        rows = get_execution_logs_after(region, execution_id, after=_cursor(state, keyed), limit=max_rows,
+                                        keyed=keyed)
+        if not rows:
+            break
+
+        if state['first_ts'] is None:
+            state['first_ts'] = rows[0][1]
+
+        log_text = _format_delta(rows)
+        chunks = split_lines_by_tokens(log_text, TOKEN_BUDGET_CONFIG['chunk_tokens'])
+        for chunk in chunks:
+            line_count = len(rows) if len(chunks) == 1 else chunk.count("\n") + 1
+            state['summary'] = _fold_into_summary(
+                state, info['label'], chunk, rows[0][1], rows[-1][1], line_count
+            )
+            ai_calls += 1
+
+        _advance_cursor(state, rows, keyed)
+        state['lines_seen'] += len(rows)
+        new_lines += len(rows)
+
+        # 每批都立即保存，后面的批次失败时不用重新生成这一批的摘要
+        if not _save_state(state, update_count):
+            conflict = True
+            break
+        update_count = 1 if update_count is None else update_count + 1
+
+        if len(rows) < max_rows:
+            break
+
+    return {
+        'region': region,
+        'execution_id': execution_id,
+        'summary': state['summary'],
+        'new_lines': new_lines,
+        'lines_seen': state['lines_seen'],
+        'ai_calls': ai_calls,
+        'conflict': conflict
+    }
+
+
+def run_live(regions=None, execution_ids=None, watch_interval=None):
+    """
+    更新并打印各区域的实时进度摘要（各区域并行）
+
+    Args:
+        regions: 区域名列表，None 表示全部启用的区域
+        execution_ids: 可选，{region: execution_id}，未指定的区域使用最新的执行
+        watch_interval: 大于 0 时每隔该秒数重复更新，直到 Ctrl+C
+
+    Returns:
+        dict: {region: update_live_summary() 的结果}（最后一次更新）
+    """
+    regions = regions or [region['name'] for region in REGIONS]
+    execution_ids = execution_ids or {}
+
+    # 启动时检查一次各日志表是否有主键 id 列
+    keyed = {region: has_log_id(region) for region in regions}
+    for region, has_id in keyed.items():
+        if not has_id:
+            print(f"⚠️  {get_region(region)['table']} 没有 id 列，实时摘要改用 时间 + 偏移 游标")
+
+    while True:
+        print(f"\n📡 {time.strftime('%Y-%m-%d %H:%M:%S')} 更新实时进度...")
+
+        with ThreadPoolExecutor(max_workers=len(regions)) as executor:
+            futures = {
+                region: executor.submit(update_live_summary, region, execution_ids.get(region),
+                                        keyed=keyed[region])
+                for region in regions
+            }
+
+            results = {}
+            for region, future in futures.items():
+                label = get_region(region)['label']
+                try:
+                    result = results[region] = future.result()
+                except Exception as e:
+                    results[region] = None
+                    print(f"\n❌ {label}: 更新失败: {e}")
+                    continue
+
+                if result is None:
+                    print(f"\n⚠️  {label}: 没有日志")
+                    continue
+
+                if result['conflict']:
+                    status = "其他进程已更新，冲突的一批结果已丢弃"
+                elif result['new_lines']:
+                    status = f"新增 {result['new_lines']} 行，调用 AI {result['ai_calls']} 次"
+                else:
+                    status = "没有新日志"
+
+                print(f"\n【{label}】execution_id: {result['execution_id']}，"
+                      f"累计 {result['lines_seen']} 行（{status}）")
+                print(result['summary'] or "（还没有摘要）")
+
+        if not watch_interval or watch_interval <= 0:
+            return results
+
+        time.sleep(watch_interval)
@@ -0,0 +1,134 @@
+# modules/log_compactor.py
+"""
+日志压缩模块 - 把连续重复（或只有数字不同）的日志行合并成一行
+
+MAA 日志里有大量重试、等待、重复识别的行，原样发送给 AI 只会浪费 token。
+合并后保留第一条原文，并附上重复次数和时间跨度；
+只有数字不同的相似行还会保留最后一条原文，避免丢失关键数值。
+"""
+import re
+
+from modules.token_budget import estimate_tokens
+
+
+# 不紧跟在英文字母后面的数字（MAA159 这类实例名不参与归一化）
+NUMBER_PATTERN = re.compile(r'(?<![A-Za-z_])\d+(?:\.\d+)?')
+
+
+def new_compaction_stats():
+    """
+    创建压缩统计
+
+    Returns:
+        dict: {
+            'lines_in': int,      # 压缩前行数
+            'lines_out': int,     # 压缩后行数
+            'lines_saved': int,   # 节省的行数
+            'chars_saved': int,   # 节省的字符数
+            'tokens_saved': int   # 估算节省的 token 数
+        }
+    """
+    return {
+        'lines_in': 0,
+        'lines_out': 0,
+        'lines_saved': 0,
+        'chars_saved': 0,
+        'tokens_saved': 0
+    }
+
+
+def _format_time(value):
+    return value.strftime('%H:%M:%S') if hasattr(value, 'strftime') else str(value)
+
+
+# 被合并的字符数超过该值后，合并行肯定比原文短，不再保留原文备份
+PENDING_CHAR_LIMIT = 200
+
+
+def _format_run(run):
+    """
+    把一段连续重复的行格式化为一行
+
+    Args:
+        run: [first_ts, last_ts, first_message, last_message, count, 被合并行的字符数, 被合并行的 token 数]
+
+    Returns:
+        str: 合并后的行
+    """
+    first_ts, last_ts, first_message, last_message, count = run[:5]
+
+    if first_message == last_message:
+        return f"{first_message}（重复 {count} 次，{_format_time(first_ts)} ~ {_format_time(last_ts)}）"
+
+    return (f"{first_message}（相似 {count} 条，最后一条: {last_message}，"
+            f"{_format_time(first_ts)} ~ {_format_time(last_ts)}）")
+
+
+def compact_rows(rows, options, stats=None):
+    """
+    合并连续重复的日志行
+
+    Args:
+        rows: (timestamp, message) 的可迭代对象（消息已清理过时间戳）
+        options: 压缩配置（见 COMPACTION_CONFIG）
+            - min_repeat: 连续出现多少次才合并
+            - normalize_numbers: 只有数字不同的行是否视为相似行
+        stats: 可选，压缩统计（new_compaction_stats()），在迭代过程中累计
+
+    Yields:
+        str: 压缩后的日志行
+    """
+    if stats is None:
+        stats = new_compaction_stats()
+
+    min_repeat = max(2, options.get('min_repeat', 3))
+    normalize = NUMBER_PATTERN.sub if options.get('normalize_numbers', True) else None
+
+    run = None
+    run_key = None
+    pending = []
+
+    def flush():
+        count, saved_chars, saved_tokens = run[4:]
+
+        if count >= min_repeat:
+            line = _format_run(run)
+            suffix = line[len(run[2]):]
+
+            # 合并后反而更长（例如很短的行只重复了几次）时保留原文
+            if saved_chars > len(suffix) or len(pending) < count:
+                stats['lines_out'] += 1
+                stats['lines_saved'] += count - 1
+                stats['chars_saved'] += saved_chars - len(suffix)
+                stats['tokens_saved'] += saved_tokens - estimate_tokens(suffix)
+                yield line
+                return
+
+        for message in pending:
+            stats['lines_out'] += 1
+            yield message
+
+    for timestamp, message in rows:
+        stats['lines_in'] += 1
+        key = normalize('#', message) if normalize else message
+
+        if run is not None and key == run_key:
+            run[1] = timestamp
+            run[3] = message
+            run[4] += 1
+            run[5] += len(message) + 1
+            run[6] += estimate_tokens(message)
+            # 不足 min_repeat 次的段会原样输出，必须保留全部原文
+            if run[5] <= PENDING_CHAR_LIMIT or run[4] < min_repeat:
+                pending.append(message)
+            continue
+
+        if run is not None:
+            yield from flush()
+
+        run = [timestamp, timestamp, message, message, 1, 0, 0]
+        run_key = key
+        pending = [message]
+
+    if run is not None:
+        yield from flush()
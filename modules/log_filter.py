@@ -4,6 +4,12 @@
 """
 import re
 from modules.db_query import get_latest_logs
+from modules.log_compactor import compact_rows, new_compaction_stats
+from config.database import COMPACTION_CONFIG
+
+
+# 匹配形如 [HH:MM:SS] 的时间戳（预编译，避免每行都查一次 re 模块的缓存）
+TIMESTAMP_PATTERN = re.compile(r'^\[\d{2}:\d{2}:\d{2}\]\s*')
 
 
 def clean_duplicate_timestamps(message):
@@ -16,73 +22,135 @@ def clean_duplicate_timestamps(message):
     Returns:
         清理后的消息(不含时间戳)
     """
-    # 匹配形如 [HH:MM:SS] 的时间戳
-    pattern = r'^\[\d{2}:\d{2}:\d{2}\]\s*'
-    cleaned = re.sub(pattern, '', message)
-    return cleaned
+    matched = TIMESTAMP_PATTERN.match(message)
+    return message[matched.end():] if matched else message
 
 
-def filter_logs(data):
+def clean_messages_batch(messages):
     """
-    过滤日志
-    - 提取开始和结束时间
-    - 清理每条日志中的时间戳
-    - 只保留消息内容
+    批量清理一个区域的全部日志消息中的时间戳
+
+    结果与逐条调用 clean_duplicate_timestamps() 完全相同，
+    但整个批次只在一个列表推导里完成，省去每行的函数调用开销。
 
     Args:
-        data: 从 get_latest_logs() 获取的原始数据
+        messages: 原始日志消息的可迭代对象
 
     Returns:
-        过滤后的数据: {
-            'cn': {
-                'execution_id': str,
-                'start_time': datetime,  # 开始时间
-                'end_time': datetime,    # 结束时间
-                'logs': [message1, message2, ...]  # 只有消息,没有时间戳
-            },
-            'jp': { ... }
-        }
+        list: 清理后的消息列表
     """
-    filtered_data = {
-        'cn': None,
-        'jp': None
-    }
+    match = TIMESTAMP_PATTERN.match
+    return [
+        message[matched.end():] if (matched := match(message)) else message
+        for message in messages
+    ]
+
+
+def iter_clean_messages(messages):
+    """
+    clean_messages_batch() 的生成器版本，供流式读取使用
+
+    Args:
+        messages: 原始日志消息的可迭代对象
+
+    Yields:
+        str: 清理后的消息
+    """
+    match = TIMESTAMP_PATTERN.match
+    for message in messages:
+        matched = match(message)
+        yield message[matched.end():] if matched else message
 
-    # 处理中国区日志
-    if data['cn']:
-        logs = data['cn']['logs']
 
-        # 提取开始和结束时间
-        start_time = logs[0][0] if logs else None
-        end_time = logs[-1][0] if logs else None
+def _filter_region(region_data, compact_options=None):
+    """
+    过滤单个区域的日志
 
-        # 清理时间戳,只保留消息
-        cleaned_messages = [clean_duplicate_timestamps(message) for timestamp, message in logs]
+    Args:
+        region_data: get_latest_logs() 返回的某个区域的数据
+        compact_options: 日志压缩配置，None 表示不压缩
 
-        filtered_data['cn'] = {
-            'execution_id': data['cn']['execution_id'],
-            'start_time': start_time,
-            'end_time': end_time,
-            'logs': cleaned_messages
+    Returns:
+        过滤后的区域数据
+    """
+    logs = region_data['logs']
+    stats = new_compaction_stats() if compact_options else None
+
+    if 'line_count' in region_data:
+        # 流式数据：逐行清理，不生成中间列表
+        if compact_options:
+            rows = ((timestamp, clean_duplicate_timestamps(message)) for timestamp, message in logs)
+            messages = compact_rows(rows, compact_options, stats)
+        else:
+            messages = iter_clean_messages(message for timestamp, message in logs)
+
+        return {
+            'execution_id': region_data['execution_id'],
+            'start_time': region_data['start_time'],
+            'end_time': region_data['end_time'],
+            'logs': messages,
+            'line_count': region_data['line_count'],
+            'compaction': stats
         }
 
-    # 处理日本区日志
-    if data['jp']:
-        logs = data['jp']['logs']
+    # 提取开始和结束时间
+    start_time = logs[0][0] if logs else None
+    end_time = logs[-1][0] if logs else None
+
+    # 清理时间戳,只保留消息
+    cleaned_messages = clean_messages_batch(message for timestamp, message in logs)
+    line_count = len(cleaned_messages)
+
+    # 合并连续重复的行
+    if compact_options:
+        rows = zip((timestamp for timestamp, message in logs), cleaned_messages)
+        cleaned_messages = list(compact_rows(rows, compact_options, stats))
+
+    return {
+        'execution_id': region_data['execution_id'],
+        'start_time': start_time,
+        'end_time': end_time,
+        'logs': cleaned_messages,
+        'line_count': line_count,
+        'compaction': stats
+    }
+
 
-        # 提取开始和结束时间
-        start_time = logs[0][0] if logs else None
-        end_time = logs[-1][0] if logs else None
+def filter_logs(data, compact=None):
+    """
+    过滤日志
+    - 提取开始和结束时间
+    - 清理每条日志中的时间戳
+    - 只保留消息内容
+    - 合并连续重复的日志行（可配置）
 
-        # 清理时间戳,只保留消息
-        cleaned_messages = [clean_duplicate_timestamps(message) for timestamp, message in logs]
+    Args:
+        data: 从 get_latest_logs() 获取的原始数据
+              （流式数据的 'logs' 为生成器，此时返回的 'logs' 也是生成器，
+              开始/结束时间和条数取自数据库统计值）
+        compact: 日志压缩配置；None 时按 COMPACTION_CONFIG['enabled'] 决定，
+                 False 表示不压缩，dict 表示使用指定配置
 
-        filtered_data['jp'] = {
-            'execution_id': data['jp']['execution_id'],
-            'start_time': start_time,
-            'end_time': end_time,
-            'logs': cleaned_messages
+    Returns:
+        过滤后的数据（键与 data 相同，即各启用区域）: {
+            region: {
+                'execution_id': str,
+                'start_time': datetime,  # 开始时间
+                'end_time': datetime,    # 结束时间
+                'logs': [message1, message2, ...],  # 只有消息,没有时间戳
+                'line_count': int,       # 日志条数（压缩前）
+                'compaction': dict       # 压缩统计（未压缩时为 None，流式时迭代完才完整）
+            } 或 None,
+            ...
         }
+    """
+    if compact is None:
+        compact = COMPACTION_CONFIG if COMPACTION_CONFIG['enabled'] else False
 
-    return filtered_data
+    compact_options = compact or None
+
+    return {
+        region: _filter_region(region_data, compact_options) if region_data else None
+        for region, region_data in data.items()
+    }
 
@@ -0,0 +1,288 @@
+# modules/log_segmenter.py
+"""
+日志分段模块 - 按 MAA 切分每个区域的日志，每段只保留关键部分
+
+同一区域的 MAA 按区域注册表中的顺序前后执行，分界标记来自 config/rules.json：
+- instances.<MAA>.success: 完成标记，该行（含）之前属于这个 MAA
+- instances.<MAA>.start: 可选，开始标记，该行（含）之后属于这个 MAA
+
+每段保留开头 head_lines 行、结尾 tail_lines 行，以及关键行前后各 context_lines 行；
+关键行为包含任意标记（完成/开始/出错/需要关注）或 context 关键词的行，
+只靠出错标记或 context 关键词命中、同时包含 ignore 内容的行（例如掉落识别错误）不算关键行。
+被省略的部分替换为一行省略说明。本地规则判定会用到的行（完成标记、需要关注、未被忽略的出错行）都会保留，
+所以可以先分段再做规则判定，结果与对完整日志判定相同。
+
+健康的执行绝大部分是重复的战斗、基建日志，分段后 prompt 通常只剩原来的十分之一左右，
+而提示词判定所依赖的完成标记、出错行和公招结果都会保留。
+"""
+import re
+from collections import deque
+
+from config.database import SEGMENT_CONFIG
+from modules.regions import REGIONS
+from modules.rules import load_rules
+
+
+_pattern_cache = {}
+
+
+def _compile(raw):
+    """
+    编译规则文件中的分界标记和关键词
+
+    Returns:
+        dict: {
+            'boundaries': 合并的分界标记正则,
+            'kinds': {标记: ('start' / 'success', MAA)},
+            'keywords': 合并的关键行正则,
+            'markers': 合并的完成/开始/需要关注标记正则（包含 ignore 内容也是关键行）,
+            'ignore': tuple
+        }
+    """
+    kinds = {}
+    for instance, rule in raw.get('instances', {}).items():
+        for marker in rule.get('start', []):
+            kinds[marker] = ('start', instance)
+        for marker in rule.get('success', []):
+            kinds[marker] = ('success', instance)
+
+    markers = set(kinds) | set(raw.get('highlight', []))
+    keywords = set(markers)
+    for key in ('failure', 'context'):
+        keywords.update(raw.get(key, []))
+
+    def union(markers):
+        markers = sorted(markers, key=len, reverse=True)
+        return re.compile('|'.join(re.escape(marker) for marker in markers)) if markers else None
+
+    return {
+        'boundaries': union(kinds),
+        'kinds': kinds,
+        'keywords': union(keywords),
+        'markers': union(markers),
+        'ignore': tuple(raw.get('ignore', []))
+    }
+
+
+def _patterns(rules):
+    key = id(rules['raw'])
+    compiled = _pattern_cache.get(key)
+    if compiled is None:
+        compiled = _pattern_cache[key] = _compile(rules['raw'])
+    return compiled
+
+
+class _SpanCondenser:
+    """
+    逐行接收一段（一个 MAA）的日志，只保存可能被输出的行
+
+    - 这一段不超过 min_lines 行时原样输出，所以前 min_lines 行先全部缓存，超过后丢弃
+    - 否则保留开头 head_lines 行、结尾 tail_lines 行，以及关键行前后各 context_lines 行：
+      关键行之后的行在到达时保存，之前的行和结尾的行从最近若干行的滚动窗口中取
+    - 只隔一两行的两个保留范围直接连起来（省略说明本身也占一行）
+
+    内存占用与保留的行数成正比，与这一段的总行数无关（流式读取日志时不会把整个区域读入内存）。
+    """
+
+    def __init__(self, patterns, options):
+        self._patterns = patterns
+        self._options = options
+
+        self.count = 0
+        self._buffer = []
+        self._ranges = [(0, options['head_lines'])]
+        self._covered = options['head_lines']
+        self._kept = {}
+        # 关键行之前的 context_lines 行、结尾的 tail_lines 行，再加上可能被连起来的两行间隔
+        self._window = deque(maxlen=max(options['tail_lines'], options['context_lines']) + 3)
+
+    def add(self, line):
+        index = self.count
+        self.count += 1
+
+        if self._buffer is not None:
+            if index < self._options['min_lines']:
+                self._buffer.append(line)
+            else:
+                self._buffer = None
+
+        if self._is_key(line):
+            context = self._options['context_lines']
+            self._ranges.append((index - context, index + context + 1))
+            self._covered = max(self._covered, index + context + 1)
+            for position, previous in self._window:
+                if position >= index - context - 2:
+                    self._kept[position] = previous
+
+        if index < self._covered:
+            self._kept[index] = line
+        self._window.append((index, line))
+
+    def _is_key(self, line):
+        patterns = self._patterns
+        if patterns['keywords'] is None or not patterns['keywords'].search(line):
+            return False
+        if not any(ignored in line for ignored in patterns['ignore']):
+            return True
+        return patterns['markers'] is not None and patterns['markers'].search(line) is not None
+
+    def finish(self):
+        """
+        Returns:
+            tuple: (保留的行（省略处为一行说明）, 省略的行数)
+        """
+        total = self.count
+        if total <= self._options['min_lines']:
+            return self._buffer, 0
+
+        for position, line in self._window:
+            self._kept[position] = line
+
+        ranges = sorted(self._ranges + [(total - self._options['tail_lines'], total)])
+        kept = []
+        elided = 0
+        position = 0
+
+        for start, end in ranges:
+            start, end = max(start, position), min(end, total)
+            # 只隔一两行时直接保留，省略说明本身也占一行
+            if start - position <= 2:
+                start = position
+            if start >= end:
+                continue
+            if start > position:
+                kept.append(f"……（省略 {start - position} 行）……")
+                elided += start - position
+            kept.extend(self._kept[index] for index in range(start, end))
+            position = end
+
+        if position < total:
+            kept.append(f"……（省略 {total - position} 行）……")
+            elided += total - position
+
+        return kept, elided
+
+
+def _segment_region(info, lines, patterns, options):
+    """
+    逐行分段单个区域的日志（lines 可以是生成器，只读一遍）
+
+    同一区域的 MAA 按区域注册表中的顺序前后执行：
+    开始标记所在行（含）之后属于该 MAA，完成标记所在行（含）之前属于当前的 MAA。
+    某个 MAA 没有完成标记时无法确定它和后面的 MAA 的分界，
+    直到出现后面某个 MAA 的标记为止的日志合并为一段，标注为多个 MAA；
+    所有 MAA 完成之后的日志单独成一段。
+
+    Returns:
+        tuple: (分段后的日志行, 分段统计)
+    """
+    names = info['maa_instances']
+    order = {name: index for index, name in enumerate(names)}
+    boundaries = patterns['boundaries'] if names else None
+
+    output = []
+    stats = {
+        'lines_in': 0,
+        'lines_out': 0,
+        'lines_elided': 0,
+        'spans': []
+    }
+    span = {'start': 0, 'condenser': _SpanCondenser(patterns, options)}
+
+    def close(instances, next_start):
+        """结束当前段，输出分段标题和保留的行，下一段从 next_start 行开始"""
+        condenser = span['condenser']
+        start, count = span['start'], condenser.count
+        kept, elided = condenser.finish()
+
+        if instances or names:
+            name = ' / '.join(instances) or '所有 MAA 完成之后'
+            if count == 0:
+                output.append(f"—— {name}：没有日志 ——")
+            elif count == 1:
+                output.append(f"—— {name}：第 {start + 1} 行 ——")
+            elif elided:
+                output.append(f"—— {name}：第 {start + 1}-{start + count} 行，共 {count} 行，"
+                              f"保留 {count - elided} 行 ——")
+            else:
+                output.append(f"—— {name}：第 {start + 1}-{start + count} 行，共 {count} 行 ——")
+
+        output.extend(kept)
+        stats['lines_elided'] += elided
+        stats['spans'].append({'instances': instances, 'lines': count, 'elided': elided})
+
+        span['start'] = next_start
+        span['condenser'] = _SpanCondenser(patterns, options)
+
+    current = 0
+    line_number = -1
+
+    for line_number, line in enumerate(lines):
+        added = False
+
+        if boundaries is not None:
+            for match in boundaries.finditer(line):
+                kind, name = patterns['kinds'][match.group()]
+                index = order.get(name)
+                if index is None or index < current:
+                    continue
+
+                if kind == 'start' and index > current:
+                    close(names[current:index], line_number + added)
+                    current = index
+                elif kind == 'success':
+                    if not added:
+                        span['condenser'].add(line)
+                        added = True
+                    close(names[current:index + 1], line_number + 1)
+                    current = index + 1
+
+        if not added:
+            span['condenser'].add(line)
+
+    stats['lines_in'] = line_number + 1
+
+    if current < len(names):
+        close(names[current:], stats['lines_in'])
+    elif not names or span['condenser'].count:
+        close([], stats['lines_in'])
+
+    stats['lines_out'] = len(output)
+    return output, stats
+
+
+def segment_logs(filtered_data, options=None, rules=None, skip_regions=()):
+    """
+    按 MAA 分段并省略不重要的日志行
+
+    日志逐行处理，只保存会被输出的行：流式读取的日志（生成器）在这里被读完，
+    不会把整个区域读入内存，分段结果是列表，之后的步骤（本地规则判定、构建 prompt）照常使用。
+
+    Args:
+        filtered_data: filter_logs() 的结果（或 abridge_for_llm() 的结果）
+        options: 分段配置，None 时使用 SEGMENT_CONFIG
+        rules: 可选，load_rules() 的结果
+        skip_regions: 不分段的区域（例如本地规则已判定成功、日志已被精简的区域）
+
+    Returns:
+        dict: 与 filtered_data 结构相同的新 dict（不修改各区域原有的日志列表），
+              每个区域多一个 'segmentation' 键: {
+                  'lines_in': int,       # 分段前行数
+                  'lines_out': int,      # 分段后行数（含分段标题和省略说明）
+                  'lines_elided': int,   # 省略的行数
+                  'spans': [{'instances': [MAA, ...], 'lines': int, 'elided': int}, ...]
+              }
+    """
+    options = options or SEGMENT_CONFIG
+    patterns = _patterns(rules or load_rules())
+    segmented = dict(filtered_data)
+
+    for info in REGIONS:
+        region_data = filtered_data.get(info['name'])
+        if not region_data or info['name'] in skip_regions:
+            continue
+
+        logs, stats = _segment_region(info, region_data['logs'], patterns, options)
+        segmented[info['name']] = {**region_data, 'logs': logs, 'segmentation': stats}
+
+    return segmented
@@ -0,0 +1,113 @@
+# modules/metrics.py
+"""
+报告指标模块 - 记录一次报告生成各步骤的耗时和 AI 调用的延迟指标
+
+每次生成结束后输出一行 JSON（追加到 METRICS_CONFIG['jsonl_path']），
+可选写入 ai_report_metrics 表（需先运行 migrate.py），方便按时间追踪性能回退。
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from config.database import METRICS_CONFIG
+from modules.db_query import save_report_metrics
+
+
+class ReportMetrics:
+    """
+    一次报告生成的指标
+
+    - stage(name): 计时上下文，记录该步骤耗时，可在 with 块内补充字段
+    - prompt / llm: build_prompt 与 DeepSeek 调用的指标，由 process_with_ai() 填写
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+
+        self.stages = {}
+        self.prompt = {}
+        self.llm = {}
+        self.fields = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        记录一个步骤的耗时
+
+        Args:
+            name: 步骤名
+
+        Yields:
+            dict: 该步骤的指标，可在 with 块内追加字段（如 rows）
+        """
+        entry = self.stages.setdefault(name, {})
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['seconds'] = round(entry.get('seconds', 0) + time.perf_counter() - start, 4)
+
+    def set(self, **fields):
+        """记录报告级别的字段（report_id、执行ID、状态等）"""
+        self.fields.update(fields)
+
+    def to_dict(self):
+        return {
+            'ts': self.started_at.isoformat(timespec='seconds'),
+            **self.fields,
+            'total_seconds': round(time.perf_counter() - self._start, 4),
+            'stages': self.stages,
+            'prompt': self.prompt,
+            'llm': self.llm
+        }
+
+    def summary(self):
+        """
+        Returns:
+            str: 各步骤耗时的单行摘要
+        """
+        parts = [f"{name} {entry['seconds']:.2f}s" for name, entry in self.stages.items()]
+        if self.llm.get('ttft_seconds') is not None:
+            parts.append(f"首字 {self.llm['ttft_seconds']:.2f}s")
+        if self.llm.get('tokens_per_second'):
+            parts.append(f"{self.llm['tokens_per_second']:.1f} tokens/s")
+        if (self.llm.get('hedge') or {}).get('fired'):
+            parts.append(f"对冲请求（采用{'对冲' if self.llm['hedge'].get('winner') == 'hedge' else '原'}请求）")
+        if self.llm.get('prompt_cache_hit_tokens') is not None:
+            parts.append(f"缓存命中 {self.llm['prompt_cache_hit_tokens']}/"
+                         f"{self.llm['prompt_cache_hit_tokens'] + (self.llm['prompt_cache_miss_tokens'] or 0)} tokens")
+        return '，'.join(parts)
+
+
+def emit_metrics(metrics, conn=None):
+    """
+    输出指标：追加一行 JSON 到 jsonl 文件，按配置写入数据库；失败只打印警告
+
+    Args:
+        metrics: ReportMetrics
+        conn: 可选，复用调用方的连接
+    """
+    if not METRICS_CONFIG['enabled']:
+        return
+
+    record = metrics.to_dict()
+
+    try:
+        path = METRICS_CONFIG['jsonl_path']
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    except OSError as e:
+        print(f"   ⚠️  写入指标文件失败: {e}")
+
+    if METRICS_CONFIG['persist_db'] and record.get('report_id'):
+        try:
+            save_report_metrics(record, conn=conn)
+        except Exception as e:
+            print(f"   ⚠️  写入指标表失败（是否已运行 migrate.py？）: {e}")
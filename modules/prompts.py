@@ -0,0 +1,123 @@
+# modules/prompts.py
+"""
+提示词模块 - 按需读取 prompts/ 目录下的提示词文件
+
+提示词在第一次使用时才读取并缓存，导入本模块不读文件，
+也不依赖 requests/pymysql，查看提示词之类的命令可以很快启动。
+"""
+import os
+
+
+# 提示词名称 -> 文件名（相对于 prompts/ 目录）
+PROMPT_FILES = {
+    'system': 'system_prompt.txt',
+    'user': 'user_prompt.txt',
+    'chunk': 'chunk_prompt.txt',
+    'live': 'live_prompt.txt',
+    'region': 'region_prompt.txt',
+    'merge': 'merge_prompt.txt'
+}
+
+# 缓存友好布局中代替 {log_content} 的说明，日志本身放在消息末尾
+LOG_CONTENT_NOTE = '（执行日志附在本消息末尾）'
+
+# 缓存友好布局中静态部分和日志之间的分隔
+LOG_CONTENT_SEPARATOR = '\n\n'
+
+_prompt_cache = {}
+
+
+def load_prompt_from_file(filename):
+    """
+    从文件加载提示词
+
+    Args:
+        filename: 文件名（相对于 prompts/ 目录）
+
+    Returns:
+        文件内容字符串
+    """
+    # 获取项目根目录
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(current_dir)
+    prompt_file = os.path.join(project_root, 'prompts', filename)
+
+    try:
+        # utf-8-sig 去掉编辑器可能写入的 BOM，文本模式把 \r\n 统一为 \n，
+        # 保证同样的提示词在任何机器上都是逐字节相同的前缀（DeepSeek 上下文缓存按前缀命中）
+        with open(prompt_file, 'r', encoding='utf-8-sig') as f:
+            return f.read()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"提示词文件未找到: {prompt_file}")
+    except Exception as e:
+        raise Exception(f"读取提示词文件失败: {e}")
+
+
+def get_prompt(name):
+    """
+    获取提示词（第一次调用时读取文件）
+
+    Args:
+        name: PROMPT_FILES 中的名称（'system' / 'user' / 'chunk' / 'live' / 'region' / 'merge'）
+
+    Returns:
+        str: 提示词内容
+    """
+    prompt = _prompt_cache.get(name)
+    if prompt is None:
+        prompt = _prompt_cache[name] = load_prompt_from_file(PROMPT_FILES[name])
+    return prompt
+
+
+def split_template(template, cache_friendly=False, **fields):
+    """
+    把提示词模板在 {log_content} 处切成前后两段
+
+    - 默认布局：与 template.format(log_content=...) 完全相同，日志后面可能还有说明
+    - 缓存友好布局：模板中的全部说明（包括原来在日志后面的部分）都放在前面，
+      {log_content} 处换成 LOG_CONTENT_NOTE，日志放在最后，suffix 为空。
+      同一模板每次生成的 prefix 逐字节相同，可以命中 DeepSeek 的上下文缓存。
+
+    Args:
+        template: 提示词模板
+        cache_friendly: 是否使用缓存友好布局
+        **fields: 模板中除 log_content 以外的字段
+
+    Returns:
+        tuple: (prefix, suffix)，prefix + log_content + suffix 即完整 prompt
+    """
+    if cache_friendly:
+        static = template.format(log_content=LOG_CONTENT_NOTE, **fields)
+        return static + LOG_CONTENT_SEPARATOR, ''
+
+    sentinel = '\0'
+    prefix, suffix = template.format(log_content=sentinel, **fields).split(sentinel, 1)
+    return prefix, suffix
+
+
+def show_current_prompts():
+    """显示当前使用的提示词"""
+    print("\n" + "=" * 80)
+    print("📝 当前系统提示词:")
+    print("=" * 80)
+    print(get_prompt('system'))
+
+    print("\n" + "=" * 80)
+    print("📝 当前用户提示词模板:")
+    print("=" * 80)
+    print(get_prompt('user'))
+    print("=" * 80 + "\n")
+
+
+def reload_prompts():
+    """重新加载提示词文件"""
+    try:
+        loaded = {name: load_prompt_from_file(filename) for name, filename in PROMPT_FILES.items()}
+    except Exception as e:
+        print(f"❌ 重新加载失败: {e}")
+        return False
+
+    _prompt_cache.clear()
+    _prompt_cache.update(loaded)
+    print("✅ 提示词已重新加载")
+    return True
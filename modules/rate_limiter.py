@@ -0,0 +1,77 @@
+# modules/rate_limiter.py
+"""
+限流模块 - 令牌桶，限制一段时间内发往 DeepSeek API 的请求数
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶
+
+    - 每秒补充 rate 个令牌，最多积累 capacity 个（允许的突发量）
+    - acquire() 在没有令牌时阻塞等待，try_acquire() 在没有令牌时直接返回 False
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("令牌补充速率必须大于 0")
+
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        取出令牌，不足时等待
+
+        Args:
+            tokens: 需要的令牌数
+            timeout: 可选，最多等待的秒数；None 表示一直等待
+
+        Returns:
+            float: 实际等待的秒数
+
+        Raises:
+            TimeoutError: timeout 秒内取不到令牌（不会先空等到超时）
+        """
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+
+            if timeout is not None and waited + delay > timeout:
+                raise TimeoutError(f"{timeout:.1f} 秒内取不到令牌")
+
+            time.sleep(delay)
+            waited += delay
+
+    def try_acquire(self, tokens=1):
+        """
+        取出令牌，不足时不等待
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            bool: 是否取到
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
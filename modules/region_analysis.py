@@ -0,0 +1,339 @@
+# modules/region_analysis.py
+"""
+按区域并行生成报告 - 每个区域一个流式请求，生成时间约为最长的一个区域，而不是所有区域之和
+
+1. 每个区域使用区域提示词（prompts/region_prompt.txt）单独发起请求，各请求同时进行
+2. 终端按区域顺序显示：排在最前面、还没完成的区域实时显示，后面的区域先缓存，轮到时一次性补上
+3. 各区域段落拼接后，最后的「## 总结」在本地根据各区域结论行拼装，
+   或按 REGION_PARALLEL_CONFIG['merge'] 用一次简短的 AI 调用生成（prompts/merge_prompt.txt，生成完整后才写出）
+"""
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.database import HTTP_CONFIG, PROMPT_CONFIG, REGION_PARALLEL_CONFIG, TOKEN_BUDGET_CONFIG
+from modules.ai_processor import (
+    _iter_region_header,
+    call_deepseek_api,
+    call_deepseek_api_stream,
+    summarize_chunks
+)
+from modules.prompts import get_prompt, split_template
+from modules.regions import REGIONS
+from modules.rules import format_hour, load_rules
+from modules.sse import BufferedWriter, NullWriter
+from modules.token_budget import estimate_tokens
+
+
+REPORT_TITLE = "# 执行报告\n\n"
+
+# 区域段落最后一行的结论（见区域提示词）
+REGION_STATUS_PATTERN = re.compile(r'【区域状态：(成功|失败|部分成功)】')
+RERUN_PATTERN = re.compile(r'【重新执行[^】]*】')
+
+
+def region_tag(info):
+    """提示词中区域的简称（日志表名去掉 _logs，例如 arkcn）"""
+    table = info['table']
+    return table[:-len('_logs')] if table.endswith('_logs') else table
+
+
+def build_region_prompt(info, region_data, sections=None):
+    """
+    生成单个区域的 prompt
+
+    Args:
+        info: 区域注册表中的一项
+        region_data: filter_logs() 返回的该区域数据
+        sections: 可选，传入列表时追加日志正文在 prompt 中的位置（格式同 build_prompt）
+
+    Returns:
+        str: 完整 prompt
+    """
+    instances = load_rules()['raw'].get('instances', {})
+    markers = [
+        f"【{marker}】"
+        for name in info['maa_instances']
+        for marker in instances.get(name, {}).get('success', [])
+    ]
+
+    prefix, suffix = split_template(
+        get_prompt('region'),
+        PROMPT_CONFIG['cache_friendly'],
+        region_label=info['label'],
+        region_tag=region_tag(info),
+        maa_instances='、'.join(info['maa_instances']) or '（未配置）',
+        success_markers='、'.join(markers) or '（未配置）'
+    )
+
+    header = "\n".join(_iter_region_header(info, region_data)) + "\n"
+    body = "\n".join(region_data['logs'])
+
+    if sections is not None:
+        start = len(prefix) + len(header)
+        sections.append({'region': info['name'], 'label': info['label'], 'start': start, 'end': start + len(body)})
+
+    return prefix + header + body + suffix
+
+
+class _OrderedOutput:
+    """
+    多个并行的流按区域顺序输出
+
+    排在最前面、还没完成的区域直接写出，后面的区域先缓存；
+    前面的区域完成时，下一个区域缓存的内容一次性写出，之后继续实时写出。
+    写出的内容同时交给 on_content（例如写入报告记录），顺序与最终报告一致。
+    """
+
+    def __init__(self, count, output, on_content=None):
+        self._output = output
+        self._on_content = on_content
+        self._lock = threading.Lock()
+        self._buffers = [[] for _ in range(count)]
+        self._finished = [False] * count
+        self._current = 0
+
+    def _emit(self, text):
+        self._output.write(text)
+        if self._on_content is not None:
+            self._on_content(text)
+
+    def emit(self, text):
+        """直接写出（标题、总结等不属于某个区域的内容）"""
+        with self._lock:
+            self._emit(text)
+
+    def write(self, index, text):
+        with self._lock:
+            if index == self._current:
+                self._emit(text)
+            else:
+                self._buffers[index].append(text)
+
+    def finish(self, index):
+        """标记某个区域已完成，写出排在它后面、已缓存的区域内容"""
+        with self._lock:
+            self._finished[index] = True
+            while self._current < len(self._finished) and self._finished[self._current]:
+                self._current += 1
+                if self._current < len(self._buffers) and self._buffers[self._current]:
+                    self._emit(''.join(self._buffers[self._current]))
+                    self._buffers[self._current] = []
+            self._output.flush()
+
+    def writer(self, index):
+        """某个区域的输出对象（call_deepseek_api_stream 的 output 参数）"""
+        return _SlotWriter(self, index)
+
+
+class _SlotWriter:
+    def __init__(self, ordered, index):
+        self._ordered = ordered
+        self._index = index
+
+    def write(self, text):
+        self._ordered.write(self._index, text)
+
+    def flush(self):
+        pass
+
+
+def _local_summary(regions, sections):
+    """
+    根据各区域段落的结论行拼装「## 总结」
+
+    Returns:
+        str: Markdown
+    """
+    statuses = []
+    lines = []
+
+    for (info, region_data), section in zip(regions, sections):
+        matched = REGION_STATUS_PATTERN.search(section)
+        status = matched.group(1) if matched else None
+        statuses.append(status)
+
+        reruns = ''.join(dict.fromkeys(RERUN_PATTERN.findall(section)))
+        lines.append(f"- {info['label']}：{status or '未给出结论，见上文'}"
+                     f"（{format_hour(region_data['start_time'])} ~ {format_hour(region_data['end_time'])}）"
+                     f"{reruns}")
+
+    if None in statuses:
+        overall = '见各区域详情'
+    elif all(status == '成功' for status in statuses):
+        overall = '成功'
+    elif all(status == '失败' for status in statuses):
+        overall = '失败'
+    else:
+        overall = '部分成功'
+
+    return "\n".join(["## 总结", f"- 总体状态：**{overall}**", *lines])
+
+
+def _merge_stats(region_stats, merge_stats, wall_seconds):
+    """
+    汇总各次调用的延迟指标（字段与 _generation_stats 相同，另附每次调用的明细）
+
+    - ttft_seconds: 最早出现内容的区域的首字延迟
+    - tokens_per_second: 所有调用的输出 token 之和 / 首字之后的总墙钟时间
+    """
+    calls = list(region_stats.values()) + ([merge_stats] if merge_stats else [])
+    usage = {}
+    for stats in calls:
+        for key, value in (stats.get('usage') or {}).items():
+            if isinstance(value, int):
+                usage[key] = usage.get(key, 0) + value
+
+    ttfts = [stats['ttft_seconds'] for stats in region_stats.values() if stats.get('ttft_seconds') is not None]
+    ttft = min(ttfts) if ttfts else None
+    completion_tokens = sum(stats.get('completion_tokens') or 0 for stats in calls)
+    decode_seconds = wall_seconds - (ttft or 0)
+
+    def total(key):
+        values = [stats.get(key) for stats in calls if stats.get(key) is not None]
+        return sum(values) if values else None
+
+    return {
+        'mode': 'parallel_regions',
+        'ttft_seconds': ttft,
+        'generation_seconds': round(wall_seconds, 4),
+        'completion_chars': sum(stats.get('completion_chars') or 0 for stats in calls),
+        'completion_tokens': completion_tokens,
+        'tokens_per_second': round(completion_tokens / decode_seconds, 2) if decode_seconds > 0 else None,
+        'prompt_cache_hit_tokens': total('prompt_cache_hit_tokens'),
+        'prompt_cache_miss_tokens': total('prompt_cache_miss_tokens'),
+        'usage': usage or None,
+        'regions': region_stats,
+        'merge': merge_stats
+    }
+
+
+def process_regions_in_parallel(filtered_data, stream=True, on_content=None, metrics=None, options=None,
+                                deadline=None, limiter=None):
+    """
+    按区域并行生成报告
+
+    Args:
+        filtered_data: 过滤后的数据（结构同 filter_logs() 的结果）
+        stream: 是否使用流式输出
+        on_content: 可选，按最终报告顺序收到每段内容时的回调
+        metrics: 可选，ReportMetrics
+        options: 并行配置，None 时使用 REGION_PARALLEL_CONFIG
+        deadline: 可选，Deadline，各区域请求和总结请求都不超过剩余时间
+        limiter: 可选，限流器，传给每次 DeepSeek 请求（见 request_with_retry）
+
+    Returns:
+        str: 完整报告（标题 + 各区域段落 + 总结）
+    """
+    options = options or REGION_PARALLEL_CONFIG
+    budget = TOKEN_BUDGET_CONFIG if TOKEN_BUDGET_CONFIG['enabled'] else False
+    regions = [(info, filtered_data[info['name']]) for info in REGIONS if filtered_data.get(info['name'])]
+
+    # 构建各区域的 prompt；超过 Token 预算的区域先分段摘要（map-reduce 的 map 阶段）
+    prompts = []
+    prompt_stats = {'regions': {}}
+    for position, (info, region_data) in enumerate(regions):
+        sections = []
+        prompt = build_region_prompt(info, region_data, sections)
+        tokens = estimate_tokens(prompt)
+
+        if budget and tokens > budget['max_prompt_tokens']:
+            print(f"   ⚠️  {info['label']} prompt 约 {tokens} tokens，超过预算 {budget['max_prompt_tokens']}")
+            region_data = summarize_chunks(prompt, sections, {info['name']: region_data}, budget,
+                                           deadline=deadline, limiter=limiter)[info['name']]
+            regions[position] = (info, region_data)
+            prompt = build_region_prompt(info, region_data)
+            tokens = estimate_tokens(prompt)
+
+        prompts.append(prompt)
+        prompt_stats['regions'][info['name']] = {'chars': len(prompt), 'estimated_tokens': tokens}
+
+    prompt_stats['chars'] = sum(len(prompt) for prompt in prompts)
+    prompt_stats['estimated_tokens'] = sum(entry['estimated_tokens'] for entry in prompt_stats['regions'].values())
+
+    print(f"   ⚡ 按区域并行生成: {len(regions)} 个请求同时进行")
+
+    output = BufferedWriter(flush_interval=HTTP_CONFIG['stream_flush_interval']) if stream else NullWriter()
+    ordered = _OrderedOutput(len(regions), output, on_content)
+    region_stats = {info['name']: {} for info, _ in regions}
+    start_time = time.time()
+
+    def analyze(position):
+        info, _ = regions[position]
+        try:
+            if stream:
+                return call_deepseek_api_stream(
+                    prompts[position],
+                    max_tokens=options['region_max_tokens'],
+                    output=ordered.writer(position),
+                    stats=region_stats[info['name']],
+                    deadline=deadline,
+                    limiter=limiter
+                ).strip()
+            section = call_deepseek_api(
+                prompts[position],
+                max_tokens=options['region_max_tokens'],
+                verbose=False,
+                stats=region_stats[info['name']],
+                deadline=deadline,
+                limiter=limiter
+            ).strip()
+            ordered.write(position, section)
+            return section
+        finally:
+            ordered.write(position, "\n\n")
+            ordered.finish(position)
+
+    ordered.emit(REPORT_TITLE)
+    with ThreadPoolExecutor(max_workers=len(regions)) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, analyze, position) for position in range(len(regions))
+        ]
+        sections = [future.result() for future in futures]
+
+    merge_stats = None
+    summary = None
+    if options['merge'] == 'llm':
+        prefix, suffix = split_template(get_prompt('merge'), PROMPT_CONFIG['cache_friendly'])
+        merge_stats = {}
+        try:
+            if stream:
+                # 总结完整生成后才写出：中途失败时改用本地总结，输出和报告记录中不会留下半段内容
+                summary = call_deepseek_api_stream(
+                    prefix + "\n\n".join(sections) + suffix,
+                    max_tokens=options['merge_max_tokens'],
+                    output=NullWriter(),
+                    stats=merge_stats,
+                    deadline=deadline,
+                    limiter=limiter
+                ).strip()
+            else:
+                summary = call_deepseek_api(
+                    prefix + "\n\n".join(sections) + suffix,
+                    max_tokens=options['merge_max_tokens'],
+                    verbose=False,
+                    stats=merge_stats,
+                    deadline=deadline,
+                    limiter=limiter
+                ).strip()
+        except Exception as e:
+            print(f"\n   ⚠️  生成总结失败，改为本地拼装: {e}")
+            merge_stats = None
+
+    if summary is None:
+        summary = _local_summary(regions, sections)
+    ordered.emit(summary)
+
+    output.flush()
+    report = REPORT_TITLE + "\n\n".join(sections) + "\n\n" + summary
+
+    if not stream:
+        print(report)
+
+    if metrics is not None:
+        metrics.prompt.update(prompt_stats)
+        metrics.llm.update(_merge_stats(region_stats, merge_stats, time.time() - start_time))
+
+    return report
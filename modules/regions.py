@@ -0,0 +1,69 @@
+# modules/regions.py
+"""
+区域注册表模块 - 各步骤需要的区域信息（日志表、标题、预期 MAA 实例）都从这里读取
+
+注册表定义在 config/settings.py 的 REGION_REGISTRY 中，环境变量 REGIONS 选择启用的区域。
+"""
+import hashlib
+
+from config.database import REGION_REGISTRY, ENABLED_REGIONS
+
+
+def _load_regions(registry, enabled):
+    """
+    按注册表顺序取出启用的区域
+
+    Raises:
+        ValueError: 启用了注册表中不存在的区域，或没有启用任何区域
+    """
+    names = [region['name'] for region in registry]
+    unknown = [name for name in enabled if name not in names]
+    if unknown:
+        raise ValueError(f"未知的区域: {', '.join(unknown)}（可选: {', '.join(names)}）")
+
+    regions = [region for region in registry if region['name'] in enabled]
+    if not regions:
+        raise ValueError("没有启用任何区域，请检查环境变量 REGIONS")
+    return regions
+
+
+# 启用的区域（按注册表顺序），每项为 REGION_REGISTRY 中的 dict
+REGIONS = _load_regions(REGION_REGISTRY, ENABLED_REGIONS)
+
+# 区域名 -> 区域信息
+REGIONS_BY_NAME = {region['name']: region for region in REGIONS}
+
+
+def region_names():
+    """启用的区域名列表（按注册表顺序）"""
+    return [region['name'] for region in REGIONS]
+
+
+def get_region(name):
+    """
+    获取启用区域的信息
+
+    Raises:
+        KeyError: 区域不存在或未启用
+    """
+    try:
+        return REGIONS_BY_NAME[name]
+    except KeyError:
+        raise KeyError(f"区域未启用: {name}（已启用: {', '.join(REGIONS_BY_NAME)}）") from None
+
+
+def execution_key(execution_ids):
+    """
+    计算一组执行ID的键（报告缓存和去重用）
+
+    按区域名排序后拼成 "cn=ID;jp=ID;..." 再取 sha256，与区域顺序和数量无关，
+    可以放进定长索引列（迁移时用 SQL 为旧记录回填同样的值，见 modules/schema.py）。
+
+    Args:
+        execution_ids: {region: execution_id}
+
+    Returns:
+        str: 64 位十六进制 sha256
+    """
+    text = ';'.join(f"{region}={execution_ids[region]}" for region in sorted(execution_ids))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
@@ -2,90 +2,360 @@
 """
 报告生成器模块 - 整合完整的 AI 报告生成流程
 """
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from .db_query import (
-    get_latest_logs,
-    create_ai_report_placeholder,
-    update_ai_report
+    LOG_TABLES,
+    get_latest_region_logs,
+    get_execution_logs,
+    find_cached_report
 )
 from .log_filter import filter_logs
-from .ai_processor import process_with_ai, check_balance
+from .ai_processor import process_with_ai, compute_prompt_hash, StreamStalled
+from .balance_cache import get_cached_balance, fetch_balance_safely, read_cached_balance
+from .report_sink import ReportContentSink
+from .report_outbox import ReportRecord
+from .metrics import ReportMetrics, emit_metrics
+from .regions import REGIONS
+from .rules import evaluate_rules, abridge_for_llm, render_rule_report, STATUS_LABELS
+from .log_segmenter import segment_logs
+from .region_analysis import process_regions_in_parallel
+from .deadline import Deadline, DeadlineExceeded
+from .console import quiet_output
+from config.database import (
+    BALANCE_CACHE_CONFIG,
+    DEADLINE_CONFIG,
+    PIPELINE_CONFIG,
+    REGION_PARALLEL_CONFIG,
+    REPORT_CACHE_CONFIG,
+    RULES_CONFIG,
+    SEGMENT_CONFIG,
+    STREAM_PERSIST_CONFIG
+)
+
+
+def _fetch_region_logs(region, execution_ids, stream_logs):
+    """读取单个区域的日志：指定了执行ID时读取该执行，否则读取最新执行"""
+    if execution_ids:
+        return get_execution_logs(region, execution_ids[region], stream=stream_logs)
+    return get_latest_region_logs(region, stream=stream_logs)
+
 
+def _submit_region_fetches(executor, stream_logs, execution_ids):
+    """为每个启用的区域提交一个日志读取任务，返回 {region: future}"""
+    return {
+        region: executor.submit(contextvars.copy_context().run, _fetch_region_logs, region, execution_ids, stream_logs)
+        for region in LOG_TABLES
+    }
 
-def generate_ai_report(stream=True):
+
+def _fetch_logs(stream_logs, execution_ids=None):
     """
-    生成 AI 报告 - 完整流程
+    执行步骤1：并行读取各区域日志（各自从连接池借连接）
 
-    流程步骤：
-    1. 查询最新日志
-    2. 查询 API 余额
-    3. 创建/更新报告占位记录
-    4. 过滤和格式化日志
-    5. 生成 AI 报告（带异常处理）
-    6. 更新报告内容和状态
-    7. 完成
+    区域增加时总耗时约等于最慢的区域，而不是随区域数线性增长。
 
     Args:
-        stream: 是否使用流式输出（默认 True）
+        stream_logs: 是否流式读取日志
+        execution_ids: 可选，{region: execution_id}，为 None 时读取最新执行
 
     Returns:
-        dict: {
-            'success': bool,           # 是否成功
-            'report_id': int,          # 报告ID
-            'report_content': str,     # 报告内容（或错误信息）
-            'status': str,             # 状态：completed/failed
-            'arkcn_execution_id': str, # 中国区执行ID
-            'arkjp_execution_id': str  # 日本区执行ID
+        dict: {region: 日志数据 或 None}
+    """
+    if len(LOG_TABLES) == 1:
+        return {region: _fetch_region_logs(region, execution_ids, stream_logs) for region in LOG_TABLES}
+
+    with ThreadPoolExecutor(max_workers=len(LOG_TABLES)) as executor:
+        region_futures = _submit_region_fetches(executor, stream_logs, execution_ids)
+        return {region: future.result() for region, future in region_futures.items()}
+
+
+def _fetch_logs_and_balance(stream_logs, execution_ids=None):
+    """
+    并行执行步骤1和步骤2（余额缓存关闭时使用）
+
+    各区域的日志查询（各自从连接池借连接）和 API 余额查询互不依赖，
+    总耗时约等于最慢的那一个，而不是全部相加。
+
+    Args:
+        stream_logs: 是否流式读取日志
+        execution_ids: 可选，{region: execution_id}，为 None 时读取最新执行
+
+    Returns:
+        tuple: (logs_data, (balance_data, balance_age_seconds))
+    """
+    with ThreadPoolExecutor(max_workers=len(LOG_TABLES) + 1) as executor:
+        region_futures = _submit_region_fetches(executor, stream_logs, execution_ids)
+        balance_future = executor.submit(contextvars.copy_context().run, fetch_balance_safely)
+
+        logs_data = {region: future.result() for region, future in region_futures.items()}
+        balance = balance_future.result()
+
+    return logs_data, balance
+
+
+def _apply_refreshed_balance(record, metrics):
+    """
+    生成期间后台刷新已完成时，用最新的余额覆盖报告记录的 api_* 列
+
+    余额只是附带信息，这里出错只打印警告。
+    """
+    try:
+        balance_data, fetched_at = read_cached_balance()
+        if fetched_at is None:
+            return
+
+        age_seconds = max(0.0, time.time() - fetched_at)
+        if age_seconds > BALANCE_CACHE_CONFIG['ttl_seconds']:
+            return
+
+        record.balance(balance_data, age_seconds)
+        metrics.set(balance_age_seconds=round(age_seconds, 1), balance_refreshed=True)
+    except Exception as e:
+        print(f"   ⚠️  更新报告余额信息失败（不影响报告）: {e}")
+
+
+def _count_rows(logs_data):
+    """读取到的日志行数（流式读取时为 COUNT 统计值）"""
+    rows = 0
+    for region_data in logs_data.values():
+        if not region_data:
+            continue
+        if 'line_count' in region_data:
+            rows += region_data['line_count']
+        else:
+            rows += len(region_data['logs'])
+    return rows
+
+
+def _lookup_cached_report(region_ids):
+    """
+    查询报告缓存，缓存出错时不影响正常生成
+
+    Args:
+        region_ids: {region: execution_id}
+
+    Returns:
+        tuple: (prompt_hash, cached)，缓存不可用时 prompt_hash 为 None
+    """
+    try:
+        prompt_hash = compute_prompt_hash()
+        return prompt_hash, find_cached_report(region_ids, prompt_hash)
+    except Exception as e:
+        print(f"   ⚠️  报告缓存不可用（是否已运行 migrate.py？）: {e}")
+        return None, None
+
+
+def _segment(filtered_data, metrics):
+    """
+    按 MAA 分段并省略不重要的行（流式读取的日志在这里被读完，分段结果是列表）
+
+    Returns:
+        dict: 与 filtered_data 结构相同的新 dict，未开启分段时原样返回
+    """
+    if not SEGMENT_CONFIG['enabled']:
+        return filtered_data
+
+    with metrics.stage('segment'):
+        return segment_logs(filtered_data)
+
+
+def _prepare_llm_logs(segmented, verdict, metrics):
+    """
+    准备发给 AI 的日志：本地判定成功的区域只保留标记行，其余区域使用分段后的日志
+
+    Returns:
+        dict: 与 segmented 结构相同的新 dict
+    """
+    if not verdict:
+        llm_data, passed = segmented, ()
+    else:
+        llm_data = abridge_for_llm(segmented, verdict)
+        passed = {region for region, result in verdict['regions'].items() if result['status'] == 'success'}
+
+    for region in REGIONS:
+        region_data = llm_data[region['name']]
+        stats = region_data.get('segmentation') if region_data else None
+        if not stats or region['name'] in passed:
+            continue
+
+        metrics.prompt.setdefault('segmentation', {})[region['name']] = {
+            key: stats[key] for key in ('lines_in', 'lines_out', 'lines_elided')
         }
+        if stats['lines_elided']:
+            print(f"   ✂️  {region['label']} 日志分段: {stats['lines_in']} → {stats['lines_out']} 行"
+                  f"（{len(stats['spans'])} 段，省略 {stats['lines_elided']} 行）")
+
+    return llm_data
+
+
+def _generate_with_ai(filtered_data, record, stream, metrics, deadline, limiter=None):
     """
+    步骤5：调用 AI 生成报告（所有请求都不超过 deadline 的剩余时间，每次请求前从 limiter 取令牌）
+
+    Returns:
+        str: 报告内容
+    """
+    print("\n🤖 步骤5：生成 AI 报告...")
+    print("-" * 80)
+
+    # 流式生成时定期把部分内容写入报告记录，看板能实时看到进度，崩溃时也不会全部丢失
+    sink = None
+    if stream and STREAM_PERSIST_CONFIG['enabled']:
+        sink = ReportContentSink(
+            record.report_id,
+            interval_seconds=STREAM_PERSIST_CONFIG['interval_seconds'],
+            min_chars=STREAM_PERSIST_CONFIG['min_chars'],
+            write_partial=record.partial
+        )
+
+    # 按区域并行：至少有两个区域需要分析时才有意义
+    parallel = (REGION_PARALLEL_CONFIG['enabled']
+                and sum(1 for region in REGIONS if filtered_data.get(region['name'])) > 1)
+    generate = process_regions_in_parallel if parallel else process_with_ai
+
+    with metrics.stage('generate'):
+        report_content = generate(
+            filtered_data,
+            stream=stream,
+            on_content=sink.write if sink else None,
+            metrics=metrics,
+            deadline=deadline,
+            limiter=limiter
+        )
+
+    if sink:
+        metrics.llm['partial_writes'] = sink.flush_count
+
+    print("-" * 80)
+    print("   ✅ AI 报告生成完成")
+    return report_content
+
+
+def _generate_ai_report(stream, stream_logs, concurrent, force, execution_ids, deadline_seconds, limiter):
+    """generate_ai_report() 的实现，参数和返回值见 generate_ai_report()"""
 
     print("\n" + "=" * 80)
     print("🚀 开始生成 AI 报告")
     print("=" * 80)
 
-    report_id = None
-    arkcn_id = None
-    arkjp_id = None
+    if stream_logs is None:
+        stream_logs = PIPELINE_CONFIG['stream_logs']
+    # 流式读取的日志只能读一遍，本地规则判定要在分段结果上进行（与加载配置时的检查相同）
+    if stream_logs and RULES_CONFIG['enabled'] and not SEGMENT_CONFIG['enabled']:
+        raise ValueError("流式读取日志时本地规则判定（RULE_ENGINE）需要开启日志分段（LOG_SEGMENTATION）")
+    if concurrent is None:
+        concurrent = PIPELINE_CONFIG['concurrent_fetch']
+
+    if deadline_seconds is None:
+        deadline_seconds = DEADLINE_CONFIG['report_seconds']
+
+    deadline = Deadline(deadline_seconds)
+    record = ReportRecord()
+    region_ids = {}
+    saved = False
+    metrics = ReportMetrics()
+    metrics.set(stream=stream, stream_logs=stream_logs, concurrent=concurrent, status='failed',
+                deadline_seconds=deadline.seconds)
 
     try:
         # ============================================================
         # 步骤1：查询最新日志
         # ============================================================
-        print("\n📋 步骤1：查询最新日志...")
-        logs_data = get_latest_logs()
+        if concurrent and not BALANCE_CACHE_CONFIG['enabled']:
+            print("\n📋 步骤1+2：并行查询最新日志和 API 余额...")
+            with metrics.stage('fetch_logs_and_balance') as entry:
+                logs_data, (balance_data, balance_age) = _fetch_logs_and_balance(stream_logs, execution_ids)
+                entry['rows'] = _count_rows(logs_data)
+        else:
+            print("\n📋 步骤1：查询最新日志...")
+            with metrics.stage('fetch_logs') as entry:
+                logs_data = _fetch_logs(stream_logs, execution_ids)
+                entry['rows'] = _count_rows(logs_data)
+            balance_data = balance_age = None
 
-        if not logs_data['cn'] or not logs_data['jp']:
-            raise Exception("未找到日志数据，请确认数据库中有执行记录")
+        missing = [region['label'] for region in REGIONS if not logs_data[region['name']]]
+        if missing:
+            raise Exception(f"未找到日志数据（{', '.join(missing)}），请确认数据库中有执行记录")
 
-        arkcn_id = logs_data['cn']['execution_id']
-        arkjp_id = logs_data['jp']['execution_id']
+        region_ids = {region: logs_data[region]['execution_id'] for region in LOG_TABLES}
+        metrics.set(execution_ids=region_ids)
+        deadline.check('查询日志之后已没有剩余时间')
 
-        print(f"   ✅ 中国区 execution_id: {arkcn_id}")
-        print(f"   ✅ 日本区 execution_id: {arkjp_id}")
+        for region in REGIONS:
+            print(f"   ✅ {region['label']} execution_id: {region_ids[region['name']]}")
 
         # ============================================================
-        # 步骤2：查询 API 余额
+        # 查询报告缓存：同一执行ID对、相同提示词和模型配置的报告直接复用
         # ============================================================
-        print("\n💰 步骤2：查询 API 余额...")
-        balance_data = check_balance(show_detail=False)
+        prompt_hash = None
+        if REPORT_CACHE_CONFIG['enabled']:
+            with metrics.stage('cache_lookup'):
+                prompt_hash, cached = _lookup_cached_report(region_ids)
+
+            if cached and not force:
+                metrics.set(report_id=cached['report_id'], status='cached')
+                print(f"\n♻️  命中报告缓存，直接返回已有报告 report_id: {cached['report_id']}")
+                print("   （如需重新生成请使用 --force）")
+                print("\n" + "=" * 80 + "\n")
+
+                return {
+                    'success': True,
+                    'report_id': cached['report_id'],
+                    'client_report_key': None,
+                    'report_content': cached['report_content'],
+                    'status': 'completed',
+                    'execution_ids': region_ids,
+                    'arkcn_execution_id': region_ids.get('cn'),
+                    'arkjp_execution_id': region_ids.get('jp'),
+                    'cached': True
+                }
+
+        # ============================================================
+        # 步骤2：读取 API 余额（缓存过期时后台刷新，不阻塞、不会因余额查询失败而中断）
+        # ============================================================
+        balance_stale = False
+        if balance_data is None:
+            print("\n💰 步骤2：读取 API 余额...")
+            with metrics.stage('balance'):
+                if BALANCE_CACHE_CONFIG['enabled']:
+                    balance_data, balance_age = get_cached_balance()
+                    balance_stale = balance_age is None or balance_age > BALANCE_CACHE_CONFIG['ttl_seconds']
+                else:
+                    balance_data, balance_age = fetch_balance_safely()
+
+        metrics.set(balance_age_seconds=round(balance_age, 1) if balance_age is not None else None)
 
         if balance_data.get('balance_infos'):
             balance_info = balance_data['balance_infos'][0]
-            print(f"   ✅ 当前余额: {balance_info.get('total_balance', '0.00')} {balance_info.get('currency', 'CNY')}")
+            cache_note = f"（{balance_age:.0f} 秒前的缓存）" if balance_age else ""
+            print(f"   ✅ 当前余额: {balance_info.get('total_balance', '0.00')} "
+                  f"{balance_info.get('currency', 'CNY')}{cache_note}")
         else:
             print("   ⚠️  未获取到余额信息，使用默认值")
 
+        if balance_stale:
+            print("   🔄 余额缓存已过期，正在后台刷新")
+
         # ============================================================
         # 步骤3：创建/更新报告占位记录
         # ============================================================
         print("\n📝 步骤3：创建报告占位记录...")
-        report_id = create_ai_report_placeholder(
-            arkcn_id,
-            arkjp_id,
-            balance_data
-        )
+        with metrics.stage('placeholder'):
+            record.create(
+                region_ids,
+                balance_data,
+                prompt_hash=prompt_hash,
+                balance_age_seconds=balance_age
+            )
+        metrics.set(report_id=record.report_id, client_report_key=record.client_report_key)
 
-        if report_id:
-            print(f"   ✅ 报告记录已创建/更新，report_id: {report_id}")
+        if record.report_id:
+            print(f"   ✅ 报告记录已创建/更新，report_id: {record.report_id}")
+        elif record.client_report_key:
+            print(f"   ✅ 报告记录已加入写入队列，client_report_key: {record.client_report_key}")
         else:
             raise Exception("创建报告占位记录失败")
 
@@ -93,87 +363,214 @@ def generate_ai_report(stream=True):
         # 步骤4：过滤和格式化日志
         # ============================================================
         print("\n🔍 步骤4：过滤和格式化日志...")
-        filtered_data = filter_logs(logs_data)
-
-        cn_log_count = len(filtered_data['cn']['logs']) if filtered_data['cn'] else 0
-        jp_log_count = len(filtered_data['jp']['logs']) if filtered_data['jp'] else 0
+        with metrics.stage('filter'):
+            filtered_data = filter_logs(logs_data)
 
-        print(f"   ✅ 中国区日志: {cn_log_count} 条")
-        print(f"   ✅ 日本区日志: {jp_log_count} 条")
+        for region in REGIONS:
+            region_data = filtered_data[region['name']]
+            print(f"   ✅ {region['label']} 日志: {region_data['line_count'] if region_data else 0} 条")
 
         # ============================================================
-        # 步骤5：生成 AI 报告
+        # 本地规则判定：所有 MAA 都明确成功时不调用 AI，否则只把有问题的区域发给 AI
+        # 先分段再判定：分段保留了判定用到的所有行，流式读取的日志只需读一遍
         # ============================================================
-        print("\n🤖 步骤5：生成 AI 报告...")
-        print("-" * 80)
+        segmented = _segment(filtered_data, metrics)
+
+        verdict = None
+        if RULES_CONFIG['enabled']:
+            with metrics.stage('rules'):
+                verdict = evaluate_rules(segmented)
+
+            metrics.prompt['rules'] = {region: result['status'] for region, result in verdict['regions'].items()}
+            for region in REGIONS:
+                result = verdict['regions'].get(region['name'])
+                if result:
+                    states = '，'.join(
+                        f"{name} {STATUS_LABELS[instance['status']]}" for name, instance in result['instances'].items()
+                    )
+                    print(f"   📏 {region['label']} 本地判定: {states or '没有可判定的 MAA'}")
 
-        report_content = process_with_ai(filtered_data, stream=stream)
+        if verdict and verdict['all_success'] and RULES_CONFIG['skip_llm']:
+            print("\n📏 步骤5：所有 MAA 都已成功，按模板生成报告（不调用 AI）...")
+            print("-" * 80)
+            with metrics.stage('generate'):
+                report_content = render_rule_report(verdict, filtered_data)
+            print(report_content)
+            print("-" * 80)
+            metrics.set(report_source='rules')
+        else:
+            llm_data = _prepare_llm_logs(segmented, verdict, metrics)
+            deadline.check('无法开始生成 AI 报告')
+            report_content = _generate_with_ai(llm_data, record, stream, metrics, deadline, limiter)
+            metrics.set(report_source='llm')
 
-        print("-" * 80)
-        print("   ✅ AI 报告生成完成")
+        # 压缩统计在日志被完整迭代后才完整（流式模式下即 prompt 构建完成后）
+        for region in REGIONS:
+            region_data = filtered_data[region['name']]
+            stats = region_data['compaction'] if region_data else None
+            if stats:
+                metrics.prompt.setdefault('compaction', {})[region['name']] = stats
+            if stats and stats['lines_saved']:
+                print(f"   ✅ {region['label']} 日志压缩: {stats['lines_in']} → {stats['lines_out']} 行，"
+                      f"节省约 {stats['tokens_saved']} tokens")
 
         # ============================================================
         # 步骤6：更新报告内容 - 成功
         # ============================================================
         print("\n💾 步骤6：保存报告到数据库...")
-        success = update_ai_report(report_id, report_content, status='completed')
+        with metrics.stage('save'):
+            success = record.update(report_content, status='completed')
+        saved = True
+        metrics.set(status='completed')
+
+        # 生成期间后台刷新完成时，报告记录改用最新的余额
+        if balance_stale:
+            _apply_refreshed_balance(record, metrics)
 
-        if success:
+        report_id = record.resolve()
+        metrics.set(report_id=report_id)
+
+        # 写入队列遇到无法重试的错误（例如表结构与代码不一致），记录已移入死信文件
+        dead_lettered = record.dead_lettered
+        if dead_lettered:
+            metrics.set(status='failed', error='报告写入已移入死信文件')
+            print("   ❌ 保存报告失败：写入数据库出现无法重试的错误，记录已移入写入队列的死信文件")
+        elif not success:
+            print("   ⚠️  保存报告失败")
+        elif report_id:
             print("   ✅ 报告已保存")
         else:
-            print("   ⚠️  保存报告失败")
+            print("   ✅ 报告已写入本地队列（数据库暂不可用，恢复后自动写入）")
 
         # ============================================================
         # 步骤7：完成
         # ============================================================
+        status = 'failed' if dead_lettered else 'completed'
+
         print("\n" + "=" * 80)
-        print("✅ AI 报告生成成功！")
+        print("⚠️  AI 报告已生成，但没有保存到数据库" if dead_lettered else "✅ AI 报告生成成功！")
         print("=" * 80)
-        print(f"   报告ID: {report_id}")
-        print(f"   中国区: {arkcn_id}")
-        print(f"   日本区: {arkjp_id}")
-        print(f"   状态: completed")
+        print(f"   报告ID: {report_id or '（等待写入数据库）'}")
+        for region in REGIONS:
+            print(f"   {region['label']}: {region_ids[region['name']]}")
+        print(f"   状态: {status}")
+        print(f"   耗时: {metrics.summary()}")
         print("=" * 80 + "\n")
 
         return {
-            'success': True,
+            'success': not dead_lettered,
             'report_id': report_id,
+            'client_report_key': record.client_report_key,
             'report_content': report_content,
-            'status': 'completed',
-            'arkcn_execution_id': arkcn_id,
-            'arkjp_execution_id': arkjp_id
+            'status': status,
+            'execution_ids': region_ids,
+            'arkcn_execution_id': region_ids.get('cn'),
+            'arkjp_execution_id': region_ids.get('jp'),
+            'cached': False
         }
 
+    except (KeyboardInterrupt, SystemExit):
+        # ============================================================
+        # 被中断（Ctrl+C / 守护进程退出）：不留下 generating 状态的记录
+        # ============================================================
+        metrics.set(status='interrupted')
+        if record.created and not saved:
+            print("\n💾 生成被中断，更新报告状态为失败...")
+            record.update("生成报告失败: 生成过程被中断", status='failed')
+        raise
+
     except Exception as e:
         # ============================================================
         # 异常处理：更新报告状态为失败
         # ============================================================
         error_message = f"生成报告失败: {str(e)}"
         print(f"\n❌ 错误: {error_message}")
+        metrics.set(status='failed', error=str(e))
+        if isinstance(e, (DeadlineExceeded, StreamStalled)):
+            metrics.set(timed_out=True)
 
         # 如果已创建占位记录，更新为失败状态
-        if report_id:
+        if record.created:
             print("\n💾 更新报告状态为失败...")
-            update_ai_report(report_id, error_message, status='failed')
+            record.update(error_message, status='failed')
             print("   ✅ 失败状态已记录")
 
         print("\n" + "=" * 80)
         print("❌ AI 报告生成失败")
         print("=" * 80)
         print(f"   错误信息: {str(e)}")
-        if report_id:
-            print(f"   报告ID: {report_id}")
-        if arkcn_id:
-            print(f"   中国区: {arkcn_id}")
-        if arkjp_id:
-            print(f"   日本区: {arkjp_id}")
+        if record.created:
+            print(f"   报告ID: {record.report_id or record.client_report_key}")
+        for region in REGIONS:
+            if region['name'] in region_ids:
+                print(f"   {region['label']}: {region_ids[region['name']]}")
         print("=" * 80 + "\n")
 
         return {
             'success': False,
-            'report_id': report_id,
+            'report_id': record.resolve(timeout=0),
+            'client_report_key': record.client_report_key,
             'report_content': error_message,
             'status': 'failed',
-            'arkcn_execution_id': arkcn_id,
-            'arkjp_execution_id': arkjp_id
-        }
\ No newline at end of file
+            'execution_ids': region_ids,
+            'arkcn_execution_id': region_ids.get('cn'),
+            'arkjp_execution_id': region_ids.get('jp'),
+            'cached': False
+        }
+
+    finally:
+        emit_metrics(metrics)
+
+
+def generate_ai_report(stream=True, stream_logs=None, concurrent=None, force=False, execution_ids=None,
+                       deadline_seconds=None, limiter=None, quiet=False):
+    """
+    生成 AI 报告 - 完整流程
+
+    流程步骤：
+    1. 查询最新日志
+    2. 读取 API 余额（默认读本地缓存，过期时后台刷新，不等待余额接口）
+    3. 创建/更新报告占位记录
+    4. 过滤和格式化日志
+    5. 生成报告：本地规则判定所有 MAA 都成功时使用模板报告，否则调用 AI（带异常处理）
+    6. 更新报告内容和状态
+    7. 完成
+
+    写入队列开启时（OUTBOX_CONFIG），步骤3/6 和流式部分内容只追加到本地预写日志，
+    由后台线程写入数据库，数据库变慢或短暂不可用不会拖慢或中断报告流程。
+
+    整次生成有总时限（DEADLINE_CONFIG['report_seconds']）：步骤之间检查剩余时间，
+    步骤5 的 DeepSeek 请求的超时和重试不超过剩余时间，超时后报告按失败处理。
+
+    每个步骤的耗时、prompt 大小、首字延迟和生成速度记录在 ReportMetrics 中，
+    结束时以 JSON 行输出（见 METRICS_CONFIG）。流式读取日志时，
+    日志行的实际读取发生在步骤4/5中，步骤1只包含定位执行和 COUNT 统计。
+
+    Args:
+        stream: 是否使用流式输出（默认 True）
+        stream_logs: 是否流式读取日志（None 时使用 PIPELINE_CONFIG['stream_logs']；
+                     开启本地规则判定时需要同时开启日志分段，否则抛出 ValueError）
+        concurrent: 是否并行执行步骤1和步骤2（None 时使用 PIPELINE_CONFIG['concurrent_fetch']；
+                    余额缓存开启时步骤2只读缓存，不需要并行）
+        force: 是否忽略报告缓存强制重新生成
+        execution_ids: 可选，{region: execution_id}（每个启用的区域一项），
+                       指定要生成报告的执行；为 None 时使用各区域最新的执行
+        deadline_seconds: 总时限秒数（None 时使用 DEADLINE_CONFIG['report_seconds']，0 表示不限）
+        limiter: 可选，限流器（如 TokenBucket），步骤5 的每次 DeepSeek 请求前取一个令牌，等待不超过总时限
+        quiet: 是否丢弃本次生成的详细输出（只影响本次调用及其工作线程，见 modules/console.py）
+
+    Returns:
+        dict: {
+            'success': bool,           # 是否成功
+            'report_id': int,          # 报告ID（写入队列中的记录还没写入数据库时为 None）
+            'client_report_key': str,  # 客户端报告键（写入队列开启时）
+            'report_content': str,     # 报告内容（或错误信息）
+            'status': str,             # 状态：completed/failed
+            'execution_ids': dict,     # {region: execution_id}，各启用区域的执行ID
+            'arkcn_execution_id': str, # 中国区执行ID（兼容旧调用方，未启用时为 None）
+            'arkjp_execution_id': str, # 日本区执行ID（兼容旧调用方，未启用时为 None）
+            'cached': bool             # 是否直接复用了已有报告
+        }
+    """
+    with quiet_output(quiet):
+        return _generate_ai_report(stream, stream_logs, concurrent, force, execution_ids, deadline_seconds, limiter)
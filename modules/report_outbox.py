@@ -0,0 +1,609 @@
+# modules/report_outbox.py
+"""
+报告写入队列 - ai_reports 的写入先追加到本地预写日志，再由后台线程分批写入数据库
+
+- 每个进程一个日志文件（OUTBOX_CONFIG['dir']/<pid>-<毫秒时间戳>.spool），只追加，
+  每行一条记录 "<crc32 十六进制> <JSON>"，追加后 fsync；读取时校验 crc32，损坏的行跳过
+- 记录按客户端生成的 client_report_key 标识报告：create 插入占位记录（同一个键重复插入时返回已有记录），
+  update / partial / balance 覆盖对应的列，重复执行结果相同，因此崩溃后从头重放是安全的
+- 后台线程按顺序分批写入，一批一个事务；失败时指数退避重试，数据库恢复后自动追上
+- 重试也不会成功的错误（表结构未迁移、数据不合法等）不阻塞队列：该批记录逐条写入，
+  出错的记录（及同一报告之后的记录）移入死信文件（OUTBOX_CONFIG['dir']/dead_letter.jsonl），其余照常写入
+- ai_reports 还没有 client_report_key 列（没有运行 migrate.py）时不使用队列，直接写数据库
+- 文件中的记录全部写入后截断文件；进程异常退出留下的文件由之后启动的进程重放（见 replay_orphans）
+"""
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+
+import pymysql
+
+from config.database import OUTBOX_CONFIG
+from modules.db_pool import transaction
+from modules.db_query import (
+    MissingColumnError,
+    create_report_placeholder,
+    find_report_id_by_key,
+    table_has_column,
+    update_ai_report,
+    update_ai_report_balance,
+    update_ai_report_partial
+)
+
+
+SPOOL_SUFFIX = '.spool'
+DEAD_LETTER_FILE = 'dead_letter.jsonl'
+
+# 归为 OperationalError 但重试不会成功的 MySQL 错误码：
+# 1054 列不存在、1146 表不存在、1264 数值超出范围、1364 缺少默认值、1366 值不合法、1406 数据过长
+PERMANENT_ERRNOS = {1054, 1146, 1264, 1364, 1366, 1406}
+
+_outbox = None
+_outbox_lock = threading.Lock()
+_schema_ready = None
+
+
+def new_report_key():
+    """生成客户端报告键（32 位十六进制，写入 ai_reports.client_report_key）"""
+    return uuid.uuid4().hex
+
+
+def encode_record(record):
+    """
+    把一条记录编码为预写日志中的一行
+
+    Returns:
+        bytes: b"<crc32> <JSON>\\n"
+    """
+    payload = json.dumps(record, ensure_ascii=False, default=str, separators=(',', ':')).encode('utf-8')
+    return b'%08x %s\n' % (zlib.crc32(payload), payload)
+
+
+def iter_spool_records(path, start=0):
+    """
+    从预写日志的指定偏移开始逐条读取记录
+
+    校验失败的行打印警告后跳过；没有换行符的最后一行（写入过程中崩溃）视为不存在。
+
+    Args:
+        path: 预写日志文件
+        start: 开始读取的字节偏移
+
+    Yields:
+        tuple: (该记录结束处的字节偏移, record)
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        offset = start
+
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+
+            line_start, offset = offset, offset + len(line)
+            checksum, _, payload = line[:-1].partition(b' ')
+
+            try:
+                if int(checksum, 16) != zlib.crc32(payload):
+                    raise ValueError("crc32 校验失败")
+                record = json.loads(payload.decode('utf-8'))
+            except ValueError as e:
+                print(f"\n   ⚠️  写入队列记录损坏，已跳过（{os.path.basename(path)} 偏移 {line_start}）: {e}")
+                continue
+
+            yield offset, record
+
+
+def is_permanent_error(error):
+    """
+    写入错误是否重试也不会成功（表结构或数据问题），这类错误的记录移入死信文件而不是无限重试
+
+    Returns:
+        bool
+    """
+    if isinstance(error, (MissingColumnError, KeyError, TypeError, ValueError)):
+        return True
+    if isinstance(error, (pymysql.err.ProgrammingError, pymysql.err.IntegrityError,
+                          pymysql.err.DataError, pymysql.err.NotSupportedError)):
+        return True
+    return isinstance(error, pymysql.err.MySQLError) and bool(error.args) and error.args[0] in PERMANENT_ERRNOS
+
+
+def write_dead_letter(directory, record, reason):
+    """
+    把无法写入数据库的记录追加到死信文件（fsync 后返回）
+
+    Args:
+        directory: 死信文件所在目录
+        record: 记录
+        reason: 原因（错误信息）
+
+    Returns:
+        str: 死信文件路径
+    """
+    path = os.path.join(directory, DEAD_LETTER_FILE)
+    entry = {'ts': round(time.time(), 3), 'error': reason, 'record': record}
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+    print(f"\n   ❌ 报告 {record['key']} 的 {record['op']} 写入数据库失败且无法重试，已移入 {path}: {reason}")
+    return path
+
+
+def _coalesce(records):
+    """同一报告后面还有 partial/update 时，之前的 partial 不用再写"""
+    superseded = set()
+    kept = []
+
+    for record in reversed(records):
+        if record['op'] == 'partial' and record['key'] in superseded:
+            continue
+        if record['op'] in ('partial', 'update'):
+            superseded.add(record['key'])
+        kept.append(record)
+
+    kept.reverse()
+    return kept
+
+
+def apply_records(records, report_ids=None):
+    """
+    在一个事务中按顺序把记录写入 ai_reports
+
+    Args:
+        records: 记录列表（{'op', 'key', 'args'}）
+        report_ids: 可选，已知的 {client_report_key: report_id}
+
+    Returns:
+        dict: 本批次涉及的 {client_report_key: report_id}（事务提交后才有效）
+    """
+    report_ids = dict(report_ids or {})
+    resolved = {}
+
+    with transaction() as conn:
+        for record in _coalesce(records):
+            op, key, args = record['op'], record['key'], record['args']
+
+            if op == 'create':
+                resolved[key] = report_ids[key] = create_report_placeholder(
+                    conn=conn, client_report_key=key, verbose=False, **args
+                )
+                continue
+
+            report_id = report_ids.get(key) or find_report_id_by_key(key, conn=conn)
+            if report_id is None:
+                print(f"\n   ⚠️  写入队列中的报告 {key} 没有占位记录，已跳过 {op}")
+                continue
+            resolved[key] = report_ids[key] = report_id
+
+            if op == 'update':
+                update_ai_report(report_id, args['report_content'], status=args['status'], conn=conn)
+            elif op == 'partial':
+                update_ai_report_partial(report_id, args['report_content'], conn=conn)
+            elif op == 'balance':
+                update_ai_report_balance(report_id, args['balance_data'], args.get('balance_age_seconds'), conn=conn)
+            else:
+                print(f"\n   ⚠️  写入队列中有未知操作 {op}，已跳过")
+
+    return resolved
+
+
+def apply_or_dead_letter(records, report_ids, dead_keys, directory):
+    """
+    写入一批记录；整批因无法重试的错误失败时逐条写入，出错的记录移入死信文件
+
+    某个报告的记录进入死信文件后，同一报告之后的记录也一起移入（它们依赖前面的记录）。
+    可重试的错误（例如数据库连接断开）照常抛出，由调用方稍后重试整批（重复写入结果相同）。
+
+    Args:
+        records: 记录列表
+        report_ids: 已知的 {client_report_key: report_id}
+        dead_keys: 已进入死信文件的 client_report_key 集合（会被更新）
+        directory: 死信文件所在目录
+
+    Returns:
+        dict: 本批次写入成功的 {client_report_key: report_id}
+    """
+    dependent = "同一报告之前的记录已移入死信文件"
+    live = []
+    for record in records:
+        if record['key'] in dead_keys:
+            write_dead_letter(directory, record, dependent)
+        else:
+            live.append(record)
+
+    try:
+        return apply_records(live, report_ids) if live else {}
+    except Exception as e:
+        if not is_permanent_error(e):
+            raise
+
+    resolved = {}
+    for record in live:
+        if record['key'] in dead_keys:
+            write_dead_letter(directory, record, dependent)
+            continue
+        try:
+            resolved.update(apply_records([record], {**report_ids, **resolved}))
+        except Exception as e:
+            if not is_permanent_error(e):
+                raise
+            dead_keys.add(record['key'])
+            write_dead_letter(directory, record, f"{type(e).__name__}: {e}")
+
+    return resolved
+
+
+class ReportOutbox:
+    """
+    本进程的报告写入队列：append() 追加到预写日志后立即返回，后台线程负责写入数据库
+    """
+
+    def __init__(self, directory=None, options=None):
+        self.options = options or OUTBOX_CONFIG
+        self.directory = directory or self.options['dir']
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{os.getpid()}-{int(time.time() * 1000)}{SPOOL_SUFFIX}")
+
+        self._file = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._written = 0     # 已追加到文件的字节数
+        self._applied = 0     # 已写入数据库的字节数
+        self._report_ids = {}
+        self._dead_keys = set()
+        self._thread = None
+        self.failures = 0
+        self.last_error = None
+
+    def append(self, op, key, **args):
+        """
+        追加一条写入记录（fsync 后返回，不等待数据库）
+
+        Args:
+            op: 'create' / 'update' / 'partial' / 'balance'
+            key: client_report_key
+            **args: 对应 db_query 函数的参数
+        """
+        line = encode_record({'op': op, 'key': key, 'ts': round(time.time(), 3), 'args': args})
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'ab')
+            self._file.write(line)
+            self._file.flush()
+            if self.options['fsync']:
+                os.fsync(self._file.fileno())
+            self._written += len(line)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='report-outbox', daemon=True)
+                self._thread.start()
+            self._changed.notify_all()
+
+    def _run(self):
+        # 空闲时定期更新文件修改时间，其他进程据此判断文件仍有主人（见 replay_orphans）
+        heartbeat = max(1.0, self.options['stale_seconds'] / 3)
+
+        while True:
+            with self._lock:
+                if self._applied >= self._written:
+                    self._changed.wait(heartbeat)
+                pending = self._applied < self._written
+
+            if not pending:
+                self._touch()
+                continue
+
+            try:
+                self._flush_batch()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = e
+                delay = min(self.options['retry_base'] * 2 ** (self.failures - 1), self.options['retry_max'])
+                if self.failures == 1:
+                    print(f"\n   ⚠️  报告写入数据库失败，已保存在本地队列，{delay:g} 秒后重试: {e}")
+                time.sleep(delay)
+            else:
+                if self.failures:
+                    print(f"\n   ✅ 数据库已恢复，本地队列中的报告写入已完成重试（失败 {self.failures} 次）")
+                self.failures = 0
+                self.last_error = None
+
+    def _flush_batch(self):
+        records = []
+        end = self._applied
+
+        for end, record in iter_spool_records(self.path, self._applied):
+            records.append(record)
+            if len(records) >= self.options['batch_size']:
+                break
+
+        resolved = apply_or_dead_letter(records, self._report_ids, self._dead_keys, self.directory)
+
+        with self._lock:
+            self._report_ids.update(resolved)
+            self._applied = end
+
+            # 全部写完：截断文件，之后从头追加（文件以追加模式打开）
+            if self._applied >= self._written:
+                self._file.truncate(0)
+                self._applied = self._written = 0
+
+            self._changed.notify_all()
+
+    def _touch(self):
+        try:
+            os.utime(self.path)
+        except OSError:
+            pass
+
+    def report_id(self, key, timeout=0):
+        """
+        客户端报告键对应的 report_id（占位记录还没写入数据库时最多等待 timeout 秒）
+
+        Returns:
+            int 或 None
+        """
+        deadline = time.time() + timeout
+        with self._lock:
+            while key not in self._report_ids and key not in self._dead_keys and time.time() < deadline:
+                self._changed.wait(deadline - time.time())
+            return self._report_ids.get(key)
+
+    def is_dead(self, key):
+        """该报告的记录是否已移入死信文件"""
+        with self._lock:
+            return key in self._dead_keys
+
+    def pending_bytes(self):
+        """还没写入数据库的字节数"""
+        with self._lock:
+            return self._written - self._applied
+
+    def flush(self, timeout=None):
+        """
+        等待队列中的记录全部写入数据库
+
+        Args:
+            timeout: 最长等待秒数，None 时使用 OUTBOX_CONFIG['exit_wait_seconds']
+
+        Returns:
+            bool: 是否已全部写入
+        """
+        timeout = self.options['exit_wait_seconds'] if timeout is None else timeout
+        deadline = time.time() + timeout
+
+        with self._lock:
+            while self._applied < self._written and time.time() < deadline:
+                self._changed.wait(deadline - time.time())
+            return self._applied >= self._written
+
+    def close(self, timeout=None):
+        """
+        退出前调用：等待写入完成，全部写完时删除本进程的文件
+
+        Returns:
+            bool: 是否已全部写入（False 时文件保留，之后由其他进程重放）
+        """
+        drained = self.flush(timeout)
+
+        with self._lock:
+            if drained and self._file is not None:
+                self._file.close()
+                self._file = None
+                os.remove(self.path)
+
+        return drained
+
+
+def outbox_enabled():
+    """
+    是否使用写入队列：配置开启，并且 ai_reports 已有 client_report_key 列
+
+    没有运行 migrate.py 时打印提示并改为直接写数据库（结果缓存，进程内只检查一次）；
+    数据库暂时连不上时照常使用队列，之后再检查。
+
+    Returns:
+        bool
+    """
+    global _schema_ready
+
+    if not OUTBOX_CONFIG['enabled']:
+        return False
+
+    if _schema_ready is None:
+        try:
+            ready = table_has_column('ai_reports', 'client_report_key')
+        except Exception:
+            return True
+
+        if not ready:
+            print("   ⚠️  ai_reports 表缺少 client_report_key 列（请运行 migrate.py），"
+                  "本次直接写入数据库，不使用写入队列")
+        _schema_ready = ready
+
+    return _schema_ready
+
+
+def get_outbox():
+    """本进程共用的写入队列（第一次调用时创建）"""
+    global _outbox
+
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = ReportOutbox()
+        return _outbox
+
+
+def close_outbox(timeout=None):
+    """
+    退出前等待本进程的写入队列写完（没有用过队列时直接返回）
+
+    Returns:
+        bool: 是否已全部写入
+    """
+    if _outbox is None:
+        return True
+
+    drained = _outbox.close(timeout)
+    if not drained:
+        print(f"\n⚠️  数据库暂不可用，{_outbox.pending_bytes()} 字节的报告写入保留在 {_outbox.path}，"
+              f"下次启动时自动重放（或运行 python main.py replay-outbox）")
+    return drained
+
+
+class ReportRecord:
+    """
+    一份报告记录的写入：写入队列开启时追加到队列（不等待数据库），否则直接写数据库
+
+    队列模式下占位记录写入数据库之前 report_id 为 None，用 client_report_key 标识报告。
+    """
+
+    def __init__(self, use_outbox=None):
+        self.use_outbox = outbox_enabled() if use_outbox is None else use_outbox
+        self.client_report_key = None
+        self.report_id = None
+
+    @property
+    def created(self):
+        return self.report_id is not None or self.client_report_key is not None
+
+    @property
+    def dead_lettered(self):
+        """队列模式下该报告的写入是否因无法重试的错误移入了死信文件"""
+        if not self.use_outbox or self.client_report_key is None:
+            return False
+        return get_outbox().is_dead(self.client_report_key)
+
+    def create(self, execution_ids, balance_data, prompt_hash=None, balance_age_seconds=None):
+        """创建占位记录（参数同 create_report_placeholder）"""
+        if self.use_outbox:
+            self.client_report_key = new_report_key()
+            get_outbox().append(
+                'create', self.client_report_key,
+                execution_ids=execution_ids,
+                balance_data=balance_data,
+                prompt_hash=prompt_hash,
+                balance_age_seconds=balance_age_seconds
+            )
+            # 数据库正常时后台线程很快就会写入，顺便拿到 report_id 用于显示
+            self.report_id = get_outbox().report_id(self.client_report_key, timeout=0.2)
+        else:
+            self.report_id = create_report_placeholder(
+                execution_ids,
+                balance_data,
+                prompt_hash=prompt_hash,
+                balance_age_seconds=balance_age_seconds
+            )
+
+    def update(self, report_content, status):
+        """
+        写入最终内容和状态
+
+        Returns:
+            bool: 直接写数据库时为是否更新成功；队列模式下追加成功即为 True
+        """
+        if self.use_outbox:
+            get_outbox().append('update', self.client_report_key, report_content=report_content, status=status)
+            return True
+        return update_ai_report(self.report_id, report_content, status=status)
+
+    def partial(self, report_content):
+        """写入生成中的部分内容（ReportContentSink 的写入函数）"""
+        if self.use_outbox:
+            get_outbox().append('partial', self.client_report_key, report_content=report_content)
+            return True
+        return update_ai_report_partial(self.report_id, report_content)
+
+    def balance(self, balance_data, balance_age_seconds=None):
+        """用更新的余额覆盖 api_* 列"""
+        if self.use_outbox:
+            get_outbox().append('balance', self.client_report_key,
+                                balance_data=balance_data, balance_age_seconds=balance_age_seconds)
+            return True
+        return update_ai_report_balance(self.report_id, balance_data, balance_age_seconds)
+
+    def resolve(self, timeout=None):
+        """
+        队列模式下等待占位记录写入数据库，拿到 report_id
+
+        Args:
+            timeout: 最长等待秒数，None 时使用 OUTBOX_CONFIG['resolve_wait_seconds']
+
+        Returns:
+            int 或 None: report_id（数据库暂不可用时为 None）
+        """
+        if self.report_id is None and self.client_report_key is not None:
+            timeout = OUTBOX_CONFIG['resolve_wait_seconds'] if timeout is None else timeout
+            self.report_id = get_outbox().report_id(self.client_report_key, timeout=timeout)
+        return self.report_id
+
+
+def replay_orphans(directory=None, stale_seconds=None, verbose=True):
+    """
+    重放其他进程留下的预写日志（进程崩溃或退出时数据库不可用）
+
+    超过 stale_seconds 没有更新的文件视为没有主人（正常运行的进程会定期更新文件时间），
+    先改名认领（避免多个进程同时重放），全部写入后删除；写入失败时文件保留，下次再重放。
+
+    Args:
+        directory: 预写日志目录，None 时使用 OUTBOX_CONFIG['dir']
+        stale_seconds: None 时使用 OUTBOX_CONFIG['stale_seconds']
+        verbose: 是否打印结果（没有遗留文件时不打印）
+
+    Returns:
+        dict: {'files': int, 'records': int, 'failed': int}
+    """
+    directory = directory or OUTBOX_CONFIG['dir']
+    stale_seconds = OUTBOX_CONFIG['stale_seconds'] if stale_seconds is None else stale_seconds
+    own_path = _outbox.path if _outbox is not None else None
+    summary = {'files': 0, 'records': 0, 'failed': 0}
+
+    for path in sorted(glob.glob(os.path.join(directory, f"*{SPOOL_SUFFIX}*"))):
+        if path == own_path:
+            continue
+
+        try:
+            if time.time() - os.path.getmtime(path) < stale_seconds:
+                continue
+            claimed = f"{path.split(SPOOL_SUFFIX)[0]}{SPOOL_SUFFIX}.replay-{os.getpid()}"
+            os.replace(path, claimed)
+        except OSError:
+            # 文件已被其他进程认领或删除
+            continue
+
+        summary['files'] += 1
+        report_ids = {}
+        dead_keys = set()
+        batch = []
+
+        try:
+            for _, record in iter_spool_records(claimed):
+                batch.append(record)
+                if len(batch) >= OUTBOX_CONFIG['batch_size']:
+                    report_ids.update(apply_or_dead_letter(batch, report_ids, dead_keys, directory))
+                    summary['records'] += len(batch)
+                    batch = []
+            if batch:
+                report_ids.update(apply_or_dead_letter(batch, report_ids, dead_keys, directory))
+                summary['records'] += len(batch)
+
+            os.remove(claimed)
+        except Exception as e:
+            summary['failed'] += 1
+            if verbose:
+                print(f"   ⚠️  重放 {os.path.basename(claimed)} 失败，文件保留，下次启动时重试: {e}")
+
+    if verbose and summary['files']:
+        failed_note = f"，失败 {summary['failed']} 个" if summary['failed'] else ""
+        print(f"📮 已重放写入队列遗留文件 {summary['files']} 个，写入 {summary['records']} 条记录{failed_note}")
+
+    return summary
@@ -0,0 +1,69 @@
+# modules/report_sink.py
+"""
+报告写入模块 - 流式生成时按时间/字数合并写入部分内容，而不是每个 token 一次 UPDATE
+"""
+import time
+
+from modules.db_query import update_ai_report_partial
+
+
+class ReportContentSink:
+    """
+    接收流式生成的内容片段，定期把到目前为止的完整内容写入报告记录
+
+    - 距上次写入超过 interval_seconds，且有新内容时写入
+    - 或新增内容超过 min_chars 时写入
+    - 写入失败只打印警告，不影响生成；最终内容由 update_ai_report() 写入
+    """
+
+    def __init__(self, report_id, interval_seconds=3, min_chars=200, write_partial=None):
+        """
+        Args:
+            report_id: 报告记录ID
+            interval_seconds: 距上次写入超过该秒数才写
+            min_chars: 或新增内容超过该字符数才写
+            write_partial: 可选，写入函数 write_partial(content)，
+                           None 时直接调用 update_ai_report_partial(report_id, content)
+        """
+        self.report_id = report_id
+        self._write_partial = write_partial or (lambda content: update_ai_report_partial(report_id, content))
+        self.interval_seconds = interval_seconds
+        self.min_chars = min_chars
+
+        self._chunks = []
+        self._pending_chars = 0
+        self._last_flush = time.time()
+        self.flush_count = 0
+
+    def write(self, content):
+        """
+        追加一个内容片段（call_deepseek_api_stream 的 on_content 回调）
+
+        Args:
+            content: 新生成的文本片段
+        """
+        self._chunks.append(content)
+        self._pending_chars += len(content)
+
+        if (self._pending_chars >= self.min_chars
+                or time.time() - self._last_flush >= self.interval_seconds):
+            self.flush()
+
+    def flush(self):
+        """立即写入到目前为止的完整内容"""
+        if not self._pending_chars:
+            return
+
+        self._last_flush = time.time()
+        self._pending_chars = 0
+
+        try:
+            self._write_partial(''.join(self._chunks))
+            self.flush_count += 1
+        except Exception as e:
+            print(f"\n   ⚠️  写入部分报告内容失败（不影响生成）: {e}")
+
+    @property
+    def content(self):
+        """到目前为止收到的完整内容"""
+        return ''.join(self._chunks)
@@ -0,0 +1,256 @@
+# modules/rules.py
+"""
+本地规则判定模块 - 不调用 AI，根据完成标记判断每个 MAA 的执行结果
+
+规则来自 config/rules.json：
+- instances: 每个 MAA 的完成标记（出现即视为该 MAA 已完成）
+- failure: 出错标记（例如 任务出错）
+- ignore: 出错行中包含这些内容时不算出错（例如掉落识别错误）
+- highlight: 需要在报告中原样列出的行（例如公招 6 星）
+
+所有标记合并成一个预编译正则，每个区域的日志只扫描一遍。
+同一区域的 MAA 按区域注册表中的顺序前后执行，出错行归属于当时还没完成的第一个 MAA。
+"""
+import json
+import re
+
+from config.database import RULES_CONFIG
+from modules.regions import REGIONS
+
+
+# MAA 状态
+SUCCESS = 'success'   # 有完成标记，执行过程中没有出错
+ERROR = 'error'       # 有完成标记，但执行过程中出错
+MISSING = 'missing'   # 没有完成标记（执行失败或日志不完整）
+UNKNOWN = 'unknown'   # 规则文件中没有该 MAA 的完成标记，无法判定
+
+STATUS_LABELS = {
+    SUCCESS: '成功',
+    ERROR: '出错',
+    MISSING: '未完成',
+    UNKNOWN: '无法判定'
+}
+
+# 本地判定成功的区域发给 AI 时，日志替换为这一行加上完成标记和需要关注的行
+ABRIDGED_NOTE = '（本地规则已确认该区域所有 MAA 执行成功、日志完整，省略其余日志）'
+
+_rules_cache = {}
+
+
+def _compile(raw):
+    """把规则文件编译成一个合并的正则和 标记 -> (类型, MAA) 的映射"""
+    kinds = {}
+    for marker in raw.get('highlight', []):
+        kinds[marker] = ('highlight', None)
+    for marker in raw.get('failure', []):
+        kinds[marker] = ('failure', None)
+    for instance, rule in raw.get('instances', {}).items():
+        for marker in rule.get('success', []):
+            kinds[marker] = ('success', instance)
+
+    # 长的标记在前，避免被它的前缀抢先匹配
+    markers = sorted(kinds, key=len, reverse=True)
+    pattern = re.compile('|'.join(re.escape(marker) for marker in markers)) if markers else None
+
+    return {
+        'raw': raw,
+        'pattern': pattern,
+        'kinds': kinds,
+        'instances': set(raw.get('instances', {})),
+        'ignore': tuple(raw.get('ignore', []))
+    }
+
+
+def load_rules(path=None):
+    """
+    读取并编译规则文件（第一次调用时读取，之后使用缓存）
+
+    Args:
+        path: 规则文件，None 时使用 RULES_CONFIG['path']
+
+    Returns:
+        dict: 编译后的规则，'raw' 为文件原始内容
+    """
+    path = path or RULES_CONFIG['path']
+    rules = _rules_cache.get(path)
+    if rules is None:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            rules = _rules_cache[path] = _compile(json.load(f))
+    return rules
+
+
+def scan_region(info, region_data, rules):
+    """
+    扫描单个区域的日志，判定每个 MAA 的状态
+
+    Args:
+        info: 区域注册表中的一项
+        region_data: filter_logs() 或 segment_logs() 返回的该区域数据（'logs' 逐行读一遍）
+        rules: load_rules() 的结果
+
+    Returns:
+        dict: {
+            'status': 'success' / 'failed' / 'unknown',
+            'instances': {MAA: {'status': str, 'marker': str 或 None, 'errors': [行, ...]}},
+            'unattributed_errors': [行, ...],   # 所有 MAA 都完成之后出现的出错行
+            'highlights': [行, ...]
+        }
+    """
+    instances = {
+        name: {
+            'status': MISSING if name in rules['instances'] else UNKNOWN,
+            'marker': None,
+            'errors': []
+        }
+        for name in info['maa_instances']
+    }
+    pending = [name for name in info['maa_instances'] if instances[name]['status'] == MISSING]
+    unattributed = []
+    highlights = []
+
+    pattern = rules['pattern']
+    for line in (region_data['logs'] if pattern is not None else ()):
+        # 同一行里同一类标记出现多次时只记录一次
+        seen = set()
+
+        for match in pattern.finditer(line):
+            kind, instance = rules['kinds'][match.group()]
+            if (kind, instance) in seen:
+                continue
+            seen.add((kind, instance))
+
+            if kind == 'success':
+                if instance in pending:
+                    pending.remove(instance)
+                    instances[instance]['marker'] = line
+            elif kind == 'failure':
+                if any(ignored in line for ignored in rules['ignore']):
+                    continue
+                (instances[pending[0]]['errors'] if pending else unattributed).append(line)
+            else:
+                highlights.append(line)
+
+    for result in instances.values():
+        if result['marker'] is not None:
+            result['status'] = ERROR if result['errors'] else SUCCESS
+
+    statuses = [result['status'] for result in instances.values()]
+    if not statuses or UNKNOWN in statuses:
+        status = 'unknown'
+    elif all(value == SUCCESS for value in statuses) and not unattributed:
+        status = 'success'
+    else:
+        status = 'failed'
+
+    return {
+        'status': status,
+        'instances': instances,
+        'unattributed_errors': unattributed,
+        'highlights': highlights
+    }
+
+
+def evaluate_rules(filtered_data, rules=None):
+    """
+    对所有区域做本地规则判定
+
+    每个区域的日志只逐行读一遍，不会读成列表：流式读取的日志（生成器）要先经过 segment_logs() 分段
+    （分段结果是列表，并且保留了判定用到的所有行），否则判定之后日志已被读完，无法再构建 prompt。
+    配置加载时会拒绝开启流式读取和本地规则判定、却关闭日志分段的组合。
+
+    Args:
+        filtered_data: segment_logs() 或 filter_logs() 的结果
+        rules: 可选，load_rules() 的结果
+
+    Returns:
+        dict: {
+            'regions': {region: scan_region() 的结果},
+            'all_success': bool     # 所有区域的所有 MAA 都明确成功
+        }
+    """
+    rules = rules or load_rules()
+    regions = {}
+
+    for info in REGIONS:
+        region_data = filtered_data.get(info['name'])
+        if not region_data:
+            continue
+
+        regions[info['name']] = scan_region(info, region_data, rules)
+
+    return {
+        'regions': regions,
+        'all_success': bool(regions) and all(result['status'] == 'success' for result in regions.values())
+    }
+
+
+def abridge_for_llm(filtered_data, verdict):
+    """
+    已在本地判定成功的区域只保留完成标记和需要关注的行，其余区域保持完整
+
+    Returns:
+        dict: 与 filtered_data 结构相同的新 dict（不修改原数据）
+    """
+    abridged = dict(filtered_data)
+
+    for region, result in verdict['regions'].items():
+        if result['status'] != 'success':
+            continue
+
+        markers = [instance['marker'] for instance in result['instances'].values()]
+        abridged[region] = {
+            **filtered_data[region],
+            'logs': [ABRIDGED_NOTE, *markers, *result['highlights']]
+        }
+
+    return abridged
+
+
+def format_hour(value):
+    """报告中的时间：精确到日期小时"""
+    return value.strftime('%Y-%m-%d %H时') if hasattr(value, 'strftime') else str(value)
+
+
+def render_rule_report(verdict, filtered_data):
+    """
+    所有 MAA 都明确成功时，生成模板报告（格式与 AI 报告一致：执行摘要、各区域详情、总结）
+
+    Returns:
+        str: Markdown 报告
+    """
+    lines = [
+        "# 执行报告",
+        "",
+        "## 执行摘要",
+        "- 总体状态：**成功**（本地规则判定：所有 MAA 都出现了完成标记，执行过程中没有出错）"
+    ]
+
+    for info in REGIONS:
+        region_data = filtered_data.get(info['name'])
+        if info['name'] not in verdict['regions'] or not region_data:
+            continue
+        lines.append(f"- {info['label']}：成功，{format_hour(region_data['start_time'])} 开始，"
+                     f"{format_hour(region_data['end_time'])} 结束，日志完整")
+
+    lines += ["", "## 各区域详情"]
+
+    for info in REGIONS:
+        result = verdict['regions'].get(info['name'])
+        if not result:
+            continue
+
+        lines += ["", f"### {info['label']}"]
+        for name, instance in result['instances'].items():
+            lines.append(f"- {name}：{STATUS_LABELS[instance['status']]}（{instance['marker'].strip()}）")
+
+        if result['highlights']:
+            lines.append("- 需要关注：")
+            lines.extend(f"  - {line.strip()}" for line in result['highlights'])
+
+    lines += [
+        "",
+        "## 总结",
+        "- 所有区域的所有 MAA 均已完成，日志完整，无需重新执行"
+    ]
+
+    return "\n".join(lines)
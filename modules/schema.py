@@ -0,0 +1,216 @@
+# modules/schema.py
+"""
+数据库结构迁移模块 - 创建辅助表、新增列和索引（所有步骤都可重复执行）
+"""
+from modules.db_pool import get_connection
+from modules.db_query import LOG_TABLES
+
+
+# ============================================================================
+# 辅助表定义
+# ============================================================================
+CREATE_TABLES = {
+    # 执行记录汇总表：每个 execution_id 一行，避免每次都聚合整张日志表
+    'ark_executions': """
+        CREATE TABLE IF NOT EXISTS ark_executions (
+            region VARCHAR(16) NOT NULL,
+            execution_id VARCHAR(64) NOT NULL,
+            first_ts DATETIME NOT NULL,
+            last_ts DATETIME NOT NULL,
+            line_count INT UNSIGNED NOT NULL DEFAULT 0,
+            PRIMARY KEY (region, execution_id),
+            KEY idx_region_last_ts (region, last_ts)
+        ) DEFAULT CHARSET = utf8mb4
+    """,
+
+    # 汇总表的增量水位线：记录每个区域已汇总到的最新日志时间
+    'ark_execution_watermarks': """
+        CREATE TABLE IF NOT EXISTS ark_execution_watermarks (
+            region VARCHAR(16) NOT NULL PRIMARY KEY,
+            last_ts DATETIME NOT NULL
+        ) DEFAULT CHARSET = utf8mb4
+    """,
+
+    # 实时增量报告：每个进行中的执行一行，保存键集游标和滚动摘要
+    'ai_live_summaries': """
+        CREATE TABLE IF NOT EXISTS ai_live_summaries (
+            region VARCHAR(16) NOT NULL,
+            execution_id VARCHAR(64) NOT NULL,
+            cursor_ts DATETIME NULL,
+            cursor_id BIGINT UNSIGNED NULL,
+            cursor_offset INT UNSIGNED NULL,
+            lines_seen INT UNSIGNED NOT NULL DEFAULT 0,
+            first_ts DATETIME NULL,
+            summary MEDIUMTEXT NOT NULL,
+            update_count INT UNSIGNED NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (region, execution_id)
+        ) DEFAULT CHARSET = utf8mb4
+    """,
+
+    # 报告生成指标：每次生成一行，用于追踪各步骤耗时和 AI 延迟的变化
+    'ai_report_metrics': """
+        CREATE TABLE IF NOT EXISTS ai_report_metrics (
+            id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            report_id INT NULL,
+            status VARCHAR(16) NULL,
+            total_seconds DOUBLE NULL,
+            ttft_seconds DOUBLE NULL,
+            generation_seconds DOUBLE NULL,
+            tokens_per_second DOUBLE NULL,
+            prompt_tokens INT UNSIGNED NULL,
+            completion_tokens INT UNSIGNED NULL,
+            metrics JSON NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_created_at (created_at),
+            KEY idx_report_id (report_id)
+        ) DEFAULT CHARSET = utf8mb4
+    """
+}
+
+# 日志表索引：(index_name, columns)
+LOG_TABLE_INDEXES = [
+    # 最新执行查询：ORDER BY timestamp DESC LIMIT 1
+    ('idx_timestamp', 'timestamp'),
+    # 按执行ID读取日志：WHERE execution_id = ? ORDER BY timestamp
+    ('idx_execution_timestamp', 'execution_id, timestamp')
+]
+
+# 已有表新增的列：(table, column, definition)
+TABLE_COLUMNS = [
+    # 报告缓存：生成报告时使用的提示词和模型配置的哈希
+    ('ai_reports', 'prompt_hash', 'CHAR(64) NULL'),
+    # 流式写入：内容每次变化时自动更新，用于发现中断的 generating 记录
+    ('ai_reports', 'content_updated_at',
+     'TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'),
+    # DeepSeek 上下文缓存命中情况（来自 API 返回的 usage）
+    ('ai_report_metrics', 'prompt_cache_hit_tokens', 'INT UNSIGNED NULL'),
+    ('ai_report_metrics', 'prompt_cache_miss_tokens', 'INT UNSIGNED NULL'),
+    # 多区域：全部区域的执行ID（JSON）和按区域名排序后的哈希（见 modules.regions.execution_key）
+    ('ai_reports', 'execution_ids', 'JSON NULL'),
+    ('ai_reports', 'execution_key', 'CHAR(64) NULL'),
+    # 余额缓存：api_* 列的数据来自多少秒前的缓存（0 表示生成时实时查询）
+    ('ai_reports', 'api_balance_age_seconds', 'INT UNSIGNED NULL'),
+    # 本地写入队列：客户端生成的报告键，重放时按它去重
+    ('ai_reports', 'client_report_key', 'CHAR(32) NULL'),
+    # 实时增量报告：键集游标中最后读到的日志行的主键（游标为 (cursor_ts, cursor_id)）
+    ('ai_live_summaries', 'cursor_id', 'BIGINT UNSIGNED NULL'),
+    # 日志表没有主键 id 时的游标：cursor_ts 这一秒已读的行数（游标为 (cursor_ts, cursor_offset)）
+    ('ai_live_summaries', 'cursor_offset', 'INT UNSIGNED NULL')
+]
+
+# 新增列之后为已有记录回填数据：(table, column) -> SQL
+COLUMN_BACKFILLS = {
+    # 旧报告只有中国区/日本区两个执行ID，按 execution_key() 的规则生成同样的键
+    ('ai_reports', 'execution_key'): """
+        UPDATE ai_reports
+        SET execution_ids = JSON_OBJECT('cn', arkcn_execution_id, 'jp', arkjp_execution_id),
+            execution_key = SHA2(CONCAT('cn=', arkcn_execution_id, ';jp=', arkjp_execution_id), 256)
+        WHERE execution_key IS NULL
+    """
+}
+
+# 已有表新增的索引：(table, index_name, columns)
+TABLE_INDEXES = [
+    # 报告缓存查询：执行ID对 + 提示词哈希
+    ('ai_reports', 'idx_report_cache', 'arkcn_execution_id, arkjp_execution_id, prompt_hash'),
+    # 报告缓存查询（多区域）：执行ID组合的哈希 + 提示词哈希
+    ('ai_reports', 'idx_report_execution_key', 'execution_key, prompt_hash'),
+    # 中断恢复查询：status = 'generating' AND content_updated_at < ?
+    ('ai_reports', 'idx_status_updated', 'status, content_updated_at')
+]
+
+# 已有表新增的唯一索引：(table, index_name, columns)
+TABLE_UNIQUE_INDEXES = [
+    # 本地写入队列重放：同一个客户端报告键只插入一次
+    ('ai_reports', 'uk_client_report_key', 'client_report_key')
+]
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_schema = DATABASE()
+          AND table_name = %s
+          AND column_name = %s
+        LIMIT 1
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def _index_exists(cursor, table, index_name):
+    cursor.execute("""
+        SELECT 1
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE()
+          AND table_name = %s
+          AND index_name = %s
+        LIMIT 1
+    """, (table, index_name))
+    return cursor.fetchone() is not None
+
+
+def apply_migrations(verbose=True):
+    """
+    执行所有迁移步骤，已存在的表、列和索引会被跳过
+
+    Args:
+        verbose: 是否打印每一步的结果
+
+    Returns:
+        list: 本次实际执行的步骤描述
+    """
+    applied = []
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for table, ddl in CREATE_TABLES.items():
+                cursor.execute(ddl)
+                if verbose:
+                    print(f"   ✅ 表已就绪: {table}")
+
+            indexes = [
+                (log_table, index_name, columns, 'INDEX')
+                for log_table in LOG_TABLES.values()
+                for index_name, columns in LOG_TABLE_INDEXES
+            ]
+            indexes += [(table, index_name, columns, 'INDEX') for table, index_name, columns in TABLE_INDEXES]
+            indexes += [
+                (table, index_name, columns, 'UNIQUE INDEX') for table, index_name, columns in TABLE_UNIQUE_INDEXES
+            ]
+
+            for table, column, definition in TABLE_COLUMNS:
+                if _column_exists(cursor, table, column):
+                    if verbose:
+                        print(f"   ⏭️  列已存在: {table}.{column}")
+                    continue
+
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                applied.append(f"{table}.{column}")
+                if verbose:
+                    print(f"   ✅ 已添加列: {table}.{column} {definition}")
+
+                backfill = COLUMN_BACKFILLS.get((table, column))
+                if backfill:
+                    cursor.execute(backfill)
+                    if verbose:
+                        print(f"   ✅ 已回填: {table}.{column}（{cursor.rowcount} 行）")
+
+            for table, index_name, columns, kind in indexes:
+                if _index_exists(cursor, table, index_name):
+                    if verbose:
+                        print(f"   ⏭️  索引已存在: {table}.{index_name}")
+                    continue
+
+                cursor.execute(f"ALTER TABLE {table} ADD {kind} {index_name} ({columns})")
+                applied.append(f"{table}.{index_name}")
+                if verbose:
+                    print(f"   ✅ 已创建索引: {table}.{index_name} ({columns})")
+
+            conn.commit()
+        finally:
+            cursor.close()
+
+    return applied
@@ -0,0 +1,154 @@
+# modules/sse.py
+"""
+SSE 流解析模块 - 增量解码 Server-Sent Events，并按时间合并终端输出
+
+原来的流式循环对每一行都 decode、做前缀判断，对每个 token 调用
+print(..., flush=True)，token 速率高时每个 token 都是一次系统调用。
+这里直接在字节缓冲区上按行切分，只把 data 字段交给调用方；
+终端输出先缓存，距上次刷新超过设定时间才写出一次。
+"""
+import sys
+import time
+
+
+class SSEDecoder:
+    """
+    增量 SSE 解码器：喂入任意切分的字节块，返回已完整接收的事件的 data 字段
+
+    - 事件以空行结束，多行 data 用换行拼接
+    - 支持 \\n、\\r\\n、\\r 行尾；以 ':' 开头的注释行（心跳）被忽略
+    - event/id/retry 等其它字段 DeepSeek 不使用，直接忽略
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._data = []
+        # 上一块以 \r 结束：下一块开头的 \n 与它组成同一个 \r\n 行尾
+        self._skip_lf = False
+
+    def feed(self, chunk):
+        """
+        喂入一个字节块
+
+        Args:
+            chunk: bytes，可以在任意位置被切断（包括 UTF-8 多字节字符中间）
+
+        Returns:
+            list: 本次完整接收的事件 data（bytes），没有则为空列表
+        """
+        buffer = self._buffer
+        buffer += chunk
+
+        if self._skip_lf and buffer:
+            if buffer[0] == 0x0A:
+                del buffer[:1]
+            self._skip_lf = False
+
+        # 只处理到最后一个行尾（\n 或 \r）为止的完整行，剩余部分留在缓冲区等下一块
+        end = max(buffer.rfind(b'\n'), buffer.rfind(b'\r'))
+        if end < 0:
+            return []
+
+        complete = bytes(buffer[:end + 1])
+        del buffer[:end + 1]
+        # 以 \r 结束时行已经完整，但后面可能还有属于同一个 \r\n 的 \n，留到下一块跳过
+        self._skip_lf = complete[-1:] == b'\r' and not buffer
+
+        events = []
+        data = self._data
+
+        # bytes.splitlines() 正好按 \n、\r\n、\r 切分，与 SSE 的行尾定义一致
+        for line in complete.splitlines():
+            if not line:
+                # 空行：分发当前事件
+                if data:
+                    events.append(data[0] if len(data) == 1 else b'\n'.join(data))
+                    data = self._data = []
+            elif line[:5] == b'data:':
+                data.append(line[6:] if line[5:6] == b' ' else line[5:])
+
+        return events
+
+    def close(self):
+        """
+        流结束时调用，返回最后一个没有以空行结束的事件
+
+        Returns:
+            list: 剩余事件的 data（bytes）
+        """
+        events = self.feed(b'\n\n') if self._buffer or self._data else []
+        self._buffer.clear()
+        self._skip_lf = False
+        return events
+
+
+def iter_sse_data(chunks):
+    """
+    把字节块迭代器解码为事件 data 的迭代器
+
+    Args:
+        chunks: 字节块的可迭代对象（例如 response.iter_content(...)）
+
+    Yields:
+        bytes: 每个事件的 data 字段
+    """
+    decoder = SSEDecoder()
+
+    for chunk in chunks:
+        if chunk:
+            yield from decoder.feed(chunk)
+
+    yield from decoder.close()
+
+
+class BufferedWriter:
+    """
+    按时间合并写出的文本输出
+
+    write() 只把内容放进缓冲区，距上次刷新超过 flush_interval 秒才真正写出并 flush，
+    人眼看起来仍然是实时输出，但系统调用次数从每 token 一次降到每秒几次。
+    """
+
+    def __init__(self, stream=None, flush_interval=0.05):
+        """
+        Args:
+            stream: 输出目标，None 时在写出时取当前的 sys.stdout（兼容运行中替换 stdout）
+            flush_interval: 刷新间隔（秒），0 表示每次 write 都立即刷新
+        """
+        self._stream = stream
+        self.flush_interval = flush_interval
+
+        self._chunks = []
+        self._last_flush = time.monotonic()
+
+    def write(self, text):
+        self._chunks.append(text)
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._write_out()
+            self._last_flush = now
+
+    def flush(self):
+        """立即写出缓冲区中的全部内容"""
+        self._write_out()
+        self._last_flush = time.monotonic()
+
+    def _write_out(self):
+        if not self._chunks:
+            return
+
+        stream = self._stream if self._stream is not None else sys.stdout
+        stream.write(''.join(self._chunks))
+        stream.flush()
+        self._chunks = []
+
+
+class NullWriter:
+    """丢弃所有输出（不需要在终端显示生成内容时使用）"""
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
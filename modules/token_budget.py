@@ -0,0 +1,66 @@
+# modules/token_budget.py
+"""
+Token 估算模块 - 在不调用分词器的情况下快速估算文本的 token 数
+"""
+
+# DeepSeek 官方换算：1 个英文字符约 0.3 token，1 个中文字符约 0.6 token
+ASCII_TOKEN_RATIO = 0.3
+CJK_TOKEN_RATIO = 0.6
+
+
+def estimate_tokens(text):
+    """
+    估算文本的 token 数
+
+    ASCII 字符在 UTF-8 中占 1 字节，中文字符占 3 字节，
+    用字节数和字符数之差反推非 ASCII 字符数，整个计算都在 C 层完成。
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的 token 数
+    """
+    if not text:
+        return 0
+
+    char_count = len(text)
+    byte_count = len(text.encode('utf-8'))
+    wide_count = min(char_count, (byte_count - char_count) // 2)
+    ascii_count = char_count - wide_count
+
+    return int(ascii_count * ASCII_TOKEN_RATIO + wide_count * CJK_TOKEN_RATIO + 0.5)
+
+
+def split_lines_by_tokens(text, chunk_tokens):
+    """
+    按行把文本切成若干段，每段估算 token 数不超过 chunk_tokens
+
+    单行超过上限时单独成段，不在行内切断。
+
+    Args:
+        text: 多行文本
+        chunk_tokens: 每段的 token 上限
+
+    Returns:
+        list: 每段的文本
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for line in text.split('\n'):
+        line_tokens = estimate_tokens(line) + 1
+
+        if current and current_tokens + line_tokens > chunk_tokens:
+            chunks.append('\n'.join(current))
+            current = []
+            current_tokens = 0
+
+        current.append(line)
+        current_tokens += line_tokens
+
+    if current:
+        chunks.append('\n'.join(current))
+
+    return chunks
\ No newline at end of file
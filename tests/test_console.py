@@ -0,0 +1,38 @@
+# tests/test_console.py
+"""按调用上下文关闭输出：只影响 quiet_output() 范围内的调用和传递了上下文的工作线程"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.console import quiet_output
+
+
+def _report(tag):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(contextvars.copy_context().run, print, f"{tag} worker").result()
+    print(f"{tag} main")
+
+
+def test_quiet_context_does_not_hide_other_threads(capsys):
+    def quiet_report():
+        with quiet_output(True):
+            _report("quiet")
+
+    threads = [threading.Thread(target=quiet_report), threading.Thread(target=_report, args=("loud",))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print("progress")
+
+    out = capsys.readouterr().out
+    assert "quiet" not in out
+    assert "loud worker" in out and "loud main" in out
+    assert "progress" in out
+
+
+def test_disabled_quiet_output_keeps_output(capsys):
+    with quiet_output(False):
+        _report("shown")
+
+    assert capsys.readouterr().out.split() == ["shown", "worker", "shown", "main"]
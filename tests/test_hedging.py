@@ -0,0 +1,47 @@
+# tests/test_hedging.py
+"""对冲次数上限：令牌桶保存在文件中，多次运行共用同一个上限"""
+import json
+import subprocess
+import sys
+import time
+
+from modules.hedging import try_acquire_hedge
+
+
+def _options(tmp_path, **overrides):
+    return {'max_per_hour': 6, 'burst': 2, 'state_path': str(tmp_path / 'hedge_budget.json'), **overrides}
+
+
+def test_burst_is_shared_across_processes(tmp_path):
+    options = _options(tmp_path)
+    code = f"from modules.hedging import try_acquire_hedge; print(try_acquire_hedge({options!r}))"
+
+    results = [
+        subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.strip()
+        for _ in range(3)
+    ]
+
+    assert results == ['True', 'True', 'False']
+
+
+def test_tokens_refill_over_time(tmp_path):
+    options = _options(tmp_path)
+    with open(options['state_path'], 'w', encoding='utf-8') as f:
+        json.dump({'tokens': 0, 'updated': time.time() - 600}, f)
+
+    # 每小时 6 个：10 分钟补充 1 个
+    assert try_acquire_hedge(options)
+    assert not try_acquire_hedge(options)
+
+
+def test_unreadable_state_counts_as_full(tmp_path):
+    options = _options(tmp_path, burst=1)
+    with open(options['state_path'], 'w', encoding='utf-8') as f:
+        f.write('{"tokens": ')
+
+    assert try_acquire_hedge(options)
+    assert not try_acquire_hedge(options)
+
+
+def test_disabled_when_max_per_hour_is_zero(tmp_path):
+    assert not try_acquire_hedge(_options(tmp_path, max_per_hour=0))
@@ -0,0 +1,32 @@
+# tests/test_log_compactor.py
+"""日志压缩：重复行合并，以及不足 min_repeat 次的长行不能丢失"""
+from modules.log_compactor import compact_rows, new_compaction_stats
+
+
+def _compact(rows, **options):
+    stats = new_compaction_stats()
+    return list(compact_rows(rows, options, stats)), stats
+
+
+def test_short_run_of_long_lines_is_kept():
+    lines, stats = _compact([(0, 'X' * 300), (1, 'X' * 300)], min_repeat=3)
+
+    assert lines == ['X' * 300, 'X' * 300]
+    assert stats['lines_out'] == 2
+    assert stats['lines_saved'] == 0
+
+
+def test_long_repeated_lines_are_merged():
+    lines, stats = _compact([(second, 'X' * 300) for second in range(5)], min_repeat=3)
+
+    assert len(lines) == 1
+    assert lines[0].startswith('X' * 300 + '（重复 5 次')
+    assert stats['lines_in'] == 5
+    assert stats['lines_out'] == 1
+    assert stats['lines_saved'] == 4
+
+
+def test_short_lines_repeated_below_threshold_are_kept():
+    lines, _ = _compact([(0, 'a'), (1, 'a'), (2, 'b')], min_repeat=3)
+
+    assert lines == ['a', 'a', 'b']
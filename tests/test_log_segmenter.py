@@ -0,0 +1,39 @@
+# tests/test_log_segmenter.py
+"""日志分段：流式读取的日志只读一遍，分段后本地规则判定的结果与完整日志相同"""
+from modules.log_segmenter import segment_logs
+from modules.rules import evaluate_rules
+
+OPTIONS = {'head_lines': 2, 'tail_lines': 2, 'context_lines': 1, 'min_lines': 10}
+
+
+def _logs():
+    lines = [f"战斗 {index}" for index in range(100)]
+    lines[40] = "任务出错"
+    lines[41] = "6★ 干员 UnknownStage"
+    lines[60] = "MAA159 已完成所有任务"
+    lines += [f"基建 {index}" for index in range(100)]
+    lines.append("MAA177 已完成所有任务")
+    return lines
+
+
+def test_generator_and_list_give_same_segments():
+    from_list = segment_logs({'cn': {'logs': _logs()}}, OPTIONS)['cn']
+    from_generator = segment_logs({'cn': {'logs': iter(_logs())}}, OPTIONS)['cn']
+
+    assert from_generator == from_list
+    assert from_list['segmentation']['lines_in'] == 201
+    assert [span['instances'] for span in from_list['segmentation']['spans']] == [['MAA159'], ['MAA177']]
+
+
+def test_segmented_logs_keep_the_rule_verdict():
+    segmented = segment_logs({'cn': {'logs': iter(_logs())}}, OPTIONS)
+
+    assert evaluate_rules(segmented)['regions'] == evaluate_rules({'cn': {'logs': _logs()}})['regions']
+
+
+def test_condensed_span_keeps_key_lines():
+    logs = segment_logs({'cn': {'logs': iter(_logs())}}, OPTIONS)['cn']['logs']
+
+    assert "任务出错" in logs
+    assert "6★ 干员 UnknownStage" in logs
+    assert "……（省略 37 行）……" in logs
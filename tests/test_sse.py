@@ -0,0 +1,37 @@
+# tests/test_sse.py
+"""SSE 增量解码：字节块可以在任意位置切断，\\n、\\r\\n、\\r 行尾都能及时切出事件"""
+from modules.sse import SSEDecoder, iter_sse_data
+
+
+def _feed_all(chunks):
+    decoder = SSEDecoder()
+    events = []
+    for chunk in chunks:
+        events.append(decoder.feed(chunk))
+    return events, decoder.close()
+
+
+def test_crlf_split_between_chunks():
+    events, rest = _feed_all([b'data: a\r', b'\n\r', b'\ndata: b\r\n\r\n'])
+
+    assert events == [[], [b'a'], [b'b']]
+    assert rest == []
+
+
+def test_cr_only_stream_is_not_buffered_until_close():
+    assert SSEDecoder().feed(b'data: a\r\rdata: b\r\r') == [b'a', b'b']
+
+
+def test_multibyte_char_split_across_chunks():
+    payload = 'data: 干员\n\n'.encode('utf-8')
+    split = payload.index('员'.encode('utf-8')) + 1
+
+    events, _ = _feed_all([payload[:split], payload[split:]])
+
+    assert events == [[], ['干员'.encode('utf-8')]]
+
+
+def test_multi_line_data_is_joined_with_newline():
+    chunks = [b': keep-alive\n\n', b'data: line1\r\ndata:line2\r\n', b'\r\ndata: tail']
+
+    assert list(iter_sse_data(chunks)) == [b'line1\nline2', b'tail']